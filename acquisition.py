@@ -0,0 +1,260 @@
+import math
+import multiprocessing
+import os
+import statistics
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+
+from sample_ring import RingReader, SampleRing
+
+SAMPLE_RATE = int(os.getenv("ACQUISITION_RATE", 100))          # Pulse samples per second
+ACQUISITION_CPU = int(os.getenv("ACQUISITION_CPU", 3))          # Core the acquisition process is pinned to
+FIFO_PRIORITY = int(os.getenv("ACQUISITION_FIFO_PRIORITY", 0))  # SCHED_FIFO priority, 0 leaves the normal scheduler
+RING_SECONDS = 30                                                # Pulse history kept, the ring is twice that for the other channels
+RING_NAME = os.getenv("ACQUISITION_RING", "patient_samples")    # Shared memory name, command_server.py attaches to it for the waveform
+
+# Ring channels
+PULSE = 0         # A0 voltage
+GSR = 1           # A1 raw value
+OBJECT_TEMP = 2   # MLX90614 object temperature, °C
+AMBIENT_TEMP = 3  # MLX90614 ambient temperature, °C
+
+
+# ADS1115 and MLX90614 reads as (channel, every n ticks, read function).
+# Imported here so only the acquisition process touches the I2C sensors.
+def open_sensors(rate):
+    import board
+    import busio
+    import adafruit_mlx90614
+    from adafruit_ads1x15.ads1115 import ADS1115
+    from adafruit_ads1x15.analog_in import AnalogIn
+
+    i2c = busio.I2C(board.SCL, board.SDA)
+    adc = ADS1115(i2c, address=0x48)
+    adc.data_rate = 860  # About 1 ms per single-shot conversion instead of 8 ms at 128 SPS
+    mlx = adafruit_mlx90614.MLX90614(i2c, address=0x5a)
+    pulse = AnalogIn(adc, 0)
+    gsr = AnalogIn(adc, 1)
+    return [
+        (PULSE, 1, lambda: pulse.voltage),
+        (GSR, max(rate // 10, 1), lambda: gsr.value),
+        (OBJECT_TEMP, max(rate // 20, 1), lambda: mlx.object_temperature),
+        (AMBIENT_TEMP, rate, lambda: mlx.ambient_temperature),
+    ]
+
+
+def pin_to_cpu(cpu):
+    try:
+        if cpu in os.sched_getaffinity(0):
+            os.sched_setaffinity(0, {cpu})
+            return True
+    except (AttributeError, OSError):
+        pass
+    return False
+
+
+def set_realtime(priority):
+    if not priority:
+        return False
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        return True
+    except (AttributeError, PermissionError, OSError) as e:
+        print(f"SCHED_FIFO not available, using the normal scheduler: {e}")
+        return False
+
+
+# Acquisition process body: fixed-rate sampling against absolute deadlines,
+# so a late tick is caught up instead of pushing every later sample back
+def acquire(ring_name, source, rate, cpu, priority, stop):
+    pin_to_cpu(cpu)
+    set_realtime(priority)
+    ring = SampleRing(ring_name)
+    schedule = source(rate)
+    period = 1.0 / rate
+    overruns = 0
+    max_late = 0.0
+    tick = 0
+    deadline = time.monotonic()
+    try:
+        while not stop.is_set():
+            now = time.monotonic()
+            late = now - deadline
+            if late > period:
+                overruns += 1
+                deadline += period * math.floor(late / period)  # Skip the ticks that are already gone
+            max_late = max(max_late, late)
+            for channel, every, read in schedule:
+                if tick % every:
+                    continue
+                try:
+                    value = read()
+                except OSError:
+                    continue
+                ring.write(now, channel, value)
+            ring.set_timing(overruns, max_late)
+            tick += 1
+            deadline += period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+    finally:
+        ring.close()
+
+
+# Runs ADC/MLX acquisition in its own process, pinned to one core and
+# optionally SCHED_FIFO, away from the GIL of the process doing display,
+# SMTP and logging. Samples are handed over through a shared-memory ring.
+class AcquisitionProcess:
+    def __init__(self, rate=SAMPLE_RATE, cpu=ACQUISITION_CPU, priority=FIFO_PRIORITY, source=open_sensors, ring_name=RING_NAME):
+        self.rate = rate
+        self.ring_name = ring_name
+        self.cpu = cpu
+        self.priority = priority
+        self.source = source
+        self.ring = None
+        self._stop = multiprocessing.Event()
+        self._process = None
+
+    def start(self):
+        if self._process is not None:
+            return self
+        if self.ring is not None:
+            # Kept by stop() for readers finishing their last read
+            self.ring.close()
+            self.ring = None
+        self._stop.clear()
+        capacity = self.rate * RING_SECONDS * 2
+        try:
+            self.ring = SampleRing(self.ring_name, capacity=capacity)
+        except FileExistsError:
+            # Left over from a run that was killed before it could unlink it
+            stale = shared_memory.SharedMemory(self.ring_name)
+            stale.close()
+            stale.unlink()
+            self.ring = SampleRing(self.ring_name, capacity=capacity)
+        self._process = multiprocessing.Process(
+            target=acquire,
+            args=(self.ring.name, self.source, self.rate, self.cpu, self.priority, self._stop),
+            name="acquisition",
+            daemon=True,
+        )
+        self._process.start()
+        # Keep this process off the acquisition core
+        try:
+            others = os.sched_getaffinity(0) - {self.cpu}
+            if others:
+                os.sched_setaffinity(0, others)
+        except (AttributeError, OSError):
+            pass
+        return self
+
+    def reader(self, channels=None):
+        return RingReader(self.ring, channels)
+
+    def stats(self):
+        stats = self.ring.timing() if self.ring else {}
+        stats["alive"] = self._process is not None and self._process.is_alive()
+        return stats
+
+    # End sampling, so nothing else in this process reads the sensors at the
+    # same time. The ring stays until start() or close(): readers still in
+    # their last read just find no new samples.
+    def stop(self, timeout=2):
+        if self._process is None:
+            return
+        self._stop.set()
+        self._process.join(timeout=timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+
+    def close(self, timeout=2):
+        self.stop(timeout)
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+
+# Benchmark: pulse sampling jitter with a GIL-heavy load in the monitor
+# process (standing in for PIL rendering, SMTP and print), once sampled by a
+# thread in that process as the monitors do today and once by the
+# acquisition process.
+
+FAKE_READ_TIME = 0.0012  # One ADS1115 conversion at 860 SPS plus the I2C transfer
+
+
+def fake_sensors(rate):
+    def pulse():
+        time.sleep(FAKE_READ_TIME)
+        return 2.0 + math.sin(time.monotonic() * 2 * math.pi * 1.2)
+
+    return [(PULSE, 1, pulse)]
+
+
+def gil_load(stop, busy=0.03, idle=0.07):
+    while not stop.is_set():
+        end = time.perf_counter() + busy
+        while time.perf_counter() < end:
+            sum(i * i for i in range(200))
+        time.sleep(idle)
+
+
+def thread_sampling(rate, seconds):
+    period = 1.0 / rate
+    read = fake_sensors(rate)[0][2]
+    timestamps = []
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        read()
+        timestamps.append(time.monotonic())
+        time.sleep(period)
+    return timestamps
+
+
+def process_sampling(rate, seconds):
+    acquisition = AcquisitionProcess(rate=rate, priority=FIFO_PRIORITY, source=fake_sensors, ring_name=None).start()
+    reader = RingReader(acquisition.ring, (PULSE,), from_start=True)
+    time.sleep(seconds)
+    timestamps = [t for t, _, _ in reader.read()]
+    acquisition.close()
+    return timestamps
+
+
+def jitter(timestamps, rate):
+    period = 1.0 / rate
+    errors = sorted(abs((b - a) - period) * 1000 for a, b in zip(timestamps, timestamps[1:]))
+    if not errors:
+        return {}
+    return {
+        "samples": len(timestamps),
+        "rate_hz": (len(timestamps) - 1) / (timestamps[-1] - timestamps[0]),
+        "mean_ms": statistics.fmean(errors),
+        "p99_ms": errors[min(len(errors) - 1, int(len(errors) * 0.99))],
+        "max_ms": errors[-1],
+    }
+
+
+def bench(rate=SAMPLE_RATE, seconds=10):
+    results = {}
+    for name, sampling in (("thread", thread_sampling), ("process", process_sampling)):
+        stop = threading.Event()
+        loads = [threading.Thread(target=gil_load, args=(stop,), daemon=True) for _ in range(2)]
+        for load in loads:
+            load.start()
+        results[name] = jitter(sampling(rate, seconds), rate)
+        stop.set()
+        for load in loads:
+            load.join()
+    return results
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    results = bench(seconds=seconds)
+    print(f"Pulse sampling at {SAMPLE_RATE} Hz for {seconds:.0f}s with a GIL-heavy load, interval error vs period")
+    print(f"{'':10}{'rate Hz':>9}{'mean ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for name, result in results.items():
+        print(f"{name:10}{result['rate_hz']:>9.1f}{result['mean_ms']:>9.2f}{result['p99_ms']:>9.2f}{result['max_ms']:>9.2f}")
@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+from status_rules import SEVERITY, STATUSES
+
+DIGEST_WINDOW = float(os.getenv("ALERT_DIGEST_WINDOW", 60))  # Seconds collected into one email
+RATE_LIMIT = int(os.getenv("ALERT_RATE_LIMIT", 3))  # Digests one condition may appear in per period
+RATE_PERIOD = float(os.getenv("ALERT_RATE_PERIOD", 3600))  # Seconds
+
+
+# Stable id of the digest for these conditions in the window starting then
+def digest_id(conditions, window_start):
+    return uuid.uuid5(uuid.NAMESPACE_OID, f"{window_start!r}:{','.join(sorted(conditions))}").hex
+
+
+# Collects every condition (fired threshold rule) seen within a window and
+# sends one digest email for all of them, with min/max/current per metric.
+# A condition is limited to RATE_LIMIT digests per period, whether it keeps
+# firing or clears and fires again.
+class AlertDigest:
+    def __init__(self, send, window=DIGEST_WINDOW, rate_limit=RATE_LIMIT, rate_period=RATE_PERIOD, rule_status=None):
+        self.send = send  # send(subject, body, id=, severity=, metrics=, conditions=)
+        self.window = window
+        self.rate_limit = rate_limit
+        self.rate_period = rate_period
+        self.rule_status = rule_status or (lambda name: None)
+        self.digests_sent = 0
+        self.conditions_suppressed = 0
+        self._lock = threading.Lock()
+        self._pending = {}   # condition -> {"first", "last", "count", "cleared"}
+        self._metrics = {}   # metric -> {"min", "max", "current", "samples"}
+        self._active = set()
+        self._sent = {}      # condition -> deque of digest times
+        self._window_start = None
+        self._timer = None
+
+    def _observe(self, metric, value):
+        stats = self._metrics.get(metric)
+        if stats is None:
+            stats = self._metrics[metric] = {"min": value, "max": value, "current": value, "samples": 0}
+        if isinstance(value, (int, float)):
+            if not isinstance(stats["min"], (int, float)) or value < stats["min"]:
+                stats["min"] = value
+            if not isinstance(stats["max"], (int, float)) or value > stats["max"]:
+                stats["max"] = value
+        stats["current"] = value
+        stats["samples"] += 1
+
+    # Feed one evaluation: the metric that changed and every condition firing now
+    def record(self, metric, value, fired, now=None):
+        now = time.time() if now is None else now
+        fired = set(fired)
+        with self._lock:
+            self._observe(metric, value)
+            for condition in fired:
+                entry = self._pending.get(condition)
+                if entry is None:
+                    entry = self._pending[condition] = {"first": now, "last": now, "count": 0, "cleared": False}
+                entry["last"] = now
+                entry["count"] += 1
+                entry["cleared"] = False
+            for condition in self._active - fired:
+                # Send times stay until they leave the rate period, so a
+                # flapping condition cannot get past the limit
+                if condition in self._pending:
+                    self._pending[condition]["cleared"] = True
+            self._active = fired
+            if self._pending and self._timer is None:
+                self._window_start = now
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _allow(self, condition, now):
+        sent = self._sent.setdefault(condition, deque())
+        while sent and now - sent[0] >= self.rate_period:
+            sent.popleft()
+        if len(sent) >= self.rate_limit:
+            return False
+        sent.append(now)
+        return True
+
+    def _severity(self, conditions):
+        return {c: SEVERITY.get(self.rule_status(c), 1) for c in conditions}
+
+    # Severity, current readings and conditions of a digest, for the
+    # channels that take structured alerts. The id is derived from the
+    # conditions and the window, so every channel and every retry of one
+    # digest carry the same id.
+    def _details(self, conditions):
+        return {
+            "id": digest_id(conditions, self._window_start),
+            "severity": STATUSES[max(self._severity(conditions).values())],
+            "metrics": {metric: stats["current"] for metric, stats in sorted(self._metrics.items())},
+            "conditions": sorted(conditions),
+        }
+
+    def _format(self, conditions):
+        severity = self._severity(conditions)
+        worst_status = STATUSES[max(severity.values())]
+        subject = f"Health Monitoring Alert: {worst_status} ({len(conditions)} condition{'s' if len(conditions) != 1 else ''})"
+        lines = ["Health Alert!", "", "Conditions:"]
+        order = sorted(conditions, key=lambda c: (-severity[c], conditions[c]["first"], c))
+        for condition in order:
+            entry = conditions[condition]
+            state = "cleared" if entry["cleared"] else "active"
+            lines.append(
+                f"- {condition} [{STATUSES[severity[condition]]}, {state}]: in {entry['count']} readings "
+                f"from {time.strftime('%H:%M:%S', time.localtime(entry['first']))} "
+                f"to {time.strftime('%H:%M:%S', time.localtime(entry['last']))}"
+            )
+        lines += ["", "Readings (min / max / current):"]
+        for metric, stats in sorted(self._metrics.items()):
+            if isinstance(stats["current"], (int, float)):
+                lines.append(f"- {metric}: {stats['min']:.2f} / {stats['max']:.2f} / {stats['current']:.2f}")
+            else:
+                lines.append(f"- {metric}: {stats['current']}")
+        lines += ["", "Please take immediate action."]
+        return subject, "\n".join(lines)
+
+    # Send everything collected so far as one email, runs on the window timer
+    def flush(self):
+        with self._lock:
+            self._timer = None
+            now = time.time()
+            conditions = {c: entry for c, entry in self._pending.items() if self._allow(c, now)}
+            self.conditions_suppressed += len(self._pending) - len(conditions)
+            self._pending = {}
+            message = self._format(conditions) if conditions else None
+            details = self._details(conditions) if conditions else None
+            # Next window starts from the current readings
+            for stats in self._metrics.values():
+                stats["min"] = stats["max"] = stats["current"]
+                stats["samples"] = 0
+            if message is not None:
+                self.digests_sent += 1
+        if message is not None:
+            self.send(*message, **details)
+        return message
+
+    def stats(self):
+        with self._lock:
+            return {
+                "digests_sent": self.digests_sent,
+                "conditions_suppressed": self.conditions_suppressed,
+                "pending": len(self._pending),
+            }
+
+    # Send whatever is pending now instead of waiting for the window
+    def close(self):
+        with self._lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        self.flush()
@@ -0,0 +1,199 @@
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from collections import OrderedDict, deque
+
+# Unix datagram socket command_server.py receives alert events on
+ALERT_EVENTS_PATH = os.getenv("ALERT_EVENTS_SOCKET", "/tmp/patient_alerts.sock")
+ALERT_HISTORY = 50      # Recent alerts kept; unacknowledged ones are sent to clients that join later
+MAX_DATAGRAM = 65536
+ALERT_STATUSES = ("Warning", "Critical")
+
+
+# Monitor side: sends an alert event to command_server.py as soon as the
+# debounced status turns Warning or Critical, or moves between the two.
+# Unlike the email, webhook and MQTT digests nothing is collected or rate
+# limited here, and sending never blocks; with no server listening the
+# event is dropped.
+class AlertEventSender:
+    def __init__(self, path=ALERT_EVENTS_PATH):
+        self.path = path
+        self.status = None
+        self.sent = 0
+        self.failed = 0
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+
+    # Feed every debounced status with the current readings and the
+    # conditions firing; returns the event when one was sent
+    def update(self, status, metrics, conditions):
+        if status == self.status:
+            return None
+        self.status = status
+        if status not in ALERT_STATUSES:
+            return None
+        event = {
+            "id": uuid.uuid4().hex,
+            "severity": status,
+            "metrics": metrics,
+            "conditions": sorted(conditions),
+            "timestamp": time.time(),
+            "subject": f"Health Monitoring Alert: {status}",
+        }
+        try:
+            self._sock.sendto(json.dumps(event).encode(), self.path)
+        except OSError:
+            self.failed += 1
+            return None
+        self.sent += 1
+        return event
+
+    def stats(self):
+        return {"sent": self.sent, "failed": self.failed}
+
+    def close(self):
+        self._sock.close()
+
+
+# command_server.py side: receives the alert events the monitors send (see
+# AlertEventSender) and pushes each one to every client streaming alerts,
+# as soon as it arrives. Clients acknowledge an alert by
+# id; the acknowledgement goes to every client too, so all UIs clear it.
+class AlertEvents:
+    def __init__(self, path=ALERT_EVENTS_PATH):
+        self.path = path
+        self.alerts = OrderedDict()  # id -> event, oldest first
+        self.version = 0
+        self.changes = deque(maxlen=ALERT_HISTORY)  # (version, message) for the streams
+        self.received = 0
+        self.acknowledged = 0
+        self.subscribers = 0
+        self.resyncs = 0  # Streams that fell behind and got the whole state again
+        self._sock = None
+        self._loop = None
+        self._event = asyncio.Event()
+
+    @property
+    def listening(self):
+        return self._sock is not None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            if os.path.exists(self.path):
+                os.unlink(self.path)  # Left over from a previous run
+            sock.bind(self.path)
+            os.chmod(self.path, 0o666)  # Monitors may run as another user
+            sock.setblocking(False)
+        except OSError as e:
+            sock.close()
+            print(f"Alert events unavailable: {e}")
+            return self
+        self._sock = sock
+        self._loop.add_reader(sock.fileno(), self._on_readable)
+        return self
+
+    def _on_readable(self):
+        while True:
+            try:
+                datagram = self._sock.recv(MAX_DATAGRAM)
+            except OSError:
+                break
+            try:
+                event = json.loads(datagram)
+            except ValueError:
+                continue
+            if isinstance(event, dict) and event.get("id"):
+                self.publish(event)
+
+    def _push(self, message):
+        self.version += 1
+        self.changes.append((self.version, message))
+        # Wake every stream waiting on the current event, later waiters get a new one
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    # A new alert, from a monitor or from within this process
+    def publish(self, event):
+        event = dict(event, acked=None)
+        self.alerts[event["id"]] = event
+        self.alerts.move_to_end(event["id"])
+        while len(self.alerts) > ALERT_HISTORY:
+            self.alerts.popitem(last=False)
+        self.received += 1
+        self._push(json.dumps({"Alert": event}))
+
+    # Returns False for an unknown (or long gone) alert id. Acknowledging
+    # twice is fine, only the first one is announced.
+    def ack(self, alert_id, by=None):
+        event = self.alerts.get(alert_id) if isinstance(alert_id, str) else None
+        if event is None:
+            return False
+        if event["acked"] is None:
+            event["acked"] = {"by": by, "timestamp": time.time()}
+            self.acknowledged += 1
+            self._push(json.dumps({"AlertAck": {"id": alert_id, **event["acked"]}}))
+        return True
+
+    # Every alert kept: the unacknowledged ones, and with acks the
+    # acknowledgements of the others
+    async def _send_state(self, websocket, acks=False):
+        for event in list(self.alerts.values()):
+            if event["acked"] is None:
+                await websocket.send(json.dumps({"Alert": event}))
+            elif acks:
+                await websocket.send(json.dumps({"AlertAck": {"id": event["id"], **event["acked"]}}))
+
+    # Stream alerts and acknowledgements to one connection (a ClientSender)
+    # until cancelled, starting with the alerts nobody acknowledged yet
+    async def stream(self, websocket):
+        self.subscribers += 1
+        seen = self.version
+        try:
+            await self._send_state(websocket)
+            while True:
+                if self.version == seen:
+                    await self._event.wait()
+                    continue
+                changes = list(self.changes)
+                if changes[0][0] > seen + 1:
+                    # More than ALERT_HISTORY changes since the last wakeup,
+                    # the ones in between are gone: send the current state
+                    self.resyncs += 1
+                    seen = self.version
+                    await self._send_state(websocket, acks=True)
+                    continue
+                for version, message in changes:
+                    if version > seen:
+                        # Never replaced or dropped by the ClientSender, a
+                        # client that falls that far behind is disconnected
+                        # and gets every unacknowledged alert on reconnect
+                        await websocket.send(message)
+                        seen = version
+        finally:
+            self.subscribers -= 1
+
+    def stats(self):
+        return {
+            "listening": self.listening,
+            "received": self.received,
+            "acknowledged": self.acknowledged,
+            "unacknowledged": sum(1 for event in self.alerts.values() if event["acked"] is None),
+            "subscribers": self.subscribers,
+            "resyncs": self.resyncs,
+        }
+
+    def close(self):
+        if self._sock is None:
+            return
+        self._loop.remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,235 @@
+import os
+import queue
+import smtplib
+import sqlite3
+import threading
+import time
+import uuid
+
+from smtp_session import KEEPALIVE_INTERVAL, SmtpSession
+from send_mail import EMAIL_ADDRESS, RECIPIENT_EMAIL, build_message
+
+OUTBOX_PATH = os.getenv("ALERT_OUTBOX_DB", "/home/pi/PatientConditionProject/alert_outbox.db")
+BATCH_SIZE = 50
+BASE_BACKOFF = 2       # Seconds before the first retry, doubled per attempt
+MAX_BACKOFF = 900
+MAX_ATTEMPTS = 30      # About 5.3 hours of retries (2 s doubling up to 15 min) before an alert is marked failed
+KEEP_SENT_FOR = 7 * 24 * 3600
+SUBMIT_QUEUE_SIZE = 64
+
+STOP = object()  # Queued by close()
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id TEXT PRIMARY KEY,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    next_attempt REAL NOT NULL,
+    sent_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS alerts_due ON alerts (state, next_attempt);
+"""
+
+
+def open_db(path=OUTBOX_PATH):
+    conn = sqlite3.connect(path, timeout=5)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+# Persistent alert outbox. submit() only hands the alert to the worker
+# thread, which stores it in SQLite (WAL mode) and sends everything that is
+# due over one SMTP session. Failed sends are retried with exponential
+# backoff, so alerts raised while the network is down go out as one batch
+# when it comes back, even across restarts.
+class AlertOutbox:
+    def __init__(
+        self,
+        path=OUTBOX_PATH,
+        session=None,
+        sender=EMAIL_ADDRESS,
+        recipient=RECIPIENT_EMAIL,
+        max_attempts=MAX_ATTEMPTS,
+        keepalive=KEEPALIVE_INTERVAL,
+    ):
+        self.path = path
+        self.session = session or SmtpSession()
+        self.sender = sender
+        self.recipient = recipient
+        self.max_attempts = max_attempts
+        self.keepalive = keepalive
+        self.dropped = 0
+        self._submitted = queue.Queue(maxsize=SUBMIT_QUEUE_SIZE)
+        self._callbacks = {}  # delivery id -> on_sent, only for this process
+        self._stop = threading.Event()
+        self._retry_after = 0  # Backs off the whole outbox while SMTP is down
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="alert-outbox", daemon=True)
+            self._thread.start()
+        return self
+
+    # Queue an alert and return its delivery id straight away. Submitting the
+    # same delivery id twice stores and sends it only once.
+    def submit(self, subject, body, on_sent=None, delivery_id=None):
+        delivery_id = delivery_id or uuid.uuid4().hex
+        try:
+            self._submitted.put_nowait((delivery_id, subject, body, on_sent, time.time()))
+        except queue.Full:
+            self.dropped += 1
+            print(f"Alert outbox queue full, dropped email: {subject}")
+            return None
+        return delivery_id
+
+    def _store(self, conn, first=None):
+        rows = []
+        item = first
+        while True:
+            if item is None:
+                try:
+                    item = self._submitted.get_nowait()
+                except queue.Empty:
+                    break
+            if item is STOP:
+                item = None
+                self._stop.set()
+                continue
+            delivery_id, subject, body, on_sent, created = item
+            if on_sent is not None:
+                self._callbacks[delivery_id] = on_sent
+            rows.append((delivery_id, subject, body, created, created))
+            item = None
+        if rows:
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO alerts (id, subject, body, created, next_attempt) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    def _message(self, delivery_id, subject, body):
+        msg = build_message(subject, body, self.sender, self.recipient)
+        # Stable Message-ID so a resend after an unclear failure can be deduplicated
+        msg["Message-ID"] = f"<{delivery_id}@patient-monitor>"
+        return msg
+
+    def _on_sent(self, delivery_id, subject):
+        callback = self._callbacks.pop(delivery_id, None)
+        if callback is None:
+            return
+        try:
+            callback(subject)
+        except Exception as e:
+            print(f"Email sent callback failed: {e}")
+
+    # Send every due alert, oldest first, stopping at the first SMTP failure
+    def _send_due(self, conn):
+        now = time.time()
+        if now < self._retry_after:
+            return
+        due = conn.execute(
+            "SELECT id, subject, body, attempts FROM alerts "
+            "WHERE state = ? AND next_attempt <= ? ORDER BY created LIMIT ?",
+            (PENDING, now, BATCH_SIZE),
+        ).fetchall()
+        for delivery_id, subject, body, attempts in due:
+            try:
+                self.session.send(self._message(delivery_id, subject, body))
+            except (smtplib.SMTPException, OSError) as e:
+                attempts += 1
+                state = FAILED if attempts >= self.max_attempts else PENDING
+                next_attempt = time.time() + min(BASE_BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+                with conn:
+                    conn.execute(
+                        "UPDATE alerts SET state = ?, attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                        (state, attempts, next_attempt, str(e), delivery_id),
+                    )
+                self._retry_after = next_attempt
+                print(f"Error sending email, retry {attempts} in {next_attempt - time.time():.0f}s: {e}")
+                return
+            with conn:
+                conn.execute(
+                    "UPDATE alerts SET state = ?, attempts = attempts + 1, sent_at = ?, last_error = NULL WHERE id = ?",
+                    (SENT, time.time(), delivery_id),
+                )
+            print(f"Email sent successfully to {self.recipient}.")
+            self._on_sent(delivery_id, subject)
+
+    def _next_wakeup(self, conn):
+        row = conn.execute(
+            "SELECT MIN(next_attempt) FROM alerts WHERE state = ?", (PENDING,)
+        ).fetchone()
+        wake = self.keepalive
+        if row[0] is not None:
+            wake = min(wake, max(row[0], self._retry_after) - time.time())
+        return max(wake, 0.05)
+
+    def _purge(self, conn):
+        with conn:
+            conn.execute("DELETE FROM alerts WHERE state = ? AND sent_at < ?", (SENT, time.time() - KEEP_SENT_FOR))
+
+    def _run(self):
+        conn = open_db(self.path)
+        self._purge(conn)
+        item = None
+        try:
+            while not self._stop.is_set():
+                self._store(conn, item)
+                self._send_due(conn)
+                if self._stop.is_set():
+                    break
+                try:
+                    item = self._submitted.get(timeout=self._next_wakeup(conn))
+                except queue.Empty:
+                    item = None
+                    self.session.keepalive()
+            self._store(conn)
+        finally:
+            self.session.close()
+            conn.close()
+
+    # Delivery state of one alert: {"state", "attempts", "sent_at", "last_error"}
+    def status(self, delivery_id):
+        conn = open_db(self.path)
+        try:
+            row = conn.execute(
+                "SELECT state, attempts, sent_at, last_error FROM alerts WHERE id = ?", (delivery_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return {"state": row[0], "attempts": row[1], "sent_at": row[2], "last_error": row[3]}
+
+    # Number of alerts per state, answered from the (state, next_attempt) index
+    def counts(self):
+        conn = open_db(self.path)
+        try:
+            rows = conn.execute("SELECT state, COUNT(*) FROM alerts GROUP BY state").fetchall()
+        finally:
+            conn.close()
+        counts = {PENDING: 0, SENT: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    # Store anything still queued and stop, unsent alerts stay in the outbox
+    def close(self, timeout=5):
+        if self._thread is None:
+            return
+        try:
+            self._submitted.put(STOP, timeout=timeout)
+        except queue.Full:
+            self._stop.set()
+        self._thread.join(timeout=timeout)
+        self._thread = None
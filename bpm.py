@@ -7,21 +7,17 @@ from adafruit_ads1x15.analog_in import AnalogIn
 import adafruit_ssd1306
 from PIL import Image, ImageDraw, ImageFont
 import RPi.GPIO as GPIO
+from indicators import IndicatorController
+from monitor_log import get_logger, shutdown_logging
+from vitals_shm import VitalsWriter
+from status_rules import RuleEngine
+from status_debounce import StatusDebouncer
 import signal
 import sys
 
-# LED and buzzer pin definitions
-green_led = 17  # GPIO 17
-yellow_led = 27  # GPIO 27
-red_led = 22    # GPIO 22
-buzzer_pin = 23 # GPIO 23
-
-# GPIO setup for LEDs and buzzer
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(green_led, GPIO.OUT)
-GPIO.setup(yellow_led, GPIO.OUT)
-GPIO.setup(red_led, GPIO.OUT)
-GPIO.setup(buzzer_pin, GPIO.OUT)
+# LED and buzzer controller for pins 17, 27, 22 and 23, only writes pins that change
+indicators = IndicatorController(GPIO)
+indicators.setup()
 
 # Initialize I2C bus, ADC and Oled Display
 i2c = busio.I2C(board.SCL, board.SDA)
@@ -44,26 +40,33 @@ first_pulse = True
 # GSR threshold for detecting human interaction
 gsr_human_threshold = 13000  # Adjust based on your observations
 
+# Structured key=value logging; records go through a queue to a writer thread
+# and repetitive lines are rate limited, so sensor loops never block on stdout
+log = get_logger("bpm")
+
+# Shared-memory vitals record read by command_server.py
+vitals = VitalsWriter()
+
 # Lock for synchronizing data access
 data_lock = threading.Lock()
 running = True
 
+# Status thresholds are loaded from thresholds.json, the debouncer applies
+# hysteresis and minimum dwell times before the LEDs, buzzer or alerts react
+rules = RuleEngine()
+debouncer = StatusDebouncer(rules)
+
 # Function to set LED and buzzer based on status
 def set_leds_and_buzzer(status):
-    GPIO.output(green_led, GPIO.HIGH if status == "Normal" else GPIO.LOW)
-    GPIO.output(yellow_led, GPIO.HIGH if status == "Warning" else GPIO.LOW)
-    GPIO.output(red_led, GPIO.HIGH if status == "Critical" else GPIO.LOW)
-    GPIO.output(buzzer_pin, GPIO.HIGH if status == "Critical" else GPIO.LOW)
+    indicators.show_status(status)
 
-# Update status based on BPM value
+# Update status based on BPM value, a zero BPM means no reading
 def update_status():
     global status
-    if bpm_value < 50 or bpm_value > 120:
-        status = "Critical"
-    elif 50 <= bpm_value < 60 or 100 < bpm_value <= 120:
-        status = "Warning"
+    if bpm_value:
+        status, _ = debouncer.update("bpm", bpm_value)
     else:
-        status = "Normal"
+        status, _ = debouncer.clear("bpm")
     set_leds_and_buzzer(status)
 
 # Function to check human interaction using GSR sensor
@@ -99,11 +102,10 @@ def monitor_heart_rate():
                         bpm_history.append(bpm_value)
                         if len(bpm_history) > 20:  # Limit history length
                             bpm_history.pop(0)
-                        print(f"Heart Rate: {bpm_value:.2f} BPM")
+                        log.debug("heart_rate", bpm=bpm_value)
                     
-                    # Write the current BPM value to a file
-                    with open("/home/pi/PatientConditionProject/bpm_data.txt", "w") as f:
-                        f.write(str(bpm_value))
+                    # Publish the current BPM value for command_server.py
+                    vitals.update(bpm=bpm_value)
                     
                     # Update status based on new BPM value
                     update_status()
@@ -113,8 +115,8 @@ def monitor_heart_rate():
                 update_status()  # Update the status to reflect no interaction
 
             time.sleep(0.1)
-        except OSError:
-            print("Heart Rate error, reinitializing...")
+        except OSError as e:
+            log.warning("heart_rate_error", error=e, action="reinitializing")
             time.sleep(1)
 
 # OLED Display Thread with Compact Layout for 128x32 Display
@@ -164,8 +166,9 @@ def update_display():
 def cleanup_and_exit(signum, frame):
     global running
     running = False
-    set_leds_and_buzzer("Normal")  # Turn off all LEDs and buzzer on exit
+    indicators.close()  # Turn off all LEDs and buzzer on exit
     GPIO.cleanup()
+    shutdown_logging()
     sys.exit(0)
 
 # Main function to start threads for heart rate monitoring and display updating
@@ -185,5 +188,5 @@ if __name__ == "__main__":
         display_thread.join()
 
     except KeyboardInterrupt:
-        print("Monitoring stopped.")
+        log.info("monitoring_stopped")
         cleanup_and_exit(None, None)
\ No newline at end of file
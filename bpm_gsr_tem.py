@@ -9,20 +9,15 @@ import adafruit_mlx90614
 import adafruit_ssd1306
 from PIL import Image, ImageDraw, ImageFont
 import RPi.GPIO as GPIO
+from indicators import IndicatorController
+from monitor_log import get_logger, shutdown_logging
+from status_rules import RuleEngine
+from status_debounce import StatusDebouncer
 import signal
 
-# LED and buzzer pin definitions
-green_led = 17  # GPIO 17
-yellow_led = 27  # GPIO 27
-red_led = 22    # GPIO 22
-buzzer_pin = 23 # GPIO 23
-
-# GPIO setup for LEDs and buzzer
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(green_led, GPIO.OUT)
-GPIO.setup(yellow_led, GPIO.OUT)
-GPIO.setup(red_led, GPIO.OUT)
-GPIO.setup(buzzer_pin, GPIO.OUT)
+# LED and buzzer controller for pins 17, 27, 22 and 23, only writes pins that change
+indicators = IndicatorController(GPIO)
+indicators.setup()
 
 # Initialize I2C bus and sensors
 i2c = busio.I2C(board.SCL, board.SDA)
@@ -49,10 +44,6 @@ smoothed_bpm = 0  # Initialize for low-pass filter
 is_above_threshold = False  # Flag for detecting pulse peaks
 bpm_values = []  # Store recent BPM values for moving average
 
-# BPM thresholds for status levels
-normal_bpm_range = (60, 100)
-warning_bpm_range = (50, 120)
-
 # Temperature threshold settings
 HUMAN_TEMP_RANGE = (35.8, 40.0)
 HUMAN_TEMP_THRESHOLD_OFFSET = 2.5
@@ -68,10 +59,19 @@ GSR_AVERAGE_COUNT = 10  # Number of GSR readings to average for interaction chec
 # Flag to check if cleanup has already been done
 cleaned_up = False
 
+# Structured key=value logging; records go through a queue to a writer thread
+# and repetitive lines are rate limited, so sensor loops never block on stdout
+log = get_logger("bpm_gsr_tem")
+
 # Lock for synchronizing data access
 data_lock = threading.Lock()
 running = True
 
+# Status thresholds are loaded from thresholds.json, the debouncer applies
+# hysteresis and minimum dwell times before the LEDs, buzzer or alerts react
+rules = RuleEngine()
+debouncer = StatusDebouncer(rules)
+
 # Function to read and average multiple BPM samples
 def read_bpm_avg(samples=5):
     voltages = [AnalogIn(adc, 0).voltage for _ in range(samples)]
@@ -102,43 +102,19 @@ def detect_pulse(voltage):
 
 # Function to control LEDs and buzzer based on status and interaction status
 def set_leds_and_buzzer(status, interaction):
-    if interaction:  # Only trigger LEDs and buzzer if human interaction is detected
-        if status == "Normal":
-            GPIO.output(green_led, GPIO.HIGH)
-            GPIO.output(yellow_led, GPIO.LOW)
-            GPIO.output(red_led, GPIO.LOW)
-            GPIO.output(buzzer_pin, GPIO.LOW)
-        elif status == "Warning":
-            GPIO.output(green_led, GPIO.LOW)
-            GPIO.output(yellow_led, GPIO.HIGH)
-            GPIO.output(red_led, GPIO.LOW)
-            GPIO.output(buzzer_pin, GPIO.LOW)
-        elif status == "Critical":
-            GPIO.output(green_led, GPIO.LOW)
-            GPIO.output(yellow_led, GPIO.LOW)
-            GPIO.output(red_led, GPIO.HIGH)
-            GPIO.output(buzzer_pin, GPIO.HIGH)
-    else:
-        # Turn off all LEDs and buzzer if there is no human interaction
-        GPIO.output(green_led, GPIO.LOW)
-        GPIO.output(yellow_led, GPIO.LOW)
-        GPIO.output(red_led, GPIO.LOW)
-        GPIO.output(buzzer_pin, GPIO.LOW)
-
-# Update status based on BPM, GSR, and Temperature using ranges
-def update_status():
+    indicators.show_status(status, interaction)
+
+# Update status after one metric changed, thresholds come from thresholds.json
+def update_status(metric, value):
     global status
-    if human_interaction:
-        if bpm_value < warning_bpm_range[0] or bpm_value > warning_bpm_range[1] or stress_level == "High" or temperature_value > 39:
-            status = "Critical"
-        elif bpm_value < normal_bpm_range[0] or bpm_value > normal_bpm_range[1] or stress_level == "Elevated" or temperature_value > 38.7:
-            status = "Warning"
-        else:
-            status = "Normal"
-    else:
-        status = "Normal"
+    new_status, fired = debouncer.update(metric, value)
+    # No human interaction: force "Normal" status
+    status = new_status if human_interaction else "Normal"
+
+    # Log status if it's "Warning" or "Critical", repeats are rate limited
     if status != "Normal":
-        print(f"Status: {status}, BPM: {bpm_value:.2f}, Temperature: {temperature_value:.2f}C, Stress Level: {stress_level}")
+        log.info("status", status=status, bpm=bpm_value, temperature=temperature_value, stress=stress_level, rules=",".join(fired))
+
     set_leds_and_buzzer(status, human_interaction)
 
 # Heart Rate Monitoring with smoothing and filtering
@@ -164,11 +140,11 @@ def monitor_heart_rate():
                         bpm_history.append(bpm_value)
                         if len(bpm_history) > 20:
                             bpm_history.pop(0)
-                        print(f"Heart Rate: {bpm_value:.2f} BPM")
-                    update_status()
+                        log.debug("heart_rate", bpm=bpm_value)
+                    update_status("bpm", bpm_value)
             time.sleep(0.1)
-        except OSError:
-            print("Heart Rate error, reinitializing...")
+        except OSError as e:
+            log.warning("heart_rate_error", error=e, action="reinitializing")
             time.sleep(1)
 
 # Function to dynamically adjust temperature threshold
@@ -195,7 +171,7 @@ def monitor_temperature():
         with data_lock:
             if HUMAN_TEMP_RANGE[0] <= object_temp <= HUMAN_TEMP_RANGE[1] and object_temp > dynamic_threshold:
                 temperature_value = object_temp
-                print(f"Human Body Temperature: {temperature_value:.2f}°C")
+                log.debug("body_temperature", celsius=temperature_value)
                 temperature_history.append(temperature_value)
                 if len(temperature_history) > 20:
                     temperature_history.pop(0)
@@ -203,13 +179,13 @@ def monitor_temperature():
             else:
                 no_detection_count += 1
                 temperature_value = 0
-                print("No human body detected.")
+                log.debug("no_human_body", object_temp=object_temp)
 
             if no_detection_count >= MAX_ATTEMPTS:
                 HUMAN_TEMP_THRESHOLD_OFFSET += 0.1
                 no_detection_count = 0
 
-        update_status()
+        update_status("temperature", temperature_value)
         time.sleep(1)
 
 # Function to determine stress level based on GSR reading
@@ -241,11 +217,11 @@ def monitor_gsr():
             gsr_readings = [read_gsr() for _ in range(GSR_AVERAGE_COUNT)]
             avg_gsr = sum(gsr_readings) / GSR_AVERAGE_COUNT
             stress_level = determine_stress_level(avg_gsr)
-            with data_lock:
-                print(f"GSR Avg: {avg_gsr:.2f}, Stress Level: {stress_level}, Interaction: {human_interaction}")
+            debouncer.update("stress", stress_level)
+            log.debug("gsr", avg=avg_gsr, stress=stress_level, interaction=human_interaction)
             time.sleep(3)
-        except OSError:
-            print("GSR error, reinitializing...")
+        except OSError as e:
+            log.warning("gsr_error", error=e, action="reinitializing")
             time.sleep(1)
             
 # OLED Display Thread with Compact Layout for 128x32 Display
@@ -274,15 +250,13 @@ def cleanup_and_exit(signum, frame):
         return
     cleaned_up = True
     running = False
-    print("Stop Measuring")
+    log.info("monitoring_stopped")
     try:
-        GPIO.output(green_led, GPIO.LOW)
-        GPIO.output(yellow_led, GPIO.LOW)
-        GPIO.output(red_led, GPIO.LOW)
-        GPIO.output(buzzer_pin, GPIO.LOW)
+        indicators.close()
         GPIO.cleanup()
     except RuntimeError:
         pass
+    shutdown_logging()
     sys.exit(0)
 
 # Main function to start monitoring and display threads
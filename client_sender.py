@@ -0,0 +1,189 @@
+import asyncio
+import itertools
+from collections import OrderedDict
+
+MAX_QUEUE = 32         # Messages waiting for one client, the oldest replaceable one is dropped beyond that
+SEND_TIMEOUT = 5.0     # Seconds one send may take before it counts as stuck
+STUCK_SECONDS = 15.0   # A client whose sends stay stuck this long is disconnected
+CLOSE_TIMEOUT = 2.0
+
+VALUES = "values"  # Queue slot of the merged per-metric values
+
+
+# Outbound side of one WebSocket connection. Streams put messages into a
+# bounded queue and one writer task sends them, each send with a timeout.
+# While the client lags, newer messages replace queued ones with the same key
+# and metric values are merged to the latest per metric, so memory stays flat
+# however slow the client is. A shared page frame skips the queue and is sent
+# from the stream's own task while the client keeps up (see send_now).
+class ClientSender:
+    def __init__(self, websocket, name=None):
+        self.websocket = websocket
+        self.name = name
+        self.sent = 0
+        self.dropped = 0     # Lost to a full queue
+        self.coalesced = 0   # Replaced by a newer message or value before being sent
+        self.timeouts = 0
+        self.max_depth = 0
+        self.disconnected = False
+        self._queue = OrderedDict()
+        self._values = {}
+        self._encode = None
+        self._ids = itertools.count()
+        self._once = set()   # Keys of queued send() messages, never dropped
+        self._ready = asyncio.Event()
+        self._task = None
+        self._closer = None
+        self._sending = False
+        self._stuck_since = None
+
+    @property
+    def depth(self):
+        return len(self._queue) - (VALUES in self._queue) + len(self._values)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _put(self, key, message):
+        if self.disconnected:
+            return
+        if key in self._queue:
+            self.coalesced += 1
+        elif len(self._queue) >= MAX_QUEUE:
+            # Only a frame or values a later one would replace anyway may go
+            oldest = next((queued for queued in self._queue if queued not in self._once), None)
+            if oldest is None:
+                # Full of replies and alerts the client must not miss: close
+                # the connection, the client resyncs when it reconnects
+                self.disconnected = True
+                self._closer = asyncio.get_running_loop().create_task(self.disconnect())
+                return
+            if self._queue.pop(oldest) is None:
+                self.dropped += len(self._values)
+                self._values = {}
+            else:
+                self.dropped += 1
+        self._queue[key] = message
+        self.max_depth = max(self.max_depth, self.depth)
+        self._ready.set()
+
+    # Whether a message with this key is still waiting to be sent
+    def pending(self, key):
+        return key in self._queue
+
+    # A message that must not be replaced or dropped: command replies, alerts
+    async def send(self, message):
+        key = next(self._ids)
+        self._once.add(key)
+        self._put(key, message)
+
+    # A message only the newest of which matters, such as a page's frame
+    def send_latest(self, key, message):
+        self._put(key, message)
+
+    # send_latest for a caller that can await: while nothing is queued or
+    # being sent the message goes out from the caller's task, which saves
+    # waking the writer task for every frame. A lagging client gets it queued.
+    async def send_now(self, key, message):
+        if self._queue or self._sending:
+            self._put(key, message)
+        elif not self.disconnected:
+            await self._send(message)
+
+    # (seq, timestamp, metric, value) records, merged with the queued ones to
+    # the latest per metric; encode(records) turns them into messages when
+    # they are sent
+    def send_values(self, records, encode):
+        for record in records:
+            if record[2] in self._values:
+                self.coalesced += 1
+            self._values[record[2]] = record
+        self._encode = encode
+        if VALUES not in self._queue:
+            self._put(VALUES, None)
+        else:
+            self.max_depth = max(self.max_depth, self.depth)
+
+    async def _run(self):
+        while True:
+            if not self._queue:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            key, message = self._queue.popitem(last=False)
+            self._once.discard(key)
+            if key == VALUES:
+                messages = self._encode(sorted(self._values.values()))
+                self._values = {}
+            else:
+                messages = [message]
+            for message in messages:
+                if not await self._send(message):
+                    return
+
+    # One send with a timeout, False once the client is gone. A timer cancels
+    # the sending task rather than asyncio.wait_for, which starts a task for
+    # every send.
+    async def _send(self, message):
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        expired = []
+        timer = loop.call_later(SEND_TIMEOUT, _expire, task, expired)
+        self._sending = True
+        try:
+            await self.websocket.send(message)
+        except asyncio.CancelledError:
+            if not expired:
+                raise
+            if hasattr(task, "uncancel"):
+                task.uncancel()  # Python 3.11+ counts cancel requests
+            # The frame is already in the transport buffer, it was the wait
+            # for the buffer to drain that timed out
+            self.timeouts += 1
+            self._stuck_since = self._stuck_since or loop.time()
+            if loop.time() - self._stuck_since >= STUCK_SECONDS:
+                await self.disconnect()
+                return False
+            return True
+        except Exception:
+            return False  # Connection closed, the handler cleans up
+        finally:
+            timer.cancel()
+            self._sending = False
+        self._stuck_since = None
+        self.sent += 1
+        return True
+
+    async def disconnect(self):
+        self.disconnected = True
+        print(f"Disconnecting stuck client {self.name}: {self.stats()}")
+        try:
+            await asyncio.wait_for(self.websocket.close(), CLOSE_TIMEOUT)
+        except Exception:
+            transport = getattr(self.websocket, "transport", None)
+            if transport is not None:
+                transport.abort()
+
+    def stats(self):
+        return {
+            "client": self.name,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+        }
+
+
+# Timer side of ClientSender._send
+def _expire(task, expired):
+    expired.append(True)
+    task.cancel()
@@ -1,95 +1,121 @@
 import asyncio
 import websockets
 import json
-import subprocess
+from frame_codec import ENCODINGS
+from acquisition import SAMPLE_RATE
+from alert_events import AlertEvents
+from client_sender import ClientSender
+from service_control import ServiceControl
+import monitor_control
+from monitor_log import shutdown_logging
+from vitals_broadcast import SUBSCRIBE_METRICS, VitalsBroadcaster
+from waveform import WaveformStream
 
-# Global variables to retain the last known values for each metric
-last_bpm_value = 0.0
-last_temperature_value = 0.0
-last_stress_level = "None"
+# One producer for all connections: reads the vitals the monitor services
+# write (see vitals_shm.py) once per change and serializes each page once,
+# started once the server's event loop is running
+broadcaster = VitalsBroadcaster()
+# Live pulse waveform from the acquisition process's sample ring
+waveform = WaveformStream()
+# Alerts the monitors raise, pushed to every client streaming them
+alerts = AlertEvents()
+# Outbound queue of every connected client, for STATS
+clients = set()
 
-# Function to start a specific systemd service
-def start_service(service_name):
+# systemctl runs as an asyncio subprocess, requests per unit are coalesced
+services = ServiceControl()
+# Service stops left running after their client disconnected
+background_tasks = set()
+
+# With monitor_daemon.py running, its modes replace the monitor units: a
+# switch inside the resident process instead of a new interpreter.
+# Returns (ok, state or error) like the service control.
+async def daemon_request(command):
     try:
-        subprocess.run(["sudo", "systemctl", "start", service_name], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Error starting {service_name} service: {e}")
+        reply = await monitor_control.request(command)
+    except (OSError, ConnectionError, asyncio.TimeoutError, ValueError) as e:
+        return False, f"monitor daemon: {e}"
+    if "error" in reply:
+        return False, reply["error"]
+    return True, f"{reply['mode']} mode, switched in {reply['switch_ms']} ms"
+
+# Function to start a specific systemd service, returns (ok, state or error)
+# once the unit is active
+async def start_service(service_name):
+    mode = monitor_control.SERVICE_MODES.get(service_name)
+    if mode and monitor_control.daemon_running():
+        return await daemon_request(f"mode {mode}")
+    return await services.start(service_name)
+
+# Function to stop a specific systemd service, returns (ok, state or error)
+# once the unit is inactive
+async def stop_service(service_name):
+    mode = monitor_control.SERVICE_MODES.get(service_name)
+    if mode and monitor_control.daemon_running():
+        return await daemon_request(f"stop {mode}")
+    return await services.stop(service_name)
+
+# The Continuous page carries the alerts next to the vitals
+async def stream_continuous(sender, min_interval, encoding, resume):
+    await asyncio.gather(broadcaster.stream(sender, "Continuous", min_interval, encoding, resume), alerts.stream(sender))
+
+# Data task for one client: the waveform, or the vitals of a monitoring page.
+# The waveform is live only, resume applies to the vitals.
+def stream_page(sender, page, min_interval, encoding, decimation, resume=None):
+    if page == "Waveform":
+        return asyncio.create_task(waveform.stream(sender, decimation, encoding))
+    if page == "Continuous":
+        return asyncio.create_task(stream_continuous(sender, min_interval, encoding, resume))
+    return asyncio.create_task(broadcaster.stream(sender, page, min_interval, encoding, resume))
+
+# Data tasks for one client's subscriptions: the vitals in one stream, the
+# alerts and the waveform in their own
+def stream_subscriptions(sender, subscriptions, encoding, decimation, resume=None):
+    tasks = []
+    metrics = {metric: options for metric, options in subscriptions.items() if metric not in ("Waveform", "Alerts")}
+    if metrics:
+        tasks.append(asyncio.create_task(broadcaster.subscribe(sender, metrics, encoding, resume)))
+    if "Alerts" in subscriptions:
+        tasks.append(asyncio.create_task(alerts.stream(sender)))
+    if "Waveform" in subscriptions:
+        tasks.append(asyncio.create_task(waveform.stream(sender, decimation, encoding)))
+    return tasks
 
-# Function to stop a specific systemd service
-def stop_service(service_name):
+# Optional "resume": {"stream": ..., "seq": ...} of a reconnecting client,
+# the stream id and last "Seq" it got; None if absent or malformed
+def resume_point(data):
+    resume = data.get("resume")
+    if not isinstance(resume, dict):
+        return None
     try:
-        subprocess.run(["sudo", "systemctl", "stop", service_name], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Error stopping {service_name} service: {e}")
-
-# Function to send data based on the active monitoring page
-async def send_data(websocket, active_page):
-    global last_bpm_value, last_temperature_value, last_stress_level
-    while True:
-        try:
-            # Read and send data based on the active page
-            if active_page == "BPM":
-                with open("/home/pi/PatientConditionProject/bpm_data.txt", "r") as f:
-                    last_bpm_value = float(f.read().strip())
-                data = {"BPM": round(last_bpm_value, 3)}
-            elif active_page == "Temperature":
-                with open("/home/pi/PatientConditionProject/temperature_data.txt", "r") as f:
-                    last_temperature_value = float(f.read().strip())
-                data = {"Temperature": round(last_temperature_value, 3)}
-            elif active_page == "GSR":
-                with open("/home/pi/PatientConditionProject/gsr_data.txt", "r") as f:
-                    last_stress_level = f.read().strip()
-                data = {"Stress": last_stress_level}
-            elif active_page == "Continuous":
-                # For Continuous Monitoring, send all three data points
-                with open("/home/pi/PatientConditionProject/bpm_data.txt", "r") as f:
-                    last_bpm_value = float(f.read().strip())
-                with open("/home/pi/PatientConditionProject/temperature_data.txt", "r") as f:
-                    last_temperature_value = float(f.read().strip())
-                with open("/home/pi/PatientConditionProject/gsr_data.txt", "r") as f:
-                    last_stress_level = f.read().strip()
-                data = {
-                    "BPM": round(last_bpm_value, 3),
-                    "Temperature": round(last_temperature_value, 3),
-                    "Stress": last_stress_level
-                }
-                # Check for email sent flag
-                try:
-                    with open("/home/pi/PatientConditionProject/email_sent_flag.txt", "r") as email_flag:
-                        flag = email_flag.read().strip()
-                        if flag == "1":
-                            # Notify the WebSocket client that an email was sent
-                            data["EmailAlert"] = "An alert email was sent"
-                            # Reset the flag
-                            with open("/home/pi/PatientConditionProject/email_sent_flag.txt", "w") as reset_flag:
-                                reset_flag.write("0")
-                except FileNotFoundError:
-                    pass  # If the flag file doesn't exist, continue without notification
-            else:
-                data = {}  # No data if there's no active monitoring page
-
-            await websocket.send(json.dumps(data))
-            await asyncio.sleep(1)
-        except (FileNotFoundError, ValueError):
-            # Send the last known values if file read fails
-            if active_page == "BPM":
-                await websocket.send(json.dumps({"BPM": round(last_bpm_value, 3)}))
-            elif active_page == "Temperature":
-                await websocket.send(json.dumps({"Temperature": round(last_temperature_value, 3)}))
-            elif active_page == "GSR":
-                await websocket.send(json.dumps({"Stress": last_stress_level}))
-            elif active_page == "Continuous":
-                await websocket.send(json.dumps({
-                    "BPM": round(last_bpm_value, 3),
-                    "Temperature": round(last_temperature_value, 3),
-                    "Stress": last_stress_level
-                }))
+        return str(resume.get("stream")), int(resume["seq"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+# Metric names of a SUBSCRIBE/UNSUBSCRIBE message, None if any is unknown.
+# UNSUBSCRIBE without metrics means all of them.
+def subscription_metrics(data):
+    names = data.get("metrics")
+    if names is None and data.get("command") == "UNSUBSCRIBE":
+        return list(SUBSCRIBE_METRICS.values())
+    if not isinstance(names, list) or not names:
+        return None
+    metrics = [SUBSCRIBE_METRICS.get(str(name).lower()) for name in names]
+    return None if None in metrics else metrics
 
 # WebSocket handler for managing incoming commands from the client
 async def command_handler(websocket, _):
+    # Everything to this client goes through its bounded send queue
+    sender = ClientSender(websocket, name=str(getattr(websocket, "remote_address", None))).start()
+    clients.add(sender)
     active_service = None  # Track the currently active service
     data_task = None       # Task for streaming data
     active_page = None     # Track the active page
+    min_interval = 0       # Shortest time between pushes this client asked for
+    encoding = "json"      # Data frame encoding this client negotiated
+    decimation = 1         # Waveform: send every n-th sample
+    subscriptions = {}     # SUBSCRIBE metric -> (min_interval, on_change)
+    subscription_tasks = []
 
     try:
         async for message in websocket:
@@ -103,7 +129,9 @@ async def command_handler(websocket, _):
                 "BPM": "heart_rate_monitor.service",
                 "Temperature": "temperature_monitor.service",
                 "GSR": "gsr_monitor.service",
-                "Continuous": "continuous_monitor.service"
+                "Continuous": "continuous_monitor.service",
+                # Needs ACQUISITION_MODE=process, the waveform comes from its sample ring
+                "Waveform": "continuous_monitor.service"
             }
             service_name = service_map.get(page)
 
@@ -111,35 +139,64 @@ async def command_handler(websocket, _):
             if command == "START_MONITORING" and service_name:
                 # Stop any previously active service if different from the requested one
                 if active_service and active_service != service_name:
-                    stop_service(active_service)
+                    await stop_service(active_service)
+
+                # Optional "min_interval" in seconds caps this client's push rate
+                try:
+                    min_interval = max(float(data.get("min_interval", 0)), 0)
+                except (TypeError, ValueError):
+                    min_interval = 0
 
-                # Start the requested service and update active page/service
-                start_service(service_name)
+                # Optional "encoding": "binary" switches data to the compact
+                # frames in frame_codec.py, anything else keeps JSON
+                if data.get("encoding") in ENCODINGS:
+                    encoding = data["encoding"]
+
+                # Optional "decimation" lowers the waveform rate for this client
+                try:
+                    decimation = max(int(data.get("decimation", 1)), 1)
+                except (TypeError, ValueError):
+                    decimation = 1
+
+                # Update active page/service and start the background task
+                # first, so data flows as soon as the monitor writes it
                 active_service = service_name
                 active_page = page
-
-                # Start background task to send data to the client
+                # A reconnecting client gets what it missed first
                 if data_task is None or data_task.done():
-                    data_task = asyncio.create_task(send_data(websocket, active_page))
+                    data_task = stream_page(sender, active_page, min_interval, encoding, decimation, resume_point(data))
 
-                await websocket.send(json.dumps({"status": f"Started monitoring for {page}"}))
+                # Report once the requested service is actually running
+                started, state = await start_service(service_name)
+                if started:
+                    await sender.send(json.dumps({
+                        "status": f"Started monitoring for {page}",
+                        "encoding": encoding,
+                        "service": state,
+                        "stream": broadcaster.stream_id,
+                    }))
+                else:
+                    await sender.send(json.dumps({"error": f"Could not start monitoring for {page}: {state}"}))
 
             # Handle STOP_MONITORING command
             elif command == "STOP_MONITORING" and active_service == service_name:
-                stop_service(service_name)
+                stopped, state = await stop_service(service_name)
                 active_service = None
                 # Do not reset active_page so that the last value can still be displayed
                 # Cancel data streaming task if it exists
                 if data_task:
                     data_task.cancel()
                     # Restart the task to keep sending the last known value
-                    data_task = asyncio.create_task(send_data(websocket, active_page))
+                    data_task = stream_page(sender, active_page, min_interval, encoding, decimation)
 
-                await websocket.send(json.dumps({"status": f"Stopped monitoring for {page}"}))
+                if stopped:
+                    await sender.send(json.dumps({"status": f"Stopped monitoring for {page}", "service": state}))
+                else:
+                    await sender.send(json.dumps({"error": f"Could not stop monitoring for {page}: {state}"}))
 
             # Handle EXIT_PAGE command to stop active service when exiting the page
             elif command == "EXIT_PAGE" and active_service:
-                stop_service(active_service)
+                await stop_service(active_service)
                 active_service = None
                 active_page = None
 
@@ -147,11 +204,69 @@ async def command_handler(websocket, _):
                 if data_task:
                     data_task.cancel()
 
-                await websocket.send(json.dumps({"status": "Exited page, stopped monitoring"}))
+                await sender.send(json.dumps({"status": "Exited page, stopped monitoring"}))
+
+            # Handle SUBSCRIBE/UNSUBSCRIBE: choose the metrics this client gets,
+            # each with an optional "max_rate" in Hz and "on_change" (default
+            # true, false resends at max_rate or 1 Hz even without changes).
+            # Independent of the monitoring page and its service.
+            elif command in ("SUBSCRIBE", "UNSUBSCRIBE"):
+                metrics = subscription_metrics(data)
+                if metrics is None:
+                    await sender.send(json.dumps({"error": f"Unknown metrics, choose from {', '.join(SUBSCRIBE_METRICS)}"}))
+                    continue
+                if command == "SUBSCRIBE":
+                    try:
+                        max_rate = float(data.get("max_rate", 0))
+                    except (TypeError, ValueError):
+                        max_rate = 0
+                    interval = 1 / max_rate if max_rate > 0 else 0
+                    on_change = bool(data.get("on_change", True))
+                    for metric in metrics:
+                        subscriptions[metric] = (interval, on_change)
+                    if "Waveform" in metrics:
+                        # The waveform rate is lowered by decimation, explicit or from max_rate
+                        try:
+                            decimation = max(int(data.get("decimation", round(SAMPLE_RATE * interval) or 1)), 1)
+                        except (TypeError, ValueError):
+                            decimation = 1
+                    if data.get("encoding") in ENCODINGS:
+                        encoding = data["encoding"]
+                else:
+                    for metric in metrics:
+                        subscriptions.pop(metric, None)
+
+                # Restart the subscription streams with the new set, after
+                # what a reconnecting client missed
+                for task in subscription_tasks:
+                    task.cancel()
+                resume = resume_point(data) if command == "SUBSCRIBE" else None
+                subscription_tasks = stream_subscriptions(sender, subscriptions, encoding, decimation, resume)
+
+                names = [name for name, metric in SUBSCRIBE_METRICS.items() if metric in subscriptions]
+                await sender.send(json.dumps({"status": "Subscriptions updated", "metrics": names, "encoding": encoding, "stream": broadcaster.stream_id}))
+
+            # Handle ACK_ALERT: acknowledge an alert by its "id", every client
+            # streaming alerts is told
+            elif command == "ACK_ALERT":
+                if alerts.ack(data.get("id"), by=sender.name):
+                    await sender.send(json.dumps({"status": "Alert acknowledged", "id": data.get("id")}))
+                else:
+                    await sender.send(json.dumps({"error": f"Unknown alert {data.get('id')}"}))
+
+            # Handle STATS: send queue depth and drops of every client, and the
+            # last known vitals with their age, source and staleness
+            elif command == "STATS":
+                await sender.send(json.dumps({
+                    "stats": [client.stats() for client in clients],
+                    "services": services.stats(),
+                    "vitals": broadcaster.stats(),
+                    "alerts": alerts.stats(),
+                }))
 
             else:
                 # Send an error message for unknown command or page
-                await websocket.send(json.dumps({"error": "Unknown command or page"}))
+                await sender.send(json.dumps({"error": "Unknown command or page"}))
 
     except websockets.ConnectionClosedError:
         print("WebSocket connection closed unexpectedly.")
@@ -160,12 +275,21 @@ async def command_handler(websocket, _):
     finally:
         # Stop the active service and cancel the data task if WebSocket closes
         if active_service:
-            stop_service(active_service)
+            task = asyncio.create_task(stop_service(active_service))
+            background_tasks.add(task)
+            task.add_done_callback(background_tasks.discard)
         if data_task:
             data_task.cancel()
+        for task in subscription_tasks:
+            task.cancel()
+        sender.close()
+        clients.discard(sender)
 
 # Function to start the WebSocket server
 async def start_server():
+    broadcaster.start()
+    waveform.start()
+    alerts.start()
     async with websockets.serve(command_handler, "0.0.0.0", 8765):
         await asyncio.Future()  # Keeps the server running indefinitely
 
@@ -174,4 +298,6 @@ if __name__ == "__main__":
     try:
         asyncio.run(start_server())
     except KeyboardInterrupt:
-        print("Server stopped.")
\ No newline at end of file
+        print("Server stopped.")
+    finally:
+        shutdown_logging()  # Write out the service control errors still queued
\ No newline at end of file
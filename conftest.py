@@ -0,0 +1,3 @@
+# test.py, test_app.py and final_test.py are monitor scripts for the Pi,
+# not tests; the tests live in tests/
+collect_ignore = ["test.py", "test_app.py", "final_test.py"]
@@ -0,0 +1,87 @@
+import queue
+import threading
+import time
+from collections import deque
+
+LATENCY_BUDGET = 0.010  # Seconds from detection to the buzzer being driven
+DEFERRED_QUEUE_SIZE = 32
+LATENCY_SAMPLES = 256
+
+
+# Drives the indicators first and pushes everything slow (email, file writes)
+# onto a worker thread, so a Critical status reaches the buzzer within the
+# latency budget no matter what the alert path is doing
+class CriticalFastPath:
+    def __init__(self, indicators, budget=LATENCY_BUDGET, queue_size=DEFERRED_QUEUE_SIZE):
+        self.indicators = indicators
+        self.budget = budget
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.overruns = 0  # Critical indications slower than the budget
+        self.deferred_dropped = 0
+        self._lock = threading.Lock()
+        self._deferred = queue.Queue(maxsize=queue_size)
+        self._worker = threading.Thread(target=self._run_deferred, name="deferred", daemon=True)
+        self._worker.start()
+
+    # Set LEDs and buzzer for a status. detected_at is the time.perf_counter()
+    # at which the rules first fired for it (StatusDebouncer.detected_at);
+    # Critical latencies are recorded.
+    def indicate(self, status, interaction=True, detected_at=None):
+        start = time.perf_counter() if detected_at is None else detected_at
+        self.indicators.show_status(status, interaction)
+        if status == "Critical" and interaction:
+            latency = time.perf_counter() - start
+            with self._lock:
+                self.latencies.append(latency)
+                if latency > self.budget:
+                    self.overruns += 1
+            return latency
+        return None
+
+    # Run func(*args) later on the worker thread, never blocks the caller
+    def defer(self, func, *args):
+        try:
+            self._deferred.put_nowait((func, args))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.deferred_dropped += 1
+            print(f"Deferred queue full, dropped {getattr(func, '__name__', func)}")
+            return False
+
+    def _run_deferred(self):
+        while True:
+            item = self._deferred.get()
+            if item is None:
+                break
+            func, args = item
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"Deferred {getattr(func, '__name__', func)} failed: {e}")
+
+    # Detection-to-buzzer latency in milliseconds
+    def stats(self):
+        with self._lock:
+            samples = sorted(self.latencies)
+            overruns = self.overruns
+            dropped = self.deferred_dropped
+        if not samples:
+            return {"count": 0, "overruns": overruns, "deferred_dropped": dropped}
+        return {
+            "count": len(samples),
+            "last_ms": self.latencies[-1] * 1000,
+            "p50_ms": samples[len(samples) // 2] * 1000,
+            "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+            "max_ms": samples[-1] * 1000,
+            "budget_ms": self.budget * 1000,
+            "overruns": overruns,
+            "deferred_dropped": dropped,
+        }
+
+    def close(self, timeout=2):
+        try:
+            self._deferred.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._worker.join(timeout=timeout)
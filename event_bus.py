@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+# Topics carried on the bus
+TOPICS = ("beat", "temperature", "gsr", "status", "alert", "device-health")
+
+# Queue policies for a subscriber that falls behind
+DROP_OLDEST = "drop_oldest"  # Keep the newest maxlen events, discard the oldest
+COALESCE = "coalesce"        # Keep only the latest event per topic
+
+DEFAULT_QUEUE_SIZE = 32
+
+# A single published event
+Event = namedtuple("Event", ["topic", "data", "timestamp"])
+
+
+# Bounded per-subscriber queue. Publishing never blocks: when the queue is
+# full the policy decides what gets thrown away.
+class Subscription:
+    def __init__(self, topics, maxlen=DEFAULT_QUEUE_SIZE, policy=DROP_OLDEST):
+        if policy not in (DROP_OLDEST, COALESCE):
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.topics = frozenset(topics)
+        self.maxlen = maxlen
+        self.policy = policy
+        self.dropped = 0
+        self.closed = False
+        self._events = deque()
+        self._latest = {}  # Used by the coalesce policy, keyed by topic
+        self._cond = threading.Condition(threading.Lock())
+
+    def put(self, event):
+        with self._cond:
+            if self.closed:
+                return
+            if self.policy == COALESCE:
+                if event.topic in self._latest:
+                    # Replace the pending value but keep the arrival order
+                    del self._latest[event.topic]
+                    self.dropped += 1
+                self._latest[event.topic] = event
+            else:
+                if len(self._events) >= self.maxlen:
+                    self._events.popleft()
+                    self.dropped += 1
+                self._events.append(event)
+            self._cond.notify()
+
+    def _pop(self):
+        if self.policy == COALESCE:
+            if self._latest:
+                topic = next(iter(self._latest))
+                return self._latest.pop(topic)
+            return None
+        if self._events:
+            return self._events.popleft()
+        return None
+
+    def pending(self):
+        with self._cond:
+            return len(self._latest) if self.policy == COALESCE else len(self._events)
+
+    # Wait for the next event, returns None on timeout or once closed
+    def get(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                event = self._pop()
+                if event is not None or self.closed:
+                    return event
+                if deadline is None:
+                    self._cond.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    self._cond.wait(remaining)
+
+    # Take everything currently queued without waiting
+    def drain(self):
+        with self._cond:
+            events = []
+            event = self._pop()
+            while event is not None:
+                events.append(event)
+                event = self._pop()
+            return events
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+# Topic-based publish/subscribe bus shared by the monitor threads
+class EventBus:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = ()  # Replaced, never mutated, so publish needs no lock
+        self._threads = []
+
+    def subscribe(self, topics, maxlen=DEFAULT_QUEUE_SIZE, policy=DROP_OLDEST):
+        if isinstance(topics, str):
+            topics = (topics,)
+        for topic in topics:
+            if topic not in TOPICS:
+                raise ValueError(f"Unknown topic: {topic}")
+        subscription = Subscription(topics, maxlen, policy)
+        with self._lock:
+            self._subscribers = self._subscribers + (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers = tuple(s for s in self._subscribers if s is not subscription)
+        subscription.close()
+
+    # Called from the acquisition threads, only ever appends to bounded queues
+    def publish(self, topic, data=None):
+        event = Event(topic, data, time.time())
+        for subscription in self._subscribers:
+            if topic in subscription.topics:
+                subscription.put(event)
+        return event
+
+    # Run handler(event) on a daemon thread for every event on the given topics
+    def start_consumer(self, name, topics, handler, maxlen=DEFAULT_QUEUE_SIZE, policy=DROP_OLDEST):
+        subscription = self.subscribe(topics, maxlen, policy)
+
+        def consume():
+            while True:
+                event = subscription.get()
+                if event is None:
+                    break
+                try:
+                    handler(event)
+                except Exception as e:
+                    print(f"Event consumer {name} failed: {e}")
+
+        thread = threading.Thread(target=consume, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return subscription
+
+    def stats(self):
+        return [
+            {"topics": sorted(s.topics), "policy": s.policy, "pending": s.pending(), "dropped": s.dropped}
+            for s in self._subscribers
+        ]
+
+    def close(self):
+        with self._lock:
+            subscribers, self._subscribers = self._subscribers, ()
+        for subscription in subscribers:
+            subscription.close()
+        for thread in self._threads:
+            thread.join(timeout=1)
+        self._threads = []
+
+
+# Process-wide bus used by the monitor scripts
+bus = EventBus()
@@ -1,47 +1,34 @@
-import os
 import time
 import board
 import busio
 import threading
-import smtplib
-from dotenv import load_dotenv
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from adafruit_ads1x15.ads1115 import ADS1115
 from adafruit_ads1x15.analog_in import AnalogIn
 import adafruit_mlx90614
 import adafruit_ssd1306
 from PIL import Image, ImageDraw, ImageFont
 import RPi.GPIO as GPIO
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Retrieve email credentials from environment
-EMAIL_USER = os.getenv("EMAIL_USER")
-EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
-TO_EMAIL = os.getenv("TO_EMAIL")
-SMTP_SERVER = os.getenv("SMTP_SERVER")
-SMTP_PORT = int(os.getenv("SMTP_PORT"))
-
-# LED and buzzer pin definitions
-GREEN_LED = 17  # GPIO 17
-YELLOW_LED = 27  # GPIO 27
-RED_LED = 22  # GPIO 22
-BUZZER_PIN = 23  # GPIO 23
-
-# GPIO setup for LEDs and buzzer
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(GREEN_LED, GPIO.OUT)
-GPIO.setup(YELLOW_LED, GPIO.OUT)
-GPIO.setup(RED_LED, GPIO.OUT)
-GPIO.setup(BUZZER_PIN, GPIO.OUT)
-
-# Initialize LEDs and buzzer to OFF
-GPIO.output(GREEN_LED, GPIO.LOW)
-GPIO.output(YELLOW_LED, GPIO.LOW)
-GPIO.output(RED_LED, GPIO.LOW)
-GPIO.output(BUZZER_PIN, GPIO.LOW)
+from indicators import IndicatorController
+from monitor_log import get_logger, shutdown_logging
+from critical_path import CriticalFastPath
+from alert_outbox import AlertOutbox
+from alert_digest import AlertDigest
+from alert_events import AlertEventSender
+from notifiers import NotificationFanout, build_notifiers
+from status_rules import RuleEngine
+from status_debounce import StatusDebouncer
+
+# Alert emails are stored in the SQLite outbox and sent by its background
+# thread over one persistent SMTP session, retried until the network is back.
+# Server and credentials come from the .env file (see send_mail.py)
+outbox = AlertOutbox().start()
+
+# LED and buzzer controller for pins 17, 27, 22 and 23, only writes pins that change
+indicators = IndicatorController(GPIO)
+indicators.setup()
+
+# LEDs and buzzer are driven first, email is deferred to a worker thread
+fast_path = CriticalFastPath(indicators)
 
 # Initialize I2C bus and sensors
 i2c = busio.I2C(board.SCL, board.SDA)
@@ -56,93 +43,68 @@ temperature_value = 0
 stress_level = "None"
 status = "Normal"
 human_interaction = False
-email_count = 0
 email_sent_display = False
 
+# Structured key=value logging; records go through a queue to a writer thread
+# and repetitive lines are rate limited, so sensor loops never block on stdout
+log = get_logger("final_test")
+
 # Data lock
 data_lock = threading.Lock()
 running = True  # Flag to control threads
 
+# Status thresholds are loaded from thresholds.json, the debouncer applies
+# hysteresis and minimum dwell times before the LEDs, buzzer or alerts react
+rules = RuleEngine()
+debouncer = StatusDebouncer(rules)
+
 # Thresholds for GSR, BPM, and Temperature
 BASELINE_VALUE = 11000
 RELAXED_THRESHOLD = BASELINE_VALUE * 0.9
 NORMAL_THRESHOLD = BASELINE_VALUE * 1.1
 ELEVATED_THRESHOLD = BASELINE_VALUE * 1.3
 
-# Function to send an email alert
-def send_email_alert(status):
-    global email_count, email_sent_display
-    if email_count >= 5:
-        return  # Limit to 5 emails
+# Runs on the outbox thread once the server accepted the email
+def email_sent(subject):
+    global email_sent_display
+    email_sent_display = True
+    log.info("alert_email_sent", subject=subject)
 
-    try:
-        subject = f"Health Alert: {status} Condition Detected"
-        body = f"The health monitoring system has detected a {status} condition.\n\n"
-        body += f"Current Readings:\n- BPM: {bpm_value}\n- Temperature: {temperature_value}°C\n- Stress Level: {stress_level}"
-
-        # Set up the email message
-        msg = MIMEMultipart()
-        msg["From"] = EMAIL_USER
-        msg["To"] = TO_EMAIL
-        msg["Subject"] = subject
-        msg.attach(MIMEText(body, "plain"))
-
-        # Send the email
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_USER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_USER, TO_EMAIL, msg.as_string())
-        email_count += 1
-        email_sent_display = True
-        print(f"Alert email sent for {status} condition.")
-
-    except Exception as e:
-        print(f"Failed to send email: {e}")
+# Queue the email, the outbox sends it without blocking this thread. The
+# digest id makes a retried submit of the same digest a no-op.
+def send_email_alert(subject, body, delivery_id):
+    return outbox.submit(subject, body, on_sent=email_sent, delivery_id=delivery_id) is not None
+
+# Digests go to email and, when configured, a webhook and an MQTT topic at once
+notifications = NotificationFanout(build_notifiers(send_email_alert)).start()
+
+# Conditions seen within a window go out as one digest, each condition is
+# rate limited until it clears
+alert_digest = AlertDigest(notifications.submit, rule_status=rules.rule_status)
+
+# The WebSocket clients (through command_server.py) get an alert the moment
+# the status turns Warning or Critical, without the digest window
+alert_events = AlertEventSender()
 
 # Function to control LEDs and buzzer based on status and interaction status
-def set_leds_and_buzzer(status, interaction):
-    if status == "Normal":
-        GPIO.output(GREEN_LED, GPIO.HIGH)
-        GPIO.output(YELLOW_LED, GPIO.LOW)
-        GPIO.output(RED_LED, GPIO.LOW)
-        GPIO.output(BUZZER_PIN, GPIO.LOW)
-    elif status == "Warning":
-        GPIO.output(GREEN_LED, GPIO.LOW)
-        GPIO.output(YELLOW_LED, GPIO.HIGH)
-        GPIO.output(RED_LED, GPIO.LOW)
-        GPIO.output(BUZZER_PIN, GPIO.LOW)
-    elif status == "Critical" and interaction:
-        GPIO.output(GREEN_LED, GPIO.LOW)
-        GPIO.output(YELLOW_LED, GPIO.LOW)
-        GPIO.output(RED_LED, GPIO.HIGH)
-        GPIO.output(BUZZER_PIN, GPIO.HIGH)
-    else:
-        GPIO.output(GREEN_LED, GPIO.LOW)
-        GPIO.output(YELLOW_LED, GPIO.LOW)
-        GPIO.output(RED_LED, GPIO.LOW)
-        GPIO.output(BUZZER_PIN, GPIO.LOW)
-
-# Update status based on BPM, GSR, and Temperature
-def update_status():
-    global status, email_count
-    continuous_warning_or_critical = False
-
-    if bpm_value < 50 or bpm_value > 120 or stress_level == "High" or temperature_value > 38:
-        if status == "Critical":
-            continuous_warning_or_critical = True
-        status = "Critical"
-    elif (50 <= bpm_value < 60 or 100 < bpm_value <= 120) or stress_level == "Elevated" or temperature_value > 37:
-        if status == "Warning":
-            continuous_warning_or_critical = True
-        status = "Warning"
-    else:
-        status = "Normal"
-        email_count = 0  # Reset email count on return to Normal
+def set_leds_and_buzzer(status, interaction, detected_at=None):
+    # Normal and Warning show regardless of contact, Critical only with contact
+    fast_path.indicate(status, interaction or status != "Critical", detected_at)
 
-    if continuous_warning_or_critical:
-        send_email_alert(status)
+# Update status after one metric changed, thresholds come from thresholds.json
+def update_status(metric, value):
+    global status
+    status, fired = debouncer.update(metric, value)
+    # From the first reading that fired the rules, not the end of the dwell
+    detected_at = debouncer.detected_at(metric)
 
-    set_leds_and_buzzer(status, human_interaction)
+    # Indicators first, alert bookkeeping runs later on the deferred worker
+    set_leds_and_buzzer(status, human_interaction, detected_at)
+
+    readings = {"bpm": bpm_value, "temperature": temperature_value, "stress": stress_level}
+    fast_path.defer(alert_events.update, status, readings, fired)
+    alerting = status in ["Warning", "Critical"]
+    fast_path.defer(alert_digest.record, metric, value, fired if alerting else [])
 
 # GSR Monitoring
 def read_gsr():
@@ -171,12 +133,11 @@ def monitor_gsr():
         try:
             gsr_value = read_gsr()
             stress_level = determine_stress_level(gsr_value)
-            with data_lock:
-                print(f"GSR Value: {gsr_value}, Stress Level: {stress_level}, Interaction: {human_interaction}")
-            update_status()
+            log.debug("gsr", value=gsr_value, stress=stress_level, interaction=human_interaction)
+            update_status("stress", stress_level)
             time.sleep(3)
-        except OSError:
-            print("GSR error, reinitializing...")
+        except OSError as e:
+            log.warning("gsr_error", error=e, action="reinitializing")
             time.sleep(1)
 
 # Heart rate thresholds and variables
@@ -186,10 +147,6 @@ last_pulse_time = 0
 first_pulse = True
 bpm_history = []  # For storing recent BPM values for graphing
 
-# BPM thresholds for status levels
-normal_bpm_range = (60, 100)
-warning_bpm_range = (50, 120)
-
 # Heart Rate Monitoring
 def monitor_heart_rate():
     global bpm_value, last_pulse_time, first_pulse, bpm_history
@@ -211,12 +168,12 @@ def monitor_heart_rate():
                     bpm_history.append(bpm_value)
                     if len(bpm_history) > 20:  # Limit history length
                         bpm_history.pop(0)
-                    print(f"Heart Rate: {bpm_value:.2f} BPM")
+                    log.debug("heart_rate", bpm=bpm_value)
                 
-                update_status()
+                update_status("bpm", bpm_value)
             time.sleep(0.1)
-        except OSError:
-            print("Heart Rate error, reinitializing...")
+        except OSError as e:
+            log.warning("heart_rate_error", error=e, action="reinitializing")
             time.sleep(1)
 
 # Temperature thresholds
@@ -244,18 +201,20 @@ def monitor_temperature():
 
         if HUMAN_TEMP_RANGE[0] <= object_temp <= HUMAN_TEMP_RANGE[1] and object_temp > dynamic_threshold:
             temperature_value = object_temp
-            with data_lock:
-                print(f"Human Body Temperature: {temperature_value:.2f}°C")
+            log.debug("body_temperature", celsius=temperature_value)
             no_detection_count = 0
         else:
             no_detection_count += 1
             with data_lock:
                 temperature_value = 0
-                print("No human body detected.")
+                log.debug("no_human_body", object_temp=object_temp)
 
         if no_detection_count >= MAX_ATTEMPTS:
             HUMAN_TEMP_THRESHOLD_OFFSET += 0.1
             no_detection_count = 0
+
+        # Picked up by the next status update from the other monitors
+        debouncer.update("temperature", temperature_value)
         time.sleep(1)
 
 # OLED Display Thread with Compact Layout for 128x32 Display
@@ -307,7 +266,16 @@ if __name__ == "__main__":
         display_thread.join()
 
     except KeyboardInterrupt:
-        print("Monitoring stopped.")
+        log.info("monitoring_stopped")
         running = False
-        set_leds_and_buzzer("Normal", False)
-        GPIO.cleanup()
\ No newline at end of file
+        log.info("critical_latency", **fast_path.stats())
+        fast_path.close()
+        alert_digest.close()
+        log.info("alert_events", **alert_events.stats())
+        alert_events.close()
+        log.info("notification_channels", channels=notifications.stats())
+        notifications.close()
+        outbox.close()
+        indicators.close()
+        GPIO.cleanup()
+        shutdown_logging()
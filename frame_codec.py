@@ -0,0 +1,132 @@
+import json
+import struct
+import sys
+import time
+
+# Compact binary WebSocket frames for clients that ask for them; everyone
+# else keeps getting the JSON text frames.
+#
+# A frame is a fixed header followed by count records, oldest first:
+#   header  "<BBHQd"  magic, version, count, first seq, first timestamp
+#   record  metric id byte, then three zigzag varints: seq delta, ms since
+#           the previous record, and the value delta from the previous
+#           record of that metric in this frame (the first is relative to 0)
+# Values are sent as integers of their metric's scale, so 72.123 BPM is
+# 72123 and a stress level is its index in STRESS_LEVELS (-1 if unknown). A sample that
+# follows the previous one closely takes 4-5 bytes.
+MAGIC = 0xB7
+VERSION = 1
+HEADER = struct.Struct("<BBHQd")
+MAX_RECORDS = 0xFFFF
+
+# Metric ids and scales, ids never change once a client may know them
+METRICS = {
+    "BPM": (1, 1000),
+    "Temperature": (2, 1000),
+    "Stress": (3, 1),
+    "Waveform": (4, 1000),  # Filtered pulse sensor voltage, sent in mV
+    "HRV": (5, 10),         # RMSSD in ms
+    "Status": (6, 1),
+}
+METRIC_NAMES = {metric_id: name for name, (metric_id, _) in METRICS.items()}
+STRESS_LEVELS = ("None", "Relaxed", "Normal", "Elevated", "High", "NO-CONTACT", "No contact")
+STATUS_LEVELS = ("None", "Normal", "Warning", "Critical", "No Human Interaction")
+# Metrics sent as an index into their list of names
+LEVELS = {"Stress": STRESS_LEVELS, "Status": STATUS_LEVELS}
+
+ENCODINGS = ("json", "binary")
+
+
+def _scaled(metric, value):
+    if metric in LEVELS:
+        return LEVELS[metric].index(value) if value in LEVELS[metric] else -1
+    return int(round(value * METRICS[metric][1]))
+
+
+def _unscaled(metric, value):
+    if metric in LEVELS:
+        return LEVELS[metric][value] if 0 <= value < len(LEVELS[metric]) else "Unknown"
+    return value / METRICS[metric][1]
+
+
+def _put_varint(out, value):
+    value = value << 1 if value >= 0 else (-value << 1) - 1  # zigzag
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(frame, pos):
+    value = shift = 0
+    while True:
+        byte = frame[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+    return (value >> 1 if not value & 1 else -((value + 1) >> 1)), pos
+
+
+# Encode (seq, timestamp, metric, value) records, oldest first, into frames
+# of at most MAX_RECORDS records
+def encode_records(records):
+    frames = []
+    for start in range(0, len(records), MAX_RECORDS):
+        batch = records[start:start + MAX_RECORDS]
+        seq, t = batch[0][0], batch[0][1]
+        out = bytearray(HEADER.pack(MAGIC, VERSION, len(batch), seq, t))
+        ms = 0  # Whole ms since the first record, so rounding never accumulates
+        values = {}
+        for record_seq, record_t, metric, value in batch:
+            scaled = _scaled(metric, value)
+            record_ms = int(round((record_t - t) * 1000))
+            out.append(METRICS[metric][0])
+            _put_varint(out, record_seq - seq)
+            _put_varint(out, record_ms - ms)
+            _put_varint(out, scaled - values.get(metric, 0))
+            seq, ms = record_seq, record_ms
+            values[metric] = scaled
+        frames.append(bytes(out))
+    return frames
+
+
+# Reference decoder, the inverse of encode_records for one frame
+def decode_frame(frame):
+    magic, version, count, seq, t = HEADER.unpack_from(frame, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a vitals frame")
+    pos = HEADER.size
+    ms = 0
+    records = []
+    values = {}
+    for _ in range(count):
+        metric = METRIC_NAMES[frame[pos]]
+        seq_delta, pos = _get_varint(frame, pos + 1)
+        ms_delta, pos = _get_varint(frame, pos)
+        value_delta, pos = _get_varint(frame, pos)
+        seq += seq_delta
+        ms += ms_delta
+        values[metric] = values.get(metric, 0) + value_delta
+        records.append((seq, t + ms / 1000, metric, _unscaled(metric, values[metric])))
+    return records
+
+
+# The same records as the JSON text frames the server sends by default, one
+# record per message, for the size comparison below
+def json_messages(records):
+    return [json.dumps({metric: value if metric in LEVELS else round(value, 3)}) for _, _, metric, value in records]
+
+
+if __name__ == "__main__":
+    # Bytes on the wire for n BPM samples, as single JSON messages and as
+    # batched binary frames
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    start = time.time()
+    records = [(i + 1, start + i * 0.01, "BPM", 72 + (i % 7) * 0.125) for i in range(count)]
+    messages = json_messages(records)
+    frames = encode_records(records)
+    print(f"{count} BPM samples")
+    print(f"JSON   {len(messages):>6} messages {sum(len(m) for m in messages):>8} bytes")
+    print(f"binary {len(frames):>6} frames   {sum(len(f) for f in frames):>8} bytes")
@@ -9,19 +9,13 @@ from adafruit_ads1x15.analog_in import AnalogIn
 import adafruit_ssd1306
 from PIL import Image, ImageDraw, ImageFont
 import RPi.GPIO as GPIO
+from indicators import IndicatorController
+from monitor_log import get_logger, shutdown_logging
+from vitals_shm import VitalsWriter
 
-# LED and buzzer pin definitions
-green_led = 17  # GPIO 17
-yellow_led = 27  # GPIO 27
-red_led = 22    # GPIO 22
-buzzer_pin = 23 # GPIO 23
-
-# GPIO setup for LEDs and buzzer
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(green_led, GPIO.OUT)
-GPIO.setup(yellow_led, GPIO.OUT)
-GPIO.setup(red_led, GPIO.OUT)
-GPIO.setup(buzzer_pin, GPIO.OUT)
+# LED and buzzer controller for pins 17, 27, 22 and 23, only writes pins that change
+indicators = IndicatorController(GPIO)
+indicators.setup()
 
 # Initialize I2C bus, ADC, and OLED display
 i2c = busio.I2C(board.SCL, board.SDA)
@@ -33,6 +27,13 @@ oled = adafruit_ssd1306.SSD1306_I2C(128, 32, i2c, addr=0x3c)
 stress_level = "None"
 human_interaction = False
 
+# Structured key=value logging; records go through a queue to a writer thread
+# and repetitive lines are rate limited, so sensor loops never block on stdout
+log = get_logger("gsr")
+
+# Shared-memory vitals record read by command_server.py
+vitals = VitalsWriter()
+
 # Data lock
 data_lock = threading.Lock()
 running = True  # Flag to control threads
@@ -43,12 +44,12 @@ relaxed_threshold = baseline_value * 0.9
 normal_threshold = baseline_value * 1.1
 elevated_threshold = baseline_value * 1.3
 
+# Stress level shown as the matching status colour
+STRESS_STATUS = {"Relaxed": "Normal", "Normal": "Normal", "Elevated": "Warning", "High": "Critical"}
+
 # Function to set LED and buzzer based on stress level and human interaction
 def set_leds_and_buzzer(status, interaction):
-    GPIO.output(green_led, GPIO.HIGH if status in ["Normal", "Relaxed"] and interaction else GPIO.LOW)
-    GPIO.output(yellow_led, GPIO.HIGH if status == "Elevated" and interaction else GPIO.LOW)
-    GPIO.output(red_led, GPIO.HIGH if status == "High" and interaction else GPIO.LOW)
-    GPIO.output(buzzer_pin, GPIO.HIGH if status == "High" and interaction else GPIO.LOW)
+    indicators.show_status(STRESS_STATUS.get(status), interaction)
 
 # Function to determine stress level based on GSR reading
 def determine_stress_level(gsr_value):
@@ -78,15 +79,13 @@ def monitor_gsr():
         try:
             gsr_value = read_gsr()
             stress_level = determine_stress_level(gsr_value)
-            with data_lock:
-                print(f"GSR Value: {gsr_value}, Stress Level: {stress_level}, Interaction: {human_interaction}")
-            # Save stress level to a file for command_server.py
-            with open("/home/pi/PatientConditionProject/gsr_data.txt", "w") as f:
-                f.write(stress_level)
+            log.debug("gsr", value=gsr_value, stress=stress_level, interaction=human_interaction)
+            # Publish the stress level for command_server.py
+            vitals.update(stress=stress_level)
             set_leds_and_buzzer(stress_level, human_interaction)
             time.sleep(3)
-        except OSError:
-            print("GSR error, reinitializing...")
+        except OSError as e:
+            log.warning("gsr_error", error=e, action="reinitializing")
             time.sleep(1)
 
 # OLED Display Thread
@@ -115,8 +114,9 @@ def update_display():
 def cleanup_and_exit(signum, frame):
     global running
     running = False
-    set_leds_and_buzzer("Normal", False)  # Turn off all LEDs and buzzer on exit
+    indicators.close()  # Turn off all LEDs and buzzer on exit
     GPIO.cleanup()
+    shutdown_logging()
     sys.exit(0)
 
 # Main function
@@ -0,0 +1,138 @@
+import threading
+import time
+
+# LED and buzzer pin definitions
+GREEN_LED = 17  # GPIO 17
+YELLOW_LED = 27  # GPIO 27
+RED_LED = 22    # GPIO 22
+BUZZER_PIN = 23 # GPIO 23
+PINS = (GREEN_LED, YELLOW_LED, RED_LED, BUZZER_PIN)
+
+# Repeating patterns as (level, seconds) phases
+PATTERNS = {
+    "beep": ((1, 0.3), (0, 0.5)),  # Same timing as buzzer.py
+    "fast_beep": ((1, 0.1), (0, 0.15)),
+    "blink": ((1, 0.5), (0, 0.5)),
+}
+
+# What each status shows, pins not listed are switched off. A value is either
+# a fixed level or the name of a pattern.
+STATUS_INDICATIONS = {
+    "Normal": {GREEN_LED: 1},
+    "Warning": {YELLOW_LED: 1},
+    "Critical": {RED_LED: 1, BUZZER_PIN: "beep"},
+}
+
+
+# Owns the LED and buzzer pins. Pin levels are cached so only pins that
+# actually change are written, and patterns run on a background timer thread
+# so callers never sleep.
+class IndicatorController:
+    def __init__(self, gpio, pins=PINS):
+        self.gpio = gpio
+        self.pins = tuple(pins)
+        self._levels = {pin: None for pin in self.pins}  # None until first write
+        self._patterns = {}  # pin -> [phases, phase index, next switch time]
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+        self._closed = False
+        self._multi_write = True  # Dropped if the backend rejects list writes
+        self.writes = 0   # GPIO calls issued
+        self.skipped = 0  # Pin updates avoided because the level was unchanged
+
+    def setup(self):
+        self.gpio.setmode(self.gpio.BCM)
+        for pin in self.pins:
+            self.gpio.setup(pin, self.gpio.OUT)
+        with self._lock:
+            self._write({pin: 0 for pin in self.pins}, force=True)
+
+    # Write only the pins whose level differs from the cache, in one call when
+    # the backend accepts lists of channels (RPi.GPIO does)
+    def _write(self, levels, force=False):
+        changed = [(pin, level) for pin, level in levels.items() if force or self._levels[pin] != level]
+        self.skipped += len(levels) - len(changed)
+        if not changed:
+            return
+        values = [self.gpio.HIGH if level else self.gpio.LOW for _, level in changed]
+        channels = [pin for pin, _ in changed]
+        if len(changed) > 1 and self._multi_write:
+            try:
+                self.gpio.output(channels, values)
+                self.writes += 1
+            except (TypeError, ValueError):
+                self._multi_write = False
+        if len(changed) == 1 or not self._multi_write:
+            for channel, value in zip(channels, values):
+                self.gpio.output(channel, value)
+                self.writes += 1
+        for pin, level in changed:
+            self._levels[pin] = level
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run_patterns, name="indicators", daemon=True)
+            self._thread.start()
+
+    # Set pins to fixed levels or patterns, e.g. {RED_LED: 1, BUZZER_PIN: "beep"}
+    def set(self, indications):
+        now = time.monotonic()
+        with self._lock:
+            if self._closed:
+                return
+            levels = {}
+            for pin, value in indications.items():
+                if isinstance(value, str):
+                    current = self._patterns.get(pin)
+                    phases = PATTERNS[value]
+                    if current is not None and current[0] is phases:
+                        continue  # Already running, keep its phase
+                    self._patterns[pin] = [phases, 0, now + phases[0][1]]
+                    levels[pin] = phases[0][0]
+                else:
+                    self._patterns.pop(pin, None)
+                    levels[pin] = 1 if value else 0
+            self._write(levels)
+            if self._patterns:
+                self._ensure_thread()
+                self._wakeup.notify()
+
+    # Show a status; anything other than the known statuses turns everything off
+    def show_status(self, status, interaction=True):
+        indication = STATUS_INDICATIONS.get(status, {}) if interaction else {}
+        self.set({pin: indication.get(pin, 0) for pin in self.pins})
+
+    def off(self):
+        self.set({pin: 0 for pin in self.pins})
+
+    def _run_patterns(self):
+        with self._lock:
+            while not self._closed:
+                if not self._patterns:
+                    self._wakeup.wait()
+                    continue
+                now = time.monotonic()
+                levels = {}
+                for pin, pattern in self._patterns.items():
+                    phases, index, switch_at = pattern
+                    if switch_at > now:
+                        continue
+                    while switch_at <= now:
+                        index = (index + 1) % len(phases)
+                        switch_at += phases[index][1]
+                    pattern[1] = index
+                    pattern[2] = switch_at
+                    levels[pin] = phases[index][0]
+                self._write(levels)
+                next_switch = min(pattern[2] for pattern in self._patterns.values())
+                self._wakeup.wait(max(next_switch - time.monotonic(), 0))
+
+    def close(self):
+        with self._lock:
+            self._patterns.clear()
+            self._write({pin: 0 for pin in self.pins})
+            self._closed = True
+            self._wakeup.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
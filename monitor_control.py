@@ -0,0 +1,38 @@
+import asyncio
+import json
+import os
+
+# Local control socket of monitor_daemon.py
+CONTROL_PATH = os.getenv("MONITOR_CONTROL_SOCKET", "/tmp/patient_monitor.sock")
+CONTROL_TIMEOUT = 10.0
+
+# Daemon modes, named after the scripts whose logic they run
+MODES = ("bpm_display", "tem_display", "gsr", "test_app")
+
+# systemd unit of each mode, so command_server.py can switch modes instead
+# of starting and stopping units when the daemon is running
+SERVICE_MODES = {
+    "heart_rate_monitor.service": "bpm_display",
+    "temperature_monitor.service": "tem_display",
+    "gsr_monitor.service": "gsr",
+    "continuous_monitor.service": "test_app",
+}
+
+
+def daemon_running(path=CONTROL_PATH):
+    return os.path.exists(path)
+
+
+# Send one command line ("mode <name>", "stop [<name>]" or "status") and return the
+# daemon's JSON reply
+async def request(command, path=CONTROL_PATH, timeout=CONTROL_TIMEOUT):
+    reader, writer = await asyncio.wait_for(asyncio.open_unix_connection(path), timeout)
+    try:
+        writer.write(command.encode() + b"\n")
+        await writer.drain()
+        reply = await asyncio.wait_for(reader.readline(), timeout)
+    finally:
+        writer.close()
+    if not reply:
+        raise ConnectionError("monitor daemon closed the connection")
+    return json.loads(reply)
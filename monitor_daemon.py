@@ -0,0 +1,201 @@
+import json
+import os
+import signal
+import socketserver
+import statistics
+import sys
+import threading
+import time
+
+import RPi.GPIO as GPIO
+from monitor_control import CONTROL_PATH, MODES
+from monitor_log import get_logger, shutdown_logging
+
+# Every mode is imported once at start, so PIL, the adafruit drivers,
+# RPi.GPIO and the I2C/OLED/GPIO setup are paid for once instead of on
+# every page switch
+import bpm_display
+import tem_display
+import gsr
+import test_app
+
+# Threads of each mode, the functions its script starts in __main__
+MODE_THREADS = {
+    "bpm_display": (bpm_display, ("monitor_heart_rate", "update_display")),
+    "tem_display": (tem_display, ("monitor_temperature", "update_display")),
+    "gsr": (gsr, ("monitor_gsr", "update_display")),
+    "test_app": (test_app, ("monitor_heart_rate", "monitor_temperature", "monitor_gsr", "update_display")),
+}
+RESTART_JOIN_TIMEOUT = 5.0  # Wait for the last run's threads when a mode comes back quickly
+SWITCH_HISTORY = 100
+
+log = get_logger("monitor_daemon")
+
+
+# The OLED as one mode sees it: frames only reach the panel while that mode
+# is active, so a loop of the previous mode finishing its last iteration
+# cannot draw over the new one
+class ModeDisplay:
+    def __init__(self, daemon, mode, oled):
+        self.daemon = daemon
+        self.mode = mode
+        self.oled = oled
+
+    def image(self, image):
+        if self.daemon.mode == self.mode:
+            self.oled.image(image)
+
+    def show(self):
+        if self.daemon.mode == self.mode:
+            self.oled.show()
+            self.daemon.frame_shown(self.mode)
+
+
+# Runs one mode at a time in this process. A switch stops the current mode's
+# loops by clearing its running flag (they exit at their next iteration, the
+# daemon does not wait for them), clears the LEDs and starts the new mode's
+# threads. Switch times are measured from the request to the new threads
+# running, and to the new mode's first frame on the OLED.
+class MonitorDaemon:
+    def __init__(self):
+        self.mode = None
+        self.threads = {}
+        self.switch_ms = []
+        self.first_frame_ms = []
+        self._switch_started = None
+        self._lock = threading.Lock()
+        # One OLED, one LED/buzzer controller and one vitals writer shared
+        # by all modes, so the last iteration of the previous mode and the
+        # new one take the same writer lock; each script's own ones stay
+        # unused
+        self.indicators = test_app.indicators
+        self.vitals = test_app.vitals
+        oled = test_app.oled
+        for mode, (module, _) in MODE_THREADS.items():
+            module.oled = ModeDisplay(self, mode, oled)
+            module.indicators = self.indicators
+            if module.vitals is not self.vitals:
+                module.vitals.close()
+                module.vitals = self.vitals
+
+    def switch(self, mode):
+        started = time.perf_counter()
+        with self._lock:
+            previous = self.mode
+            if mode != previous:
+                self._switch_started = started if mode is not None else None
+                self._stop()
+                if mode is not None:
+                    self._start(mode)
+            elapsed = (time.perf_counter() - started) * 1000
+            if mode != previous:
+                self.switch_ms.append(elapsed)
+                del self.switch_ms[:-SWITCH_HISTORY]
+        log.info("mode_switch", previous=previous or "idle", mode=mode or "idle", ms=round(elapsed, 2))
+        return {"mode": mode or "idle", "previous": previous or "idle", "switch_ms": round(elapsed, 2)}
+
+    def _stop(self):
+        if self.mode is None:
+            return
+        module, _ = MODE_THREADS[self.mode]
+        module.running = False
+        if self.mode == "test_app":
+            test_app.stop_background()
+        self.mode = None
+        self.indicators.off()
+
+    def _start(self, mode):
+        module, targets = MODE_THREADS[mode]
+        # Back within one loop iteration: the old threads would see running
+        # again and carry on next to the new ones
+        for thread in self.threads.get(mode, ()):
+            thread.join(RESTART_JOIN_TIMEOUT)
+        if mode == "test_app":
+            test_app.start_background()
+        module.running = True
+        self.mode = mode
+        self.threads[mode] = [
+            threading.Thread(target=getattr(module, target), name=f"{mode}-{target}", daemon=True)
+            for target in targets
+        ]
+        for thread in self.threads[mode]:
+            thread.start()
+
+    def frame_shown(self, mode):
+        started = self._switch_started
+        if started is not None and mode == self.mode:
+            self._switch_started = None
+            self.first_frame_ms.append((time.perf_counter() - started) * 1000)
+            del self.first_frame_ms[:-SWITCH_HISTORY]
+
+    def stats(self):
+        def summary(values):
+            if not values:
+                return {}
+            return {"count": len(values), "last": round(values[-1], 2), "mean": round(statistics.fmean(values), 2), "max": round(max(values), 2)}
+
+        return {"mode": self.mode or "idle", "switch_ms": summary(self.switch_ms), "first_frame_ms": summary(self.first_frame_ms)}
+
+    def close(self):
+        with self._lock:
+            self._stop()
+
+
+daemon = None
+
+
+# One command per line, one JSON reply per command
+class ControlHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            words = line.decode(errors="replace").split()
+            if not words:
+                continue
+            if words[0] == "mode" and len(words) == 2 and words[1] in MODES:
+                reply = daemon.switch(words[1])
+            elif words[0] == "stop" and len(words) == 1:
+                reply = daemon.switch(None)
+            elif words[0] == "stop" and len(words) == 2:
+                # Stop only if that mode is still the one running
+                reply = daemon.switch(None) if daemon.mode == words[1] else {"mode": daemon.mode or "idle", "switch_ms": 0}
+            elif words[0] == "status":
+                reply = daemon.stats()
+            else:
+                reply = {"error": f"Unknown command, use: mode {'|'.join(MODES)}, stop [mode] or status"}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class ControlServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def cleanup_and_exit(signum, frame):
+    log.info("monitor_daemon_stopped", **daemon.stats())
+    daemon.close()
+    try:
+        os.unlink(CONTROL_PATH)
+    except OSError:
+        pass
+    if test_app.background_started:
+        test_app.cleanup_and_exit(signum, frame)  # Also cleans up GPIO and logging
+    daemon.indicators.close()
+    GPIO.cleanup()
+    shutdown_logging()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    daemon = MonitorDaemon()
+    if os.path.exists(CONTROL_PATH):
+        os.unlink(CONTROL_PATH)  # Left over from a previous run
+    server = ControlServer(CONTROL_PATH, ControlHandler)
+    os.chmod(CONTROL_PATH, 0o666)  # command_server.py may run as another user
+
+    signal.signal(signal.SIGTERM, cleanup_and_exit)
+    signal.signal(signal.SIGINT, cleanup_and_exit)
+
+    # Optional start mode, e.g. "python monitor_daemon.py test_app"
+    if len(sys.argv) > 1 and sys.argv[1] in MODES:
+        daemon.switch(sys.argv[1])
+    log.info("monitor_daemon_ready", socket=CONTROL_PATH)
+    server.serve_forever()
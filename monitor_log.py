@@ -0,0 +1,194 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+LOG_FORMAT = os.getenv("LOG_FORMAT", "kv")  # "kv" for key=value lines, "json" for one object per line
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")  # Per-sample lines are DEBUG, set DEBUG to see them
+LOG_QUEUE_SIZE = 1000
+RATE_BURST = 5       # Records per message allowed in each period before sampling starts
+RATE_PERIOD = 10.0   # Seconds
+SAMPLE_EVERY = 10    # Past the burst, let one in this many records through
+
+_listener = None
+_handler = None
+_setup_lock = threading.Lock()
+_loggers = set()          # Names handed out by get_logger
+_level = logging.INFO     # LOG_LEVEL as set up
+_floor = logging.NOTSET   # Least verbose level QoS asks for (set_level)
+
+
+def _levelno(level):
+    number = level if isinstance(level, int) else logging.getLevelName(str(level).upper())
+    return number if isinstance(number, int) else logging.INFO
+
+
+# Lets through RATE_BURST records per (logger, event) every RATE_PERIOD
+# seconds, then one in SAMPLE_EVERY. The next record let through carries how
+# many were suppressed in between.
+class RateLimitFilter(logging.Filter):
+    def __init__(self, burst=RATE_BURST, period=RATE_PERIOD, sample_every=SAMPLE_EVERY):
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        self.sample_every = sample_every
+        self.suppressed = 0
+        self._state = {}  # (logger, event) -> [window start, count, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR:
+            return True  # Errors are never limited
+        now = record.created
+        key = (record.name, record.msg)
+        with self._lock:
+            state = self._state.get(key)
+            if state is None or now - state[0] >= self.period:
+                skipped = state[2] if state else 0
+                state = self._state[key] = [now, 0, 0]
+            else:
+                skipped = 0
+            state[1] += 1
+            count = state[1]
+            if count > self.burst and (count - self.burst) % self.sample_every:
+                state[2] += 1
+                self.suppressed += 1
+                return False
+            skipped += state[2]
+            state[2] = 0
+        if skipped:
+            record.fields = dict(getattr(record, "fields", {}), suppressed=skipped)
+        return True
+
+
+# Never blocks the caller: a full queue drops the record and counts it
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    # Formatting happens on the writer thread, the record is passed as is
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _timestamp(record):
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}"
+
+
+def _value(value):
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    text = str(value)
+    if not text or any(c in text for c in ' ="'):
+        return json.dumps(text)
+    return text
+
+
+# ts=... level=info logger=bpm event=heart_rate bpm=72.31
+class KeyValueFormatter(logging.Formatter):
+    def format(self, record):
+        parts = [
+            f"ts={_timestamp(record)}",
+            f"level={record.levelname.lower()}",
+            f"logger={record.name}",
+            f"event={_value(record.getMessage())}",
+        ]
+        parts.extend(f"{key}={_value(value)}" for key, value in getattr(record, "fields", {}).items())
+        line = " ".join(parts)
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": _timestamp(record),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+# log.info("heart_rate", bpm=72.3): the message is a fixed event name and
+# keyword arguments become fields
+class EventLogger(logging.LoggerAdapter):
+    def process(self, msg, kwargs):
+        fields = {
+            key: kwargs.pop(key)
+            for key in list(kwargs)
+            if key not in ("exc_info", "stack_info", "stacklevel", "extra")
+        }
+        kwargs["extra"] = {**kwargs.get("extra", {}), "fields": fields}
+        return msg, kwargs
+
+
+# Route the root logger through a bounded queue to one writer thread on
+# stdout, which journald picks up under systemd. The root logger, and with it
+# every library, stays at INFO or above; level applies to the monitor
+# loggers from get_logger only. Safe to call more than once.
+def setup_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, stream=None):
+    global _listener, _handler, _level
+    with _setup_lock:
+        if _listener is not None:
+            return
+        _level = _levelno(level)
+        writer = logging.StreamHandler(stream or sys.stdout)
+        writer.setFormatter(JsonFormatter() if fmt == "json" else KeyValueFormatter())
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        _handler = NonBlockingQueueHandler(log_queue)
+        _handler.addFilter(RateLimitFilter())
+        root = logging.getLogger()
+        root.addHandler(_handler)
+        root.setLevel(max(_level, logging.INFO))
+        _listener = logging.handlers.QueueListener(log_queue, writer)
+        _listener.start()
+
+
+def get_logger(name):
+    setup_logging()
+    logger = logging.getLogger(name)
+    _loggers.add(name)
+    logger.setLevel(max(_level, _floor))
+    return EventLogger(logger, {})
+
+
+# Least verbose level for the monitor loggers, e.g. from the QoS controller:
+# they log at LOG_LEVEL or this, whichever lets fewer records through
+def set_level(level):
+    global _floor
+    _floor = _levelno(level)
+    for name in _loggers:
+        logging.getLogger(name).setLevel(max(_level, _floor))
+
+
+def stats():
+    if _handler is None:
+        return {"dropped": 0, "suppressed": 0}
+    return {"dropped": _handler.dropped, "suppressed": _handler.filters[0].suppressed}
+
+
+# Write out whatever is still queued, call on exit
+def shutdown_logging():
+    global _listener
+    with _setup_lock:
+        if _listener is None:
+            return
+        logging.getLogger().removeHandler(_handler)
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,176 @@
+import asyncio
+import resource
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+I2C_WORKERS = 1  # The sensors share one I2C bus, so one worker keeps transfers in order
+
+
+# Runs every monitor as a coroutine on one event loop, and shutdown cancels
+# the monitor tasks instead of polling a running flag. Each sensor's burst of
+# reads and oled.show go to a one-thread executor as one call, so I2C
+# transfers never overlap and the loop never blocks on the bus.
+#
+# Not used by the monitors: on the benchmark below it costs more CPU and
+# more wakeups than the four threads it was meant to replace (one loop
+# wakeup costs about three times a thread waking from time.sleep, and every
+# executor call adds two more), so test_app.py keeps its threads.
+class MonitorRuntime:
+    def __init__(self, workers=I2C_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="i2c")
+        self.loop = None
+        self._tasks = []
+
+    # Run a blocking call (a burst of sensor reads, oled.show) off the loop
+    async def io(self, func, *args):
+        return await self.loop.run_in_executor(self.executor, func, *args)
+
+    # Cancel every monitor, safe to call from a signal handler on the loop
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+
+    async def _main(self, monitors):
+        self.loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            try:
+                self.loop.add_signal_handler(signum, self.stop)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass  # Not the main thread, e.g. inside the benchmark
+        self._tasks = [asyncio.create_task(monitor(), name=monitor.__name__) for monitor in monitors]
+        results = await asyncio.gather(*self._tasks, return_exceptions=True)
+        for task, result in zip(self._tasks, results):
+            if isinstance(result, Exception):
+                print(f"Monitor {task.get_name()} failed: {result!r}")
+
+    # Run until a monitor is cancelled by SIGTERM/SIGINT or stop(), then cleanup()
+    def run(self, *monitors, cleanup=None):
+        try:
+            asyncio.run(self._main(monitors))
+        finally:
+            self.executor.shutdown(wait=True)
+            if cleanup is not None:
+                cleanup()
+
+
+# Benchmark: the Continuous monitor's sensor cadence (heart rate every 0.1 s,
+# temperature as 20 reads 20 ms apart then 1 s idle, GSR as 10 reads every
+# 3 s, display every 1.5 s) against simulated I2C reads, once with one
+# thread per monitor and once on the runtime. Reports CPU time and context
+# switches, which is what each wakeup costs on the Pi.
+
+I2C_READ_TIME = 0.001
+
+
+def _fake_read():
+    time.sleep(I2C_READ_TIME)
+    return 1.0
+
+
+def _fake_render():
+    time.sleep(I2C_READ_TIME * 5)
+
+
+# 20 reads 20 ms apart and the ambient read, as one executor call
+def _fake_temperature_burst():
+    total = 0
+    for _ in range(20):
+        total += _fake_read()
+        time.sleep(0.02)
+    return total + _fake_read()
+
+
+def threaded_workload(seconds):
+    running = [True]
+
+    def heart_rate():
+        while running[0]:
+            _fake_read()
+            time.sleep(0.1)
+
+    def temperature():
+        while running[0]:
+            for _ in range(20):
+                _fake_read()
+                time.sleep(0.02)
+            _fake_read()
+            time.sleep(1)
+
+    def gsr():
+        while running[0]:
+            for _ in range(10):
+                _fake_read()
+            time.sleep(3)
+
+    def display():
+        while running[0]:
+            _fake_render()
+            time.sleep(1.5)
+
+    threads = [threading.Thread(target=t) for t in (heart_rate, temperature, gsr, display)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    running[0] = False
+    for thread in threads:
+        thread.join()
+
+
+def async_workload(seconds):
+    runtime = MonitorRuntime()
+
+    async def heart_rate():
+        while True:
+            await runtime.io(_fake_read)
+            await asyncio.sleep(0.1)
+
+    async def temperature():
+        while True:
+            await runtime.io(_fake_temperature_burst)
+            await asyncio.sleep(1)
+
+    async def gsr():
+        while True:
+            await runtime.io(lambda: [_fake_read() for _ in range(10)])
+            await asyncio.sleep(3)
+
+    async def display():
+        while True:
+            await runtime.io(_fake_render)
+            await asyncio.sleep(1.5)
+
+    async def timer():
+        await asyncio.sleep(seconds)
+        runtime.stop()
+
+    runtime.run(heart_rate, temperature, gsr, display, timer)
+
+
+def measure(workload, seconds):
+    before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    workload(seconds)
+    elapsed = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    switches = (after.ru_nvcsw - before.ru_nvcsw) + (after.ru_nivcsw - before.ru_nivcsw)
+    return {
+        "cpu_percent": cpu / elapsed * 100,
+        "cpu_ms_per_s": cpu / elapsed * 1000,
+        "wakeups_per_s": switches / elapsed,
+    }
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 15
+    results = {
+        "threads": measure(threaded_workload, seconds),
+        "asyncio": measure(async_workload, seconds),
+    }
+    print(f"Simulated monitors for {seconds:.0f}s each")
+    print(f"{'':16}{'cpu %':>8}{'cpu ms/s':>10}{'wakeups/s':>11}")
+    for name, result in results.items():
+        print(f"{name:16}{result['cpu_percent']:>8.2f}{result['cpu_ms_per_s']:>10.2f}{result['wakeups_per_s']:>11.1f}")
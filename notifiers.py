@@ -0,0 +1,299 @@
+import abc
+import asyncio
+import json
+import os
+import ssl
+import struct
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+from send_mail import send_email
+
+CHANNEL_TIMEOUT = 10  # Seconds a single channel may take per alert, retries included
+CHANNEL_RETRIES = 1   # Further attempts after a failed one
+RETRY_DELAY = 1.0     # Seconds between attempts
+MAX_IN_FLIGHT = 16    # Alerts being fanned out at once before new ones are dropped
+
+# Optional channels, configured in the .env file
+WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL")
+MQTT_HOST = os.getenv("MQTT_HOST")
+MQTT_PORT = int(os.getenv("MQTT_PORT", 1883))
+MQTT_TOPIC = os.getenv("MQTT_TOPIC", "patient-monitor/alerts")
+MQTT_USER = os.getenv("MQTT_USER")
+MQTT_PASSWORD = os.getenv("MQTT_PASSWORD")
+
+
+# A notification channel. notify(alert) returns True once the alert was
+# handed over; alert is a dict with at least "subject" and "body". A failed
+# attempt is retried up to retries times within the timeout.
+class Notifier(abc.ABC):
+    name = "notifier"
+    retries = CHANNEL_RETRIES
+
+    def __init__(self, timeout=CHANNEL_TIMEOUT):
+        self.timeout = timeout
+
+    @abc.abstractmethod
+    async def notify(self, alert):
+        pass
+
+
+# Email through send_mail.send_email, run in a worker thread because smtplib
+# blocks. Pass send= to route through something else, e.g. the alert outbox.
+class EmailNotifier(Notifier):
+    name = "email"
+
+    def __init__(self, send=send_email, timeout=CHANNEL_TIMEOUT):
+        super().__init__(timeout)
+        self.send = send
+
+    async def notify(self, alert):
+        return bool(await asyncio.to_thread(self.send, alert["subject"], alert["body"], alert["id"]))
+
+
+# JSON POST to an HTTP(S) webhook
+class WebhookNotifier(Notifier):
+    name = "webhook"
+
+    def __init__(self, url=WEBHOOK_URL, timeout=CHANNEL_TIMEOUT):
+        super().__init__(timeout)
+        self.url = urlsplit(url)
+
+    async def notify(self, alert):
+        https = self.url.scheme == "https"
+        host = self.url.hostname
+        port = self.url.port or (443 if https else 80)
+        path = self.url.path or "/"
+        if self.url.query:
+            path += "?" + self.url.query
+        payload = json.dumps(alert).encode()
+        reader, writer = await asyncio.open_connection(host, port, ssl=ssl.create_default_context() if https else None)
+        try:
+            writer.write(
+                (
+                    f"POST {path} HTTP/1.1\r\n"
+                    f"Host: {self.url.netloc}\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    "Connection: close\r\n\r\n"
+                ).encode()
+                + payload
+            )
+            await writer.drain()
+            status_line = await reader.readline()
+        finally:
+            writer.close()
+            await writer.wait_closed()
+        parts = status_line.split()
+        return len(parts) >= 2 and parts[1].startswith(b"2")
+
+
+def _mqtt_string(value):
+    data = value.encode()
+    return struct.pack("!H", len(data)) + data
+
+
+def _mqtt_packet(packet_type, body):
+    length = len(body)
+    encoded = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        encoded.append(byte | 0x80 if length else byte)
+        if not length:
+            break
+    return bytes([packet_type]) + bytes(encoded) + body
+
+
+# Publishes the alert as JSON to an MQTT 3.1.1 broker at QoS 0. Speaks just
+# enough of the protocol (CONNECT, PUBLISH, DISCONNECT) to avoid a client library.
+class MqttNotifier(Notifier):
+    name = "mqtt"
+
+    def __init__(self, host=MQTT_HOST, port=MQTT_PORT, topic=MQTT_TOPIC, user=MQTT_USER, password=MQTT_PASSWORD, timeout=CHANNEL_TIMEOUT):
+        super().__init__(timeout)
+        self.host = host
+        self.port = port
+        self.topic = topic
+        self.user = user
+        self.password = password
+
+    async def notify(self, alert):
+        flags = 0x02  # Clean session
+        payload = _mqtt_string(f"patient-monitor-{uuid.uuid4().hex[:8]}")
+        if self.user:
+            flags |= 0x80
+            payload += _mqtt_string(self.user)
+            if self.password:
+                flags |= 0x40
+                payload += _mqtt_string(self.password)
+        connect = _mqtt_string("MQTT") + bytes([4, flags]) + struct.pack("!H", 60) + payload
+
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(_mqtt_packet(0x10, connect))
+            await writer.drain()
+            connack = await reader.readexactly(4)
+            if connack[0] != 0x20 or connack[3] != 0:
+                return False
+            writer.write(_mqtt_packet(0x30, _mqtt_string(self.topic) + json.dumps(alert).encode()))
+            writer.write(_mqtt_packet(0xE0, b""))
+            await writer.drain()
+            return True
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+
+# Per-channel delivery counters and latency
+class ChannelStats:
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.last_latency = None
+        self.total_latency = 0.0
+
+    def record(self, ok, latency, timed_out=False):
+        self.last_latency = latency
+        if ok:
+            self.sent += 1
+            self.total_latency += latency
+        else:
+            self.failed += 1
+            if timed_out:
+                self.timeouts += 1
+
+    def as_dict(self):
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "retries": self.retries,
+            "last_latency_ms": None if self.last_latency is None else self.last_latency * 1000,
+            "avg_latency_ms": self.total_latency / self.sent * 1000 if self.sent else None,
+        }
+
+
+# Sends each alert to every channel at once, each under its own timeout, so
+# a slow or dead channel never delays the others
+class NotificationFanout:
+    def __init__(self, notifiers, max_in_flight=MAX_IN_FLIGHT):
+        self.notifiers = list(notifiers)
+        self.stats_by_channel = {notifier.name: ChannelStats() for notifier in self.notifiers}
+        self.max_in_flight = max_in_flight
+        self.dropped = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+
+    # One attempt, False on any error
+    async def _attempt(self, notifier, alert):
+        try:
+            return bool(await notifier.notify(alert))
+        except Exception as e:
+            print(f"{notifier.name} notification failed: {e}")
+            return False
+
+    async def _deliver(self, notifier, alert, stats):
+        for attempt in range(notifier.retries + 1):
+            if attempt:
+                stats.retries += 1
+                await asyncio.sleep(RETRY_DELAY)
+            if await self._attempt(notifier, alert):
+                return True
+        return False
+
+    async def _send_one(self, notifier, alert):
+        stats = self.stats_by_channel[notifier.name]
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            ok = await asyncio.wait_for(self._deliver(notifier, alert, stats), notifier.timeout)
+        except asyncio.TimeoutError:
+            ok, timed_out = False, True
+            print(f"{notifier.name} notification timed out after {notifier.timeout}s")
+        stats.record(ok, time.perf_counter() - start, timed_out)
+        return ok
+
+    # Deliver one alert to all channels, returns {channel name: delivered}
+    async def notify(self, alert):
+        results = await asyncio.gather(*(self._send_one(n, alert) for n in self.notifiers))
+        return {notifier.name: ok for notifier, ok in zip(self.notifiers, results)}
+
+    def start(self):
+        if self._thread is None:
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="notifications", daemon=True)
+            self._thread.start()
+        return self
+
+    def _done(self, _):
+        with self._lock:
+            self._in_flight -= 1
+
+    # Thread-safe, returns immediately; the fan-out runs on the notifier loop
+    def submit(self, subject, body, **extra):
+        with self._lock:
+            if self._thread is None:
+                self.dropped += 1
+                print(f"Notifications not started, dropped: {subject}")
+                return None
+            if self._in_flight >= self.max_in_flight:
+                self.dropped += 1
+                print(f"Too many notifications in flight, dropped: {subject}")
+                return None
+            self._in_flight += 1
+        # A caller's id (the digest id) is kept so receivers can deduplicate
+        alert = {"id": uuid.uuid4().hex, "subject": subject, "body": body, "timestamp": time.time(), **extra}
+        coro = self.notify(alert)
+        try:
+            future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        except Exception as e:
+            # The loop closed since the check above
+            coro.close()
+            self._done(None)
+            with self._lock:
+                self.dropped += 1
+            print(f"Notification not submitted, dropped: {subject}: {e}")
+            return None
+        future.add_done_callback(self._done)
+        return future
+
+    def stats(self):
+        return {name: stats.as_dict() for name, stats in self.stats_by_channel.items()}
+
+    # Wait for the alerts in flight on the notifier loop
+    async def _drain(self, timeout):
+        tasks = asyncio.all_tasks() - {asyncio.current_task()}
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+    # Stop once the alerts already submitted are delivered, or after timeout
+    def close(self, timeout=5):
+        if self._thread is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._drain(timeout), self._loop).result(timeout + 1)
+        except Exception as e:
+            print(f"Notifications still in flight at close: {e!r}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=timeout)
+        self._loop.close()
+        self._thread = None
+
+
+# Email and whichever optional channels are configured in the environment.
+# The WebSocket clients get alerts straight from the status engine instead
+# (see alert_events.AlertEventSender).
+def build_notifiers(send=send_email):
+    notifiers = [EmailNotifier(send)]
+    if WEBHOOK_URL:
+        notifiers.append(WebhookNotifier(WEBHOOK_URL))
+    if MQTT_HOST:
+        notifiers.append(MqttNotifier())
+    return notifiers
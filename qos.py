@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import deque
+
+# What each degradation level allows the low-priority work; ws_interval is
+# the shortest time between WebSocket pushes to one client, hrv_interval the
+# shortest time between HRV recomputations (beat intervals are still all
+# collected). Pulse and temperature sampling are never listed here, they
+# keep their rates.
+QOS_LEVELS = (
+    {"display_interval": 1.5, "ws_interval": 0.2, "hrv_interval": 0, "log_level": "DEBUG"},
+    {"display_interval": 3.0, "ws_interval": 1.0, "hrv_interval": 5.0, "log_level": "DEBUG"},
+    {"display_interval": 5.0, "ws_interval": 2.0, "hrv_interval": 15.0, "log_level": "INFO"},
+    {"display_interval": 10.0, "ws_interval": 5.0, "hrv_interval": 60.0, "log_level": "WARNING"},
+)
+
+OVERRUN_FACTOR = 1.5       # A loop iteration longer than this times its period is an overrun
+RAISE_OVERRUN_RATIO = 0.1  # Overrun share over the window that raises the level
+RAISE_CPU = 0.85           # Whole-system CPU use that raises the level
+CALM_SECONDS = 15          # Pressure-free time before stepping back down one level
+WINDOW = 10                # Seconds of history the decision looks at
+EVAL_INTERVAL = 1.0
+
+
+# Iteration timing of one monitor loop; call tick() once per iteration
+class LoopWatch:
+    def __init__(self, name, period):
+        self.name = name
+        self.period = period
+        self.ticks = 0
+        self.overruns = 0
+        self._last = None
+
+    def tick(self):
+        now = time.monotonic()
+        if self._last is not None:
+            self.ticks += 1
+            if now - self._last > self.period * OVERRUN_FACTOR:
+                self.overruns += 1
+        self._last = now
+
+
+def _cpu_times():
+    try:
+        with open("/proc/stat", "r") as f:
+            fields = [int(x) for x in f.readline().split()[1:]]
+    except (OSError, ValueError):
+        return None
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+    return sum(fields), idle
+
+
+# Degrades low-priority work when the monitor loops start overrunning or the
+# CPU is saturated: level 0 is normal, each level up slows the display,
+# WebSocket pushes, HRV and logging further (QOS_LEVELS). The level rises one step
+# per interval under pressure and falls one step per CALM_SECONDS once the
+# overrun ratio over the window is back under the limit.
+# on_change(level, settings) runs on the controller thread.
+class QosController:
+    def __init__(self, on_change=None, levels=QOS_LEVELS, interval=EVAL_INTERVAL):
+        self.on_change = on_change
+        self.levels = levels
+        self.interval = interval
+        self.level = 0
+        self.changes = 0
+        self.watches = []
+        self.overrun_ratio = 0.0
+        self.cpu = None
+        self._history = deque(maxlen=max(int(WINDOW / interval), 1))
+        self._seen = {}
+        self._cpu_last = _cpu_times()
+        self._calm_since = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    # The watch of a loop that runs again (a monitor_daemon.py mode switch)
+    # is reused, its first tick after the pause is not an overrun
+    def watch(self, name, period):
+        for loop_watch in self.watches:
+            if loop_watch.name == name:
+                loop_watch.period = period
+                loop_watch._last = None
+                return loop_watch
+        loop_watch = LoopWatch(name, period)
+        self.watches.append(loop_watch)
+        return loop_watch
+
+    def _sample_cpu(self):
+        current = _cpu_times()
+        last, self._cpu_last = self._cpu_last, current
+        if current is None or last is None or current[0] == last[0]:
+            return None
+        total = current[0] - last[0]
+        return 1 - (current[1] - last[1]) / total
+
+    # One decision step, returns the level in force afterwards
+    def evaluate(self, now=None):
+        now = time.monotonic() if now is None else now
+        ticks = overruns = 0
+        for loop_watch in self.watches:
+            seen_ticks, seen_overruns = self._seen.get(loop_watch.name, (0, 0))
+            ticks += loop_watch.ticks - seen_ticks
+            overruns += loop_watch.overruns - seen_overruns
+            self._seen[loop_watch.name] = (loop_watch.ticks, loop_watch.overruns)
+        self._history.append((ticks, overruns))
+        window_ticks = sum(t for t, _ in self._history)
+        self.overrun_ratio = sum(o for _, o in self._history) / window_ticks if window_ticks else 0.0
+        self.cpu = self._sample_cpu()
+
+        # Raise on pressure in the last interval, step down only once the
+        # whole window has been calm
+        cpu_pressure = self.cpu is not None and self.cpu > RAISE_CPU
+        pressure = (ticks and overruns / ticks > RAISE_OVERRUN_RATIO) or cpu_pressure
+        calm = self.overrun_ratio <= RAISE_OVERRUN_RATIO and not cpu_pressure
+        level = self.level
+        if pressure:
+            self._calm_since = now
+            level = min(level + 1, len(self.levels) - 1)
+        elif not calm:
+            self._calm_since = now
+        elif now - self._calm_since >= CALM_SECONDS and level > 0:
+            self._calm_since = now
+            level -= 1
+        if level != self.level:
+            self._set_level(level)
+        return self.level
+
+    def _set_level(self, level):
+        self.level = level
+        self.changes += 1
+        if self.on_change is not None:
+            try:
+                self.on_change(level, self.levels[level])
+            except Exception as e:
+                print(f"QoS level change handler failed: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.evaluate()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="qos", daemon=True)
+            self._thread.start()
+        return self
+
+    def stats(self):
+        return {
+            "level": self.level,
+            "changes": self.changes,
+            "overrun_ratio": self.overrun_ratio,
+            "cpu": self.cpu,
+            "loops": {w.name: {"ticks": w.ticks, "overruns": w.overruns} for w in self.watches},
+        }
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
@@ -0,0 +1,101 @@
+import os
+import time
+from array import array
+
+from frame_codec import LEVELS
+
+REPLAY_SECONDS = float(os.getenv("REPLAY_MINUTES", 10)) * 60  # History a reconnecting client can resume from
+MAX_RATE = 4.0  # Records per second one metric may produce, sizes the rings
+
+
+# Fixed-size ring of (seq, timestamp, value) for one metric in three flat
+# arrays, 24 bytes per record and no object per record. Seqs only grow, so
+# the records after a seq are found by bisection.
+class MetricRing:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.seqs = array("Q", bytes(8 * capacity))
+        self.times = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self.count = 0    # Records ever appended
+        self.evicted = 0  # Seq of the last record overwritten, 0 if none
+
+    def append(self, seq, timestamp, value):
+        slot = self.count % self.capacity
+        if self.count >= self.capacity:
+            self.evicted = self.seqs[slot]
+        self.seqs[slot] = seq
+        self.times[slot] = timestamp
+        self.values[slot] = value
+        self.count += 1
+
+    # Positions (0 = oldest kept) map to slots
+    def _slot(self, position):
+        return (self.count - min(self.count, self.capacity) + position) % self.capacity
+
+    # (seq, timestamp, value) after seq and not older than cutoff, and
+    # whether that is every record after seq
+    def since(self, seq, cutoff):
+        kept = min(self.count, self.capacity)
+        low, high = 0, kept
+        while low < high:
+            middle = (low + high) // 2
+            if self.seqs[self._slot(middle)] <= seq:
+                low = middle + 1
+            else:
+                high = middle
+        complete = self.evicted <= seq
+        records = []
+        for position in range(low, kept):
+            slot = self._slot(position)
+            if self.times[slot] < cutoff:
+                complete = False
+                continue
+            records.append((self.seqs[slot], self.times[slot], self.values[slot]))
+        return records, complete
+
+
+def _stored(metric, value):
+    if metric in LEVELS:
+        return LEVELS[metric].index(value) if value in LEVELS[metric] else -1
+    return value
+
+
+def _loaded(metric, value):
+    if metric in LEVELS:
+        index = int(value)
+        return LEVELS[metric][index] if 0 <= index < len(LEVELS[metric]) else "Unknown"
+    return value
+
+
+# The last REPLAY_SECONDS of (seq, timestamp, metric, value) records, one
+# ring per metric, so a client that lost its connection gets exactly the
+# records it missed instead of reloading everything. Level metrics (stress,
+# status) are stored as their index in frame_codec.LEVELS.
+class ReplayBuffer:
+    def __init__(self, metrics, seconds=REPLAY_SECONDS, max_rate=MAX_RATE):
+        self.seconds = seconds
+        self.rings = {metric: MetricRing(max(int(seconds * max_rate), 1)) for metric in metrics}
+
+    def append(self, record):
+        seq, timestamp, metric, value = record
+        self.rings[metric].append(seq, timestamp, _stored(metric, value))
+
+    # Records of these metrics after seq, oldest first, and whether none of
+    # them is missing (False once some were overwritten or aged out)
+    def since(self, seq, metrics, now=None):
+        cutoff = (time.time() if now is None else now) - self.seconds
+        records = []
+        complete = True
+        for metric in metrics:
+            ring_records, ring_complete = self.rings[metric].since(seq, cutoff)
+            records += [(s, t, metric, _loaded(metric, v)) for s, t, v in ring_records]
+            complete = complete and ring_complete
+        records.sort()
+        return records, complete
+
+    def stats(self):
+        return {
+            metric: {"kept": min(ring.count, ring.capacity), "capacity": ring.capacity, "evicted_seq": ring.evicted}
+            for metric, ring in self.rings.items()
+        }
@@ -0,0 +1,92 @@
+import struct
+from multiprocessing import shared_memory
+
+# Header: samples written so far, capacity, acquisition deadline overruns,
+# worst lateness in seconds. The acquisition process is the only writer.
+HEADER = struct.Struct("<QQQd")
+# Slot: sequence number (index + 1, 0 while being written), timestamp,
+# channel, value
+SLOT = struct.Struct("<QdId")
+FIELDS = struct.Struct("<dId")
+HEAD = struct.Struct("<Q")
+
+
+# Fixed-size ring of (timestamp, channel, value) samples in shared memory,
+# written by one process and read lock-free by any number of others. Each
+# slot carries its sequence number, seqlock style as in vitals_shm.py, so a
+# reader can tell a sample that was overwritten before or while it read it.
+class SampleRing:
+    def __init__(self, name=None, capacity=None):
+        if capacity is not None:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER.size + capacity * SLOT.size)
+            HEADER.pack_into(self.shm.buf, 0, 0, capacity, 0, 0.0)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        _, self.capacity, _, _ = HEADER.unpack_from(self.shm.buf, 0)
+        self.name = self.shm.name
+        self._head = self.head()
+
+    def head(self):
+        return HEAD.unpack_from(self.shm.buf, 0)[0]
+
+    # Writer side: invalidate the slot, store the sample, stamp the slot with
+    # its sequence number, then publish it by advancing the head
+    def write(self, timestamp, channel, value):
+        index = self._head
+        offset = HEADER.size + (index % self.capacity) * SLOT.size
+        HEAD.pack_into(self.shm.buf, offset, 0)
+        FIELDS.pack_into(self.shm.buf, offset + HEAD.size, timestamp, channel, value)
+        HEAD.pack_into(self.shm.buf, offset, index + 1)
+        self._head = index + 1
+        HEAD.pack_into(self.shm.buf, 0, self._head)
+
+    def set_timing(self, overruns, max_late):
+        struct.pack_into("<Qd", self.shm.buf, 16, overruns, max_late)
+
+    def timing(self):
+        _, _, overruns, max_late = HEADER.unpack_from(self.shm.buf, 0)
+        return {"samples": self.head(), "overruns": overruns, "max_late_ms": max_late * 1000}
+
+    # Sample at an absolute index, None if it has been overwritten. The seq is
+    # read again after the fields: if the writer lapped the reader in between
+    # the sample may be torn, and it is rejected.
+    def get(self, index):
+        offset = HEADER.size + (index % self.capacity) * SLOT.size
+        seq, timestamp, channel, value = SLOT.unpack_from(self.shm.buf, offset)
+        if seq != index + 1 or HEAD.unpack_from(self.shm.buf, offset)[0] != seq:
+            return None
+        return timestamp, channel, value
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+# One consumer's position in a ring. read() returns the samples written since
+# the last call, optionally only some channels; samples the reader fell too
+# far behind to see are counted in missed.
+class RingReader:
+    def __init__(self, ring, channels=None, from_start=False):
+        self.ring = ring
+        self.channels = None if channels is None else frozenset(channels)
+        self.position = 0 if from_start else ring.head()
+        self.missed = 0
+
+    def read(self):
+        head = self.ring.head()
+        oldest = head - self.ring.capacity
+        if self.position < oldest:
+            self.missed += oldest - self.position
+            self.position = oldest
+        samples = []
+        for index in range(self.position, head):
+            sample = self.ring.get(index)
+            if sample is None:
+                self.missed += 1
+            elif self.channels is None or sample[1] in self.channels:
+                samples.append(sample)
+        self.position = head
+        return samples
@@ -10,26 +10,37 @@ load_dotenv()
 # Retrieve email credentials and server configuration from environment variables
 SMTP_SERVER = os.getenv("SMTP_SERVER")
 SMTP_PORT = int(os.getenv("SMTP_PORT", 587))  # Default SMTP port is 587
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") != "0"  # Set to 0 for a local test server
 EMAIL_ADDRESS = os.getenv("EMAIL_USER")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
 RECIPIENT_EMAIL = os.getenv("TO_EMAIL")
 
 
-def send_email(subject, body):
+# Create the email message
+def build_message(subject, body, sender=EMAIL_ADDRESS, recipient=RECIPIENT_EMAIL):
+    msg = MIMEMultipart()
+    msg["From"] = sender
+    msg["To"] = recipient
+    msg["Subject"] = subject
+    msg.attach(MIMEText(body, "plain"))
+    return msg
+
+
+def send_email(subject, body, delivery_id=None):
     try:
-        # Create the email message
-        msg = MIMEMultipart()
-        msg["From"] = EMAIL_ADDRESS
-        msg["To"] = RECIPIENT_EMAIL
-        msg["Subject"] = subject
-        msg.attach(MIMEText(body, "plain"))
+        msg = build_message(subject, body)
+        if delivery_id:
+            msg["Message-ID"] = f"<{delivery_id}@patient-monitor>"
 
         # Connect to the SMTP server and send the email
         with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()  # Secure the connection
+            if SMTP_STARTTLS:
+                server.starttls()  # Secure the connection
             server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)  # Log in to the email account
             server.send_message(msg)  # Send the email
 
         print(f"Email sent successfully to {RECIPIENT_EMAIL}.")
+        return True
     except Exception as e:
         print(f"Error sending email: {e}")
+        return False
@@ -0,0 +1,91 @@
+import asyncio
+import subprocess
+
+from monitor_log import get_logger
+
+SYSTEMCTL_TIMEOUT = 30.0  # Seconds systemctl start/stop may take
+SETTLE_TIMEOUT = 10.0     # Seconds a unit may stay activating/deactivating afterwards
+STATE_POLL = 0.1
+
+# Unit states that end a start or stop
+SETTLED_STATES = {"start": ("active", "failed"), "stop": ("inactive", "failed")}
+ACTION_VERBS = {"start": "starting", "stop": "stopping"}
+
+log = get_logger("service_control")
+
+
+async def _run(*args, timeout=SYSTEMCTL_TIMEOUT):
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *args, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+    except OSError as e:
+        return None, "", str(e)
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        return None, "", "timed out"
+    return process.returncode, stdout.decode().strip(), stderr.decode().strip()
+
+
+# systemd unit control from the event loop: systemctl runs as an asyncio
+# subprocess, so a page switch never stalls the other clients' streams.
+# Requests for the same unit are coalesced, a start while a start is running
+# just waits for that one, and run one after another. Each request finishes
+# once the unit has settled (active after a start, inactive after a stop)
+# and returns (ok, state or error).
+class ServiceControl:
+    def __init__(self):
+        self.requests = 0
+        self.coalesced = 0
+        self._pending = {}  # unit -> (action, task)
+        self._locks = {}
+
+    async def start(self, unit):
+        return await self._request("start", unit)
+
+    async def stop(self, unit):
+        return await self._request("stop", unit)
+
+    async def _request(self, action, unit):
+        self.requests += 1
+        pending = self._pending.get(unit)
+        if pending is not None and pending[0] == action and not pending[1].done():
+            self.coalesced += 1
+            task = pending[1]
+        else:
+            task = asyncio.get_running_loop().create_task(self._control(action, unit))
+            self._pending[unit] = (action, task)
+            task.add_done_callback(lambda done: self._forget(unit, done))
+        # A client that disconnects meanwhile does not cancel it for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, unit, task):
+        if self._pending.get(unit, (None, None))[1] is task:
+            del self._pending[unit]
+
+    async def _control(self, action, unit):
+        lock = self._locks.setdefault(unit, asyncio.Lock())
+        async with lock:
+            returncode, _, error = await _run("sudo", "systemctl", action, unit)
+            if returncode != 0:
+                log.error("service_error", action=ACTION_VERBS[action], unit=unit, error=error)
+                return False, error or f"systemctl exited with {returncode}"
+            return await self._settle(action, unit)
+
+    # Wait until systemd reports the unit active (or inactive after a stop)
+    async def _settle(self, action, unit):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + SETTLE_TIMEOUT
+        while True:
+            _, state, _ = await _run("systemctl", "is-active", unit, timeout=SETTLE_TIMEOUT)
+            if state in SETTLED_STATES[action]:
+                return state != "failed", state
+            if loop.time() >= deadline:
+                return False, state or "unknown"
+            await asyncio.sleep(STATE_POLL)
+
+    def stats(self):
+        return {"requests": self.requests, "coalesced": self.coalesced, "pending": sorted(self._pending)}
@@ -0,0 +1,73 @@
+import smtplib
+
+from send_mail import EMAIL_ADDRESS, EMAIL_PASSWORD, SMTP_PORT, SMTP_SERVER, SMTP_STARTTLS
+
+KEEPALIVE_INTERVAL = 60  # Seconds of idle time between NOOPs
+SMTP_TIMEOUT = 10
+
+
+# One logged-in SMTP connection that is opened on first use and reopened
+# after any failure
+class SmtpSession:
+    def __init__(
+        self,
+        host=SMTP_SERVER,
+        port=SMTP_PORT,
+        user=EMAIL_ADDRESS,
+        password=EMAIL_PASSWORD,
+        starttls=SMTP_STARTTLS,
+        timeout=SMTP_TIMEOUT,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.connects = 0
+        self._server = None
+
+    @property
+    def connected(self):
+        return self._server is not None
+
+    def connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        server.ehlo()
+        if self.starttls:
+            server.starttls()  # Secure the connection
+            server.ehlo()
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        self._server = server
+        self.connects += 1
+
+    def close(self):
+        server, self._server = self._server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    # Send a message, the connection is dropped if anything goes wrong
+    def send(self, msg):
+        try:
+            if self._server is None:
+                self.connect()
+            self._server.send_message(msg)
+        except (smtplib.SMTPException, OSError):
+            self.close()
+            raise
+
+    # NOOP to keep an idle connection from being dropped by the server
+    def keepalive(self):
+        if self._server is None:
+            return
+        try:
+            code, _ = self._server.noop()
+            if code != 250:
+                self.close()
+        except (smtplib.SMTPException, OSError):
+            self.close()
@@ -0,0 +1,195 @@
+import csv
+import random
+import sys
+import threading
+import time
+
+from status_rules import DEFAULT_RULES_PATH, SEVERITY, STATUSES, RuleEngine
+
+# Default minimum dwell times in seconds, overridden by "dwell" in thresholds.json
+ESCALATE_DWELL = 1.0    # A worse status must hold this long before it is shown
+CRITICAL_DWELL = 0.0    # Except Critical, shown as soon as a rule fires
+DEESCALATE_DWELL = 5.0  # A better status must hold this long before it is shown
+
+# LED/buzzer levels per status as (green, yellow, red, buzzer)
+PIN_LEVELS = {
+    "Normal": (1, 0, 0, 0),
+    "Warning": (0, 1, 0, 0),
+    "Critical": (0, 0, 1, 1),
+}
+
+
+# Per-metric state machine between the rule engine and the LEDs/buzzer/alerts.
+# The engine already applies the enter/exit hysteresis bands; on top of that a
+# metric only moves to a new status once it has stayed there for the dwell time.
+# Times come from time.perf_counter() unless given, the clock CriticalFastPath
+# measures latency with.
+class StatusDebouncer:
+    def __init__(self, rules, escalate_dwell=None, deescalate_dwell=None, critical_dwell=None):
+        self.rules = rules
+        self._escalate_dwell = escalate_dwell
+        self._deescalate_dwell = deescalate_dwell
+        self._critical_dwell = critical_dwell
+        self._lock = threading.Lock()
+        self._committed = {}  # metric -> shown status
+        self._pending = {}    # metric -> (candidate status, first seen)
+        self._detected = {}   # metric -> when its raw status last first appeared
+        self.status = "Normal"
+        self.changed = False
+        self.transitions = 0
+        self.suppressed = 0  # Candidate changes that never lasted long enough
+
+    def _dwell(self, candidate, escalating):
+        dwell = self.rules.config.get("dwell", {})
+        if escalating and candidate == "Critical":
+            if self._critical_dwell is not None:
+                return self._critical_dwell
+            return dwell.get("critical", CRITICAL_DWELL)
+        if escalating:
+            if self._escalate_dwell is not None:
+                return self._escalate_dwell
+            return dwell.get("escalate", ESCALATE_DWELL)
+        if self._deescalate_dwell is not None:
+            return self._deescalate_dwell
+        return dwell.get("deescalate", DEESCALATE_DWELL)
+
+    def _step(self, metric, now):
+        candidate = self.rules.metric_status(metric)
+        current = self._committed.get(metric, "Normal")
+        pending = self._pending.get(metric)
+        self._detected[metric] = now
+        if candidate == current:
+            if pending is not None:
+                del self._pending[metric]
+                self.suppressed += 1
+        else:
+            if pending is None or pending[0] != candidate:
+                if pending is not None:
+                    self.suppressed += 1
+                pending = (candidate, now)
+                self._pending[metric] = pending
+            escalating = SEVERITY[candidate] > SEVERITY[current]
+            if now - pending[1] >= self._dwell(candidate, escalating):
+                self._committed[metric] = candidate
+                self._detected[metric] = pending[1]
+                del self._pending[metric]
+
+        worst = max((SEVERITY[s] for s in self._committed.values()), default=0)
+        new_status = STATUSES[worst]
+        self.changed = new_status != self.status
+        if self.changed:
+            self.transitions += 1
+        self.status = new_status
+
+    # Feed one reading, returns (debounced status, raw fired rule names)
+    def update(self, metric, value, now=None):
+        now = time.perf_counter() if now is None else now
+        _, fired = self.rules.update(metric, value)
+        with self._lock:
+            self._step(metric, now)
+            return self.status, fired
+
+    # Forget a metric, e.g. when the sensor reports no contact
+    def clear(self, metric, now=None):
+        now = time.perf_counter() if now is None else now
+        _, fired = self.rules.clear(metric)
+        with self._lock:
+            self._step(metric, now)
+            return self.status, fired
+
+    # When the rules first fired for what the metric's last update showed:
+    # the start of the dwell if that update moved the metric to a new
+    # status, otherwise the update itself. Latency is measured from here.
+    def detected_at(self, metric):
+        with self._lock:
+            return self._detected.get(metric)
+
+    # Metrics whose shown status is the given status
+    def metrics_at(self, status):
+        with self._lock:
+            return {metric for metric, shown in self._committed.items() if shown == status}
+
+
+def _pin_changes(old, new):
+    return sum(a != b for a, b in zip(PIN_LEVELS[old], PIN_LEVELS[new]))
+
+
+# Run the same readings through the current behaviour (no hysteresis, no dwell)
+# and through the debouncer, and count the transitions and side effects of each
+def replay(samples, path=DEFAULT_RULES_PATH):
+    raw = RuleEngine(path, reload_interval=float("inf"), hysteresis=False)
+    debouncer = StatusDebouncer(RuleEngine(path, reload_interval=float("inf")))
+    report = {
+        name: {"transitions": 0, "pin_changes": 0, "buzzer_toggles": 0, "alerts": 0}
+        for name in ("current", "debounced")
+    }
+    shown = {"current": "Normal", "debounced": "Normal"}
+    readings = 0
+
+    for timestamp, metric, value in samples:
+        readings += 1
+        new = {
+            "current": raw.update(metric, value)[0],
+            "debounced": debouncer.update(metric, value, timestamp)[0],
+        }
+        for name, status in new.items():
+            old = shown[name]
+            if status == old:
+                continue
+            counts = report[name]
+            counts["transitions"] += 1
+            counts["pin_changes"] += _pin_changes(old, status)
+            if (old == "Critical") != (status == "Critical"):
+                counts["buzzer_toggles"] += 1
+            if SEVERITY[status] > SEVERITY[old]:
+                counts["alerts"] += 1
+            shown[name] = status
+
+    report["readings"] = readings
+    report["suppressed"] = {key: report["current"][key] - report["debounced"][key] for key in report["current"]}
+    return report
+
+
+# Read a replay file with timestamp,metric,value rows
+def load_samples(path):
+    samples = []
+    with open(path, "r", newline="") as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith("#"):
+                continue
+            timestamp, metric, value = row[0], row[1], row[2]
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+            samples.append((float(timestamp), metric, value))
+    return samples
+
+
+# Noisy readings hovering around the Warning bands
+def synthetic_samples(seconds=600, seed=1):
+    rng = random.Random(seed)
+    samples = []
+    t = 0.0
+    next_temperature = 0.0
+    next_gsr = 0.0
+    while t < seconds:
+        bpm = 100 + rng.gauss(0, 4)
+        samples.append((t, "bpm", bpm))
+        if t >= next_temperature:
+            samples.append((t, "temperature", 38.7 + rng.gauss(0, 0.15)))
+            next_temperature += 1.4
+        if t >= next_gsr:
+            samples.append((t, "stress", rng.choice(["Normal", "Normal", "Normal", "Elevated"])))
+            next_gsr += 3.0
+        t += 60.0 / max(bpm, 1)
+    return samples
+
+
+if __name__ == "__main__":
+    samples = load_samples(sys.argv[1]) if len(sys.argv) > 1 else synthetic_samples()
+    report = replay(samples)
+    print(f"Readings replayed: {report['readings']}")
+    print(f"{'':16}{'current':>10}{'debounced':>11}{'suppressed':>12}")
+    for key in ("transitions", "pin_changes", "buzzer_toggles", "alerts"):
+        print(f"{key:16}{report['current'][key]:>10}{report['debounced'][key]:>11}{report['suppressed'][key]:>12}")
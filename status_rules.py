@@ -0,0 +1,223 @@
+import json
+import operator
+import os
+import threading
+import time
+
+# Thresholds config shared by every monitor script
+DEFAULT_RULES_PATH = os.getenv(
+    "THRESHOLDS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.json")
+)
+RELOAD_CHECK_INTERVAL = 2.0  # Seconds between config mtime checks
+
+# Status levels in increasing severity
+SEVERITY = {"Normal": 0, "Warning": 1, "Critical": 2}
+STATUSES = {level: status for status, level in SEVERITY.items()}
+
+OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "in": lambda value, options: value in options,
+}
+
+
+def _bind(op, threshold):
+    def check(value, op=op, threshold=threshold):
+        try:
+            return op(value, threshold)
+        except TypeError:
+            return False
+    return check
+
+
+# Turn one rule from the config into (name, metric, severity, enter, hold) with
+# the threshold bound into each check so evaluation is a single call. A fired
+# rule stays fired until the value clears the threshold by the hysteresis margin.
+def compile_rule(rule, margin=0):
+    name = rule["name"]
+    op = OPERATORS.get(rule["op"])
+    if op is None:
+        raise ValueError(f"Rule {name}: unknown operator {rule['op']}")
+    if rule["status"] not in SEVERITY:
+        raise ValueError(f"Rule {name}: unknown status {rule['status']}")
+    threshold = rule["value"]
+    if rule["op"] == "in":
+        threshold = frozenset(threshold)
+    hold_threshold = threshold
+    if margin and rule["op"] in ("<", "<="):
+        hold_threshold = threshold + margin
+    elif margin and rule["op"] in (">", ">="):
+        hold_threshold = threshold - margin
+
+    enter = _bind(op, threshold)
+    hold = enter if hold_threshold == threshold else _bind(op, hold_threshold)
+    return name, rule["metric"], SEVERITY[rule["status"]], enter, hold
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+# Raise ValueError unless the config has the shape compile_rules and the
+# debouncer expect, so a half-edited file never reaches them
+def check_config(config):
+    if not isinstance(config, dict):
+        raise ValueError("Config must be an object")
+    for section in ("hysteresis", "dwell"):
+        values = config.get(section, {})
+        if not isinstance(values, dict) or not all(_is_number(v) for v in values.values()):
+            raise ValueError(f"{section} must map names to numbers")
+    if not isinstance(config.get("rules"), list):
+        raise ValueError("rules must be a list")
+    for rule in config["rules"]:
+        if not isinstance(rule, dict):
+            raise ValueError(f"Rule must be an object: {rule!r}")
+        for field in ("name", "metric", "op", "status"):
+            if not isinstance(rule.get(field), str):
+                raise ValueError(f"Rule {rule.get('name')!r}: {field} must be a string")
+        if "value" not in rule:
+            raise ValueError(f"Rule {rule['name']}: missing value")
+        if rule["op"] == "in" and not isinstance(rule["value"], list):
+            raise ValueError(f"Rule {rule['name']}: value for 'in' must be a list")
+        if rule["op"] in ("<", "<=", ">", ">=") and not _is_number(rule["value"]):
+            raise ValueError(f"Rule {rule['name']}: value for {rule['op']} must be a number")
+
+
+# Compile a whole config into {metric: [compiled rules]}
+def compile_rules(config, hysteresis=True):
+    check_config(config)
+    margins = config.get("hysteresis", {}) if hysteresis else {}
+    by_metric = {}
+    names = set()
+    for rule in config["rules"]:
+        compiled = compile_rule(rule, margins.get(rule["metric"], 0))
+        if compiled[0] in names:
+            raise ValueError(f"Duplicate rule name: {compiled[0]}")
+        names.add(compiled[0])
+        by_metric.setdefault(compiled[1], []).append(compiled)
+    return by_metric
+
+
+def load_config(path=DEFAULT_RULES_PATH):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+# Incremental evaluator: only the rules that depend on the metric that changed
+# are re-run, the fired state of every other rule is kept from before
+class RuleEngine:
+    def __init__(self, path=DEFAULT_RULES_PATH, reload_interval=RELOAD_CHECK_INTERVAL, hysteresis=True):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.hysteresis = hysteresis
+        self._lock = threading.Lock()
+        self._values = {}
+        self._fired = {}  # rule name -> severity
+        self._mtime = os.stat(path).st_mtime
+        self._next_check = time.monotonic() + reload_interval
+        self.config = load_config(path)
+        self._rules = compile_rules(self.config, hysteresis)
+
+    @property
+    def metrics(self):
+        return tuple(self._rules)
+
+    def _run_metric(self, metric):
+        value = self._values.get(metric)
+        for name, _, severity, enter, hold in self._rules.get(metric, ()):
+            check = hold if name in self._fired else enter
+            if value is not None and check(value):
+                self._fired[name] = severity
+            else:
+                self._fired.pop(name, None)
+
+    def _result(self):
+        if not self._fired:
+            return "Normal", []
+        fired = sorted(self._fired, key=lambda name: -self._fired[name])
+        worst = self._fired[fired[0]]
+        return STATUSES[worst], fired
+
+    # Swap in a new config if the file changed, keeps the current rules on error
+    def reload_if_changed(self, force=False):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return False
+        if not force and mtime == self._mtime:
+            return False
+        try:
+            config = load_config(self.path)
+            rules = compile_rules(config, self.hysteresis)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"Keeping previous thresholds, failed to load {self.path}: {e}")
+            self._mtime = mtime
+            return False
+        with self._lock:
+            self.config = config
+            self._rules = rules
+            self._mtime = mtime
+            self._fired = {}
+            for metric in self._rules:
+                self._run_metric(metric)
+        print(f"Reloaded thresholds from {self.path}")
+        return True
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.reload_interval
+            self.reload_if_changed()
+
+    # Record a new value for one metric, returns (status, fired rule names)
+    def update(self, metric, value):
+        self._maybe_reload()
+        with self._lock:
+            self._values[metric] = value
+            self._run_metric(metric)
+            return self._result()
+
+    # Forget a metric, e.g. when the sensor reports no contact
+    def clear(self, metric):
+        with self._lock:
+            self._values.pop(metric, None)
+            self._run_metric(metric)
+            return self._result()
+
+    # Metrics that currently have a fired rule at the given status
+    def metrics_at(self, status):
+        level = SEVERITY[status]
+        with self._lock:
+            return {
+                metric
+                for metric, rules in self._rules.items()
+                for name, _, severity, _, _ in rules
+                if severity == level and name in self._fired
+            }
+
+    # Status a rule reports when it fires, None for unknown rules
+    def rule_status(self, name):
+        with self._lock:
+            for rules in self._rules.values():
+                for rule_name, _, severity, _, _ in rules:
+                    if rule_name == name:
+                        return STATUSES[severity]
+        return None
+
+    # Worst fired status for a single metric
+    def metric_status(self, metric):
+        with self._lock:
+            worst = max(
+                (severity for name, _, severity, _, _ in self._rules.get(metric, ()) if name in self._fired),
+                default=0,
+            )
+        return STATUSES[worst]
+
+    def evaluate(self):
+        self._maybe_reload()
+        with self._lock:
+            return self._result()
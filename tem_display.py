@@ -9,19 +9,15 @@ import adafruit_mlx90614
 import adafruit_ssd1306
 from PIL import Image, ImageDraw, ImageFont
 import RPi.GPIO as GPIO
+from indicators import IndicatorController
+from monitor_log import get_logger, shutdown_logging
+from vitals_shm import VitalsWriter
+from status_rules import RuleEngine
+from status_debounce import StatusDebouncer
 
-# LED and buzzer pin definitions
-green_led = 17  # GPIO 17
-yellow_led = 27  # GPIO 27
-red_led = 22    # GPIO 22
-buzzer_pin = 23 # GPIO 23
-
-# GPIO setup for LEDs and buzzer
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(green_led, GPIO.OUT)
-GPIO.setup(yellow_led, GPIO.OUT)
-GPIO.setup(red_led, GPIO.OUT)
-GPIO.setup(buzzer_pin, GPIO.OUT)
+# LED and buzzer controller for pins 17, 27, 22 and 23, only writes pins that change
+indicators = IndicatorController(GPIO)
+indicators.setup()
 
 # Initialize I2C bus and sensors
 i2c = busio.I2C(board.SCL, board.SDA)
@@ -34,10 +30,22 @@ temperature_value = 0
 temperature_history = []  # Store recent temperature values for graphing
 status = "Normal"
 
+# Structured key=value logging; records go through a queue to a writer thread
+# and repetitive lines are rate limited, so sensor loops never block on stdout
+log = get_logger("tem_display")
+
+# Shared-memory vitals record read by command_server.py
+vitals = VitalsWriter()
+
 # Data lock for shared resources
 data_lock = threading.Lock()
 running = True
 
+# Status thresholds are loaded from thresholds.json, the debouncer applies
+# hysteresis and minimum dwell times before the LEDs, buzzer or alerts react
+rules = RuleEngine()
+debouncer = StatusDebouncer(rules)
+
 # Temperature threshold settings
 HUMAN_TEMP_RANGE = (35.8, 40.0)  # Typical human body temperature range in °C
 HUMAN_TEMP_THRESHOLD_OFFSET = 2.5
@@ -45,20 +53,12 @@ MAX_ATTEMPTS = 3
 
 # Function to set LED and buzzer based on status
 def set_leds_and_buzzer(status):
-    GPIO.output(green_led, GPIO.HIGH if status == "Normal" else GPIO.LOW)
-    GPIO.output(yellow_led, GPIO.HIGH if status == "Warning" else GPIO.LOW)
-    GPIO.output(red_led, GPIO.HIGH if status == "Critical" else GPIO.LOW)
-    GPIO.output(buzzer_pin, GPIO.HIGH if status == "Critical" else GPIO.LOW)
+    indicators.show_status(status)
 
-# Update status based on BPM value
+# Update status based on temperature value
 def update_status():
     global status
-    if temperature_value > 39:
-        status = "Critical"
-    elif temperature_value > 37.8:
-        status = "Warning"
-    else:
-        status = "Normal"
+    status, _ = debouncer.update("temperature", temperature_value)
     set_leds_and_buzzer(status)
 
 # Function to dynamically adjust temperature threshold based on ambient temperature
@@ -85,10 +85,9 @@ def monitor_temperature():
         with data_lock:
             if HUMAN_TEMP_RANGE[0] <= object_temp <= HUMAN_TEMP_RANGE[1] and object_temp > dynamic_threshold:
                 temperature_value = object_temp
-                print(f"Human Body Temperature: {temperature_value:.2f}°C")
-                # Write temperature to file for external reading
-                with open("/home/pi/PatientConditionProject/temperature_data.txt", "w") as f:
-                    f.write(f"{temperature_value:.3f}")
+                log.debug("body_temperature", celsius=temperature_value)
+                # Publish the temperature for command_server.py
+                vitals.update(temperature=temperature_value)
 
                 # Append temperature value to history for graphing
                 temperature_history.append(temperature_value)
@@ -98,7 +97,7 @@ def monitor_temperature():
             else:
                 no_detection_count += 1
                 temperature_value = 0
-                print("No human body detected.")
+                log.debug("no_human_body", object_temp=object_temp)
 
             if no_detection_count >= MAX_ATTEMPTS:
                 HUMAN_TEMP_THRESHOLD_OFFSET += 0.1
@@ -151,8 +150,9 @@ def update_display():
 def cleanup_and_exit(signum, frame):
     global running
     running = False
-    set_leds_and_buzzer("Normal")  # Turn off all LEDs and buzzer on exit
+    indicators.close()  # Turn off all LEDs and buzzer on exit
     GPIO.cleanup()
+    shutdown_logging()
     sys.exit(0)
 
 # Main function to start monitoring and display threads
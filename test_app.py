@@ -1,3 +1,4 @@
+import os
 import time
 import board
 import busio
@@ -10,34 +11,31 @@ import adafruit_mlx90614
 import adafruit_ssd1306
 from PIL import Image, ImageDraw, ImageFont
 import RPi.GPIO as GPIO
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from dotenv import load_dotenv
-import os
-
-# Load environment variables from a .env file
-load_dotenv()
-
-# Retrieve email credentials and server configuration from environment variables
-SMTP_SERVER = os.getenv("SMTP_SERVER")
-SMTP_PORT = int(os.getenv("SMTP_PORT", 587))  # Default SMTP port is 587
-EMAIL_ADDRESS = os.getenv("EMAIL_USER")
-EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
-RECIPIENT_EMAIL = os.getenv("TO_EMAIL")
-
-# LED and buzzer pin definitions
-green_led = 17  # GPIO 17
-yellow_led = 27  # GPIO 27
-red_led = 22    # GPIO 22
-buzzer_pin = 23 # GPIO 23
-
-# GPIO setup for LEDs and buzzer
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(green_led, GPIO.OUT)
-GPIO.setup(yellow_led, GPIO.OUT)
-GPIO.setup(red_led, GPIO.OUT)
-GPIO.setup(buzzer_pin, GPIO.OUT)
+from indicators import IndicatorController
+from monitor_log import get_logger, set_level, shutdown_logging
+from critical_path import CriticalFastPath
+from alert_outbox import AlertOutbox
+from alert_digest import AlertDigest
+from alert_events import AlertEventSender
+from notifiers import NotificationFanout, build_notifiers
+from event_bus import bus, COALESCE
+from status_rules import RuleEngine
+from status_debounce import StatusDebouncer
+from acquisition import AcquisitionProcess, PULSE, GSR, OBJECT_TEMP, AMBIENT_TEMP
+from qos import QosController
+from vitals_shm import VitalsWriter
+
+# Emails are stored in the SQLite outbox and sent by its background thread
+# over one persistent SMTP session, retried until the network is back.
+# Server and credentials come from the .env file (see send_mail.py)
+outbox = AlertOutbox()
+
+# LED and buzzer controller for pins 17, 27, 22 and 23, only writes pins that change
+indicators = IndicatorController(GPIO)
+indicators.setup()
+
+# Critical goes straight to the LEDs and buzzer and its latency is measured
+fast_path = CriticalFastPath(indicators)
 
 # Initialize I2C bus and sensors
 i2c = busio.I2C(board.SCL, board.SDA)
@@ -45,12 +43,12 @@ adc = ADS1115(i2c, address=0x48)
 mlx = adafruit_mlx90614.MLX90614(i2c, address=0x5a)
 oled = adafruit_ssd1306.SSD1306_I2C(128, 32, i2c, addr=0x3c)
 
-# Email tracking counters
-email_sent_count = 0
-MAX_EMAILS = 3
-bpm_warning_count = 0
-temp_warning_count = 0
-stress_warning_count = 0
+# ACQUISITION_MODE=process moves the ADC and MLX reads into a dedicated process
+# pinned to its own core (see acquisition.py); the monitors then take its
+# timestamped samples from shared memory instead of reading the I2C bus
+ACQUISITION_MODE = os.getenv("ACQUISITION_MODE", "thread")
+acquisition = AcquisitionProcess() if ACQUISITION_MODE == "process" else None
+
 
 # Shared variables
 bpm_value = 0
@@ -67,9 +65,12 @@ low_threshold = 1.5
 last_pulse_time = 0
 first_pulse = True
 
-# BPM thresholds for status levels
-normal_bpm_range = (60, 100)
-warning_bpm_range = (50, 120)
+# HRV as RMSSD over the last beat-to-beat intervals, in ms
+RR_INTERVAL_RANGE = (300, 2000)  # 30-200 BPM, anything else is a missed or double beat
+RR_INTERVAL_COUNT = 10
+rr_intervals = []
+hrv_value = 0
+hrv_computed_at = 0
 
 # Temperature threshold settings
 HUMAN_TEMP_RANGE = (35.8, 40.0)  # Typical human body temperature range in °C
@@ -86,184 +87,164 @@ GSR_AVERAGE_COUNT = 10  # Number of GSR readings to average for interaction chec
 # Flag to check if cleanup has already been done
 cleaned_up = False
 
+# Structured key=value logging; records go through a queue to a writer thread
+# and repetitive lines are rate limited, so sensor loops never block on stdout
+log = get_logger("test_app")
+
 # Lock for synchronizing data access
 data_lock = threading.Lock()
 running = True
 
-def send_email(subject, body):
-    try:
-        # Create the email message
-        msg = MIMEMultipart()
-        msg["From"] = EMAIL_ADDRESS
-        msg["To"] = RECIPIENT_EMAIL
-        msg["Subject"] = subject
-        msg.attach(MIMEText(body, "plain"))
-
-        # Connect to the SMTP server and send the email
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()  # Secure the connection
-            server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)  # Log in to the email account
-            server.send_message(msg)  # Send the email
-
-        print(f"Email sent successfully to {RECIPIENT_EMAIL}.")
-        
-        # Log email event for debugging
-        with open("/home/pi/PatientConditionProject/email_log.txt", "a") as log:
-            log.write(f"Email sent at {time.ctime()} - Subject: {subject}\n")
-        
-        # Update the email sent flag
-        with open("/home/pi/PatientConditionProject/email_sent_flag.txt", "w") as flag_file:
-            flag_file.write("1")  # Write "1" to indicate an email was sent
-
-    except Exception as e:
-        print(f"Error sending email: {e}")
-
-# Function to check conditions and send an email
-def check_and_send_email():
-    global email_sent_count, bpm_warning_count, temp_warning_count, stress_warning_count
-
-    if email_sent_count < MAX_EMAILS:
-        subject = "Health Monitoring Alert"
-        details = []
-
-        # Add specific messages for each out-of-range parameter
-        if bpm_warning_count >= 2:
-            details.append("BPM is out of range.")
-        if temp_warning_count >= 2:
-            details.append("Temperature is out of range.")
-        if stress_warning_count >= 2:
-            details.append("Stress Level is critical.")
-
-        # Create a combined details message
-        if len(details) == 1:
-            detailed_message = details[0]
-        elif len(details) == 2:
-            detailed_message = f"Both {details[0][:-1]} and {details[1].lower()}"
-        else:
-            detailed_message = f"All parameters: {', '.join(details)}"
-
-        body = (
-            f"Health Alert!\n\n"
-            f"Status: {status}\n"
-            f"BPM: {bpm_value:.2f}\n"
-            f"Temperature: {temperature_value:.2f}°C\n"
-            f"Stress Level: {stress_level}\n\n"
-            f"Details: {detailed_message}\n\n"
-            f"Please take immediate action."
-        )
-
-        # Send email using send_email function
-        send_email(subject, body)
-        email_sent_count += 1
-        print(f"Total emails sent so far: {email_sent_count}")  # Optional for tracking
-
-        # Reset relevant counters to avoid duplicate emails for the same condition
-        if bpm_warning_count >= 3:
-            bpm_warning_count = 0
-        if temp_warning_count >= 3:
-            temp_warning_count = 0
-        if stress_warning_count >= 3:
-            stress_warning_count = 0
-            
-# Function to control LEDs and buzzer based on status and interaction status
-def set_leds_and_buzzer(status, interaction):
-    if interaction:  # Only trigger LEDs and buzzer if human interaction is detected
-        if status == "Normal":
-            GPIO.output(green_led, GPIO.HIGH)
-            GPIO.output(yellow_led, GPIO.LOW)
-            GPIO.output(red_led, GPIO.LOW)
-            GPIO.output(buzzer_pin, GPIO.LOW)
-        elif status == "Warning":
-            GPIO.output(green_led, GPIO.LOW)
-            GPIO.output(yellow_led, GPIO.HIGH)
-            GPIO.output(red_led, GPIO.LOW)
-        elif status == "Critical":
-            GPIO.output(green_led, GPIO.LOW)
-            GPIO.output(yellow_led, GPIO.LOW)
-            GPIO.output(red_led, GPIO.HIGH)
-            GPIO.output(buzzer_pin, GPIO.HIGH)
-    else:
-        # Turn off all LEDs and buzzer if there is no human interaction
-        GPIO.output(green_led, GPIO.LOW)
-        GPIO.output(yellow_led, GPIO.LOW)
-        GPIO.output(red_led, GPIO.LOW)
-        GPIO.output(buzzer_pin, GPIO.LOW)
+# Status thresholds are loaded from thresholds.json, the debouncer applies
+# hysteresis and minimum dwell times before the LEDs, buzzer or alerts react
+rules = RuleEngine()
+debouncer = StatusDebouncer(rules)
 
-# Update status based on BPM, GSR, and Temperature using ranges
-def update_status():
-    global status, bpm_warning_count, temp_warning_count, stress_warning_count
+# Shared-memory vitals record read by command_server.py
+vitals = VitalsWriter()
 
-    if human_interaction:
-        # Check and update status based on thresholds
-        if bpm_value < warning_bpm_range[0] or bpm_value > warning_bpm_range[1]:
-            bpm_warning_count += 1
-        else:
-            bpm_warning_count = 0  # Reset if back to normal
+# Under CPU pressure the display, WebSocket pushes and logging slow down in
+# steps; sampling rates never change. The level is also published for
+# command_server.py and as a device-health metric.
+def apply_qos(level, settings):
+    set_level(settings["log_level"])
+    vitals.update(qos_level=level)
+    log.warning("qos_level", level=level, **settings)
+    bus.publish("device-health", {"qos_level": level})
 
-        if temperature_value > 39:
-            temp_warning_count += 1
-        else:
-            temp_warning_count = 0  # Reset if back to normal
+qos = QosController(on_change=apply_qos)
 
-        if stress_level == "High":
-            stress_warning_count += 1
-        else:
-            stress_warning_count = 0  # Reset if back to normal
+# Bus topic to rule engine metric
+TOPIC_METRICS = {"beat": "bpm", "temperature": "temperature", "gsr": "stress"}
 
-        # Set overall status
-        if bpm_value < warning_bpm_range[0] or bpm_value > warning_bpm_range[1] or stress_level == "High" or temperature_value > 39:
-            status = "Critical"
-        elif bpm_value < normal_bpm_range[0] or bpm_value > normal_bpm_range[1] or stress_level == "Elevated" or temperature_value > 38.7:
-            status = "Warning"
-        else:
-            status = "Normal"
+# Runs on the outbox thread once the server accepted the email
+def record_email_sent(subject):
+    # Log email event for debugging
+    with open("/home/pi/PatientConditionProject/email_log.txt", "a") as email_log:
+        email_log.write(f"Email sent at {time.ctime()} - Subject: {subject}\n")
+
+# Queue the email and return immediately, True once the outbox accepted it.
+# The digest id makes a retried submit of the same digest a no-op.
+def send_email(subject, body, delivery_id):
+    return outbox.submit(subject, body, on_sent=record_email_sent, delivery_id=delivery_id) is not None
+
+# Digests go to email and, when configured, a webhook and an MQTT topic at once
+notifications = NotificationFanout(build_notifiers(send_email))
+
+# All conditions seen within a window go out as one digest, each condition is
+# rate limited until it clears
+alert_digest = AlertDigest(notifications.submit, rule_status=rules.rule_status)
+
+# The WebSocket clients (through command_server.py) get an alert the moment
+# the status turns Warning or Critical, without the digest window
+alert_events = AlertEventSender()
+
+# Function to control LEDs and buzzer based on status and interaction status
+def set_leds_and_buzzer(status, interaction, detected_at=None):
+    return fast_path.indicate(status, interaction, detected_at)
+
+# Update status after one metric changed, thresholds come from thresholds.json
+def update_status(metric, value):
+    global status
+
+    previous_status = status
+    new_status, fired = debouncer.update(metric, value)
+    # From the first reading that fired the rules, not the end of the dwell
+    detected_at = debouncer.detected_at(metric)
+    if human_interaction:
+        status = new_status
     else:
         status = "No Human Interaction"  # No interaction means no critical status
-    
-    # Print status if it's "Warning" or "Critical"
-    if status != "Normal":
-        print(f"Status: {status}, BPM: {bpm_value:.2f}, Temperature: {temperature_value:.2f}C, Stress Level: {stress_level}")
-    
-    # Trigger LEDs and buzzer
-    set_leds_and_buzzer(status, human_interaction)
+    if status != previous_status:
+        vitals.update(status=status)  # For command_server.py subscribers
 
-    # Check if email needs to be sent
-    if status in ["Warning", "Critical"]:
-        check_and_send_email()
+    # Trigger LEDs and buzzer before anything that can block
+    latency = set_leds_and_buzzer(status, human_interaction, detected_at)
+    if latency is not None:
+        bus.publish("device-health", {"critical_latency_ms": latency * 1000})
 
+    # Log status if it's "Warning" or "Critical", repeats are rate limited
+    if status != "Normal":
+        log.info("status", status=status, bpm=bpm_value, temperature=temperature_value, stress=stress_level, rules=",".join(fired))
+
+    # Alerting runs on its own consumer so SMTP never holds up the status engine
+    bus.publish("status", {"status": status, "metric": metric, "value": value, "fired": fired})
+
+# Status engine consumer: re-evaluate only the rules for the metric that changed
+def handle_vitals(event):
+    update_status(TOPIC_METRICS[event.topic], event.data)
+
+# Alert consumer: conditions only count while the shown status is Warning or Critical
+def handle_status(event):
+    alert_events.update(event.data["status"], {"bpm": bpm_value, "temperature": temperature_value, "stress": stress_level}, event.data["fired"])
+    alerting = event.data["status"] in ["Warning", "Critical"]
+    alert_digest.record(event.data["metric"], event.data["value"], event.data["fired"] if alerting else [])
+
+# Vitals export consumer for command_server.py
+def export_data(event):
+    if event.topic == "beat":
+        vitals.update(bpm=event.data, hrv=hrv_value if len(rr_intervals) >= 3 else None)
+    elif event.topic == "temperature":
+        vitals.update(temperature=event.data)
+    elif event.topic == "gsr":
+        vitals.update(stress=event.data)
+
+
+# New pulse samples as (time, voltage): one fresh read, or everything the
+# acquisition process sampled since the last call
+def read_pulse(reader):
+    if reader is None:
+        chan_heart_rate = AnalogIn(adc, 0)
+        return [(time.time(), chan_heart_rate.voltage)]
+    return [(timestamp, voltage) for timestamp, _, voltage in reader.read()]
+
+# Add one beat-to-beat interval and recompute the HRV, under CPU pressure
+# at most every hrv_interval seconds (see qos.py)
+def update_hrv(pulse_interval):
+    global hrv_value, hrv_computed_at
+    if not RR_INTERVAL_RANGE[0] <= pulse_interval <= RR_INTERVAL_RANGE[1]:
+        return
+    rr_intervals.append(pulse_interval)
+    if len(rr_intervals) > RR_INTERVAL_COUNT:
+        rr_intervals.pop(0)
+    now = time.monotonic()
+    if len(rr_intervals) >= 3 and now - hrv_computed_at >= qos.settings["hrv_interval"]:
+        hrv_computed_at = now
+        differences = [(b - a) ** 2 for a, b in zip(rr_intervals, rr_intervals[1:])]
+        hrv_value = (sum(differences) / len(differences)) ** 0.5
 
 # Heart Rate Monitoring
 def monitor_heart_rate():
     global bpm_value, bpm_history, last_pulse_time, first_pulse, running
+    reader = acquisition.reader((PULSE,)) if acquisition else None
+    loop_watch = qos.watch("heart_rate", 0.1)
     while running:
+        loop_watch.tick()
         try:
-            chan_heart_rate = AnalogIn(adc, 0)
-            voltage = chan_heart_rate.voltage
-            current_time = time.time()
-            
-            # Detecting the pulse
-            if voltage > high_threshold and first_pulse:
-                last_pulse_time = current_time
-                first_pulse = False
-            elif voltage > high_threshold and (current_time - last_pulse_time) > 0.4:
-                pulse_interval = (current_time - last_pulse_time) * 1000  # Convert to milliseconds
-                bpm_value = 60000 / pulse_interval
-                last_pulse_time = current_time
-
-                # Update BPM history for graphing
-                with data_lock:
-                    bpm_history.append(bpm_value)
-                    if len(bpm_history) > 20:  # Limit history length
-                        bpm_history.pop(0)
-                    print(f"Heart Rate: {bpm_value:.2f} BPM")
-                with open("/home/pi/PatientConditionProject/bpm_data.txt", "w") as f:
-                    f.write(str(bpm_value))
-
-                # Update status based on new BPM value
-                update_status()
+            for current_time, voltage in read_pulse(reader):
+                # Detecting the pulse
+                if voltage > high_threshold and first_pulse:
+                    last_pulse_time = current_time
+                    first_pulse = False
+                elif voltage > high_threshold and (current_time - last_pulse_time) > 0.4:
+                    pulse_interval = (current_time - last_pulse_time) * 1000  # Convert to milliseconds
+                    bpm_value = 60000 / pulse_interval
+                    last_pulse_time = current_time
+
+                    # Update BPM history for graphing
+                    with data_lock:
+                        update_hrv(pulse_interval)
+                        bpm_history.append(bpm_value)
+                        if len(bpm_history) > 20:  # Limit history length
+                            bpm_history.pop(0)
+                        log.debug("heart_rate", bpm=bpm_value)
+
+                    # Publish the beat; status, export and alerting consume it
+                    bus.publish("beat", bpm_value)
             time.sleep(0.1)
-        except OSError:
-            print("Heart Rate error, reinitializing...")
+        except OSError as e:
+            log.warning("heart_rate_error", error=e, action="reinitializing")
+            bus.publish("device-health", "Heart Rate error")
             time.sleep(1)
 
 # Function to dynamically adjust temperature threshold based on ambient temperature
@@ -278,22 +259,43 @@ def get_stable_temperature(sensor, readings=20):
         time.sleep(0.02)
     return temp_sum / readings
 
+# Averaged object and latest ambient temperature. From the acquisition
+# process this is the average over the samples since the last call; None
+# until it has sampled both.
+def read_temperatures(reader, ambient_temp):
+    if reader is None:
+        return get_stable_temperature(mlx), mlx.ambient_temperature
+    time.sleep(0.4)  # Same averaging window as 20 reads 20 ms apart
+    object_temps = []
+    for _, channel, value in reader.read():
+        if channel == OBJECT_TEMP:
+            object_temps.append(value)
+        else:
+            ambient_temp = value
+    if not object_temps:
+        return None, ambient_temp
+    return sum(object_temps) / len(object_temps), ambient_temp
+
 # Temperature monitoring function
 def monitor_temperature():
     global temperature_value, status, HUMAN_TEMP_THRESHOLD_OFFSET
     no_detection_count = 0
+    reader = acquisition.reader((OBJECT_TEMP, AMBIENT_TEMP)) if acquisition else None
+    ambient_temp = None
+    loop_watch = qos.watch("temperature", 1.4)
 
     while running:
-        object_temp = get_stable_temperature(mlx)
-        dynamic_threshold = mlx.ambient_temperature + HUMAN_TEMP_THRESHOLD_OFFSET
+        loop_watch.tick()
+        object_temp, ambient_temp = read_temperatures(reader, ambient_temp)
+        if object_temp is None or ambient_temp is None:
+            time.sleep(1)
+            continue
+        dynamic_threshold = ambient_temp + HUMAN_TEMP_THRESHOLD_OFFSET
 
         with data_lock:
             if HUMAN_TEMP_RANGE[0] <= object_temp <= HUMAN_TEMP_RANGE[1] and object_temp > dynamic_threshold:
                 temperature_value = object_temp
-                print(f"Human Body Temperature: {temperature_value:.2f}°C")
-                # Write temperature to file for external reading
-                with open("/home/pi/PatientConditionProject/temperature_data.txt", "w") as f:
-                    f.write(f"{temperature_value:.3f}")
+                log.debug("body_temperature", celsius=temperature_value)
 
                 # Append temperature value to history for graphing
                 temperature_history.append(temperature_value)
@@ -303,13 +305,13 @@ def monitor_temperature():
             else:
                 no_detection_count += 1
                 temperature_value = 0
-                print("No human body detected.")
+                log.debug("no_human_body", object_temp=object_temp)
 
             if no_detection_count >= MAX_ATTEMPTS:
                 HUMAN_TEMP_THRESHOLD_OFFSET += 0.1
                 no_detection_count = 0
 
-        update_status()
+        bus.publish("temperature", temperature_value)
         time.sleep(1)
 
 # Function to determine stress level based on GSR reading
@@ -334,21 +336,32 @@ def read_gsr():
     chan_gsr = AnalogIn(adc, 1)
     return chan_gsr.value
 
+# Latest GSR readings to average, from the ADC or the acquisition process
+def read_gsr_readings(reader):
+    if reader is None:
+        return [read_gsr() for _ in range(GSR_AVERAGE_COUNT)]
+    return [value for _, _, value in reader.read()][-GSR_AVERAGE_COUNT:]
+
 def monitor_gsr():
     global stress_level, human_interaction
+    reader = acquisition.reader((GSR,)) if acquisition else None
+    loop_watch = qos.watch("gsr", 3)
     while running:
+        loop_watch.tick()
         try:
             # Average multiple GSR readings to confirm interaction
-            gsr_readings = [read_gsr() for _ in range(GSR_AVERAGE_COUNT)]
-            avg_gsr = sum(gsr_readings) / GSR_AVERAGE_COUNT
+            gsr_readings = read_gsr_readings(reader)
+            if not gsr_readings:
+                time.sleep(1)
+                continue
+            avg_gsr = sum(gsr_readings) / len(gsr_readings)
             stress_level = determine_stress_level(avg_gsr)
-            with data_lock:
-                print(f"GSR Avg: {avg_gsr:.2f}, Stress Level: {stress_level}, Interaction: {human_interaction}")
-            with open("/home/pi/PatientConditionProject/gsr_data.txt", "w") as f:
-                f.write(stress_level)
+            log.debug("gsr", avg=avg_gsr, stress=stress_level, interaction=human_interaction)
+            bus.publish("gsr", stress_level)
             time.sleep(3)
-        except OSError:
-            print("GSR error, reinitializing...")
+        except OSError as e:
+            log.warning("gsr_error", error=e, action="reinitializing")
+            bus.publish("device-health", "GSR error")
             time.sleep(1)
             
 # OLED Display Thread with Compact Layout for 128x32 Display
@@ -369,7 +382,7 @@ def update_display():
             oled.image(image)
             oled.show()
         
-        time.sleep(1.5)
+        time.sleep(qos.settings["display_interval"])  # 1.5 s unless the CPU is under pressure
 
 # Graceful exit for systemd service
 def cleanup_and_exit(signum, frame):
@@ -378,23 +391,72 @@ def cleanup_and_exit(signum, frame):
         return
     cleaned_up = True  # Set flag to indicate cleanup is done
     running = False
-    print("Stop Measuring")  # Print statement for KeyboardInterrupt
+    bus.close()
+    alert_digest.close()
+    log.info("alert_events", **alert_events.stats())
+    alert_events.close()
+    log.info("notification_channels", channels=notifications.stats())
+    notifications.close()
+    outbox.close()
+    log.info("critical_latency", **fast_path.stats())
+    fast_path.close()
+    log.info("qos", **qos.stats())
+    qos.close()
+    if acquisition:
+        log.info("acquisition", **acquisition.stats())
+        acquisition.close()
+    log.info("monitoring_stopped")
     try:
-        GPIO.output(green_led, GPIO.LOW)
-        GPIO.output(yellow_led, GPIO.LOW)
-        GPIO.output(red_led, GPIO.LOW)
-        GPIO.output(buzzer_pin, GPIO.LOW)
+        indicators.close()
         GPIO.cleanup()
     except RuntimeError:
         pass
+    shutdown_logging()
     sys.exit(0)
 
+# Start the background services, also used by monitor_daemon.py. The outbox
+# and notifications start once and keep running, so alerts already queued
+# go out whatever mode the daemon is in; acquisition, QoS and the bus
+# consumers run only while this mode does (see stop_background). Consumers
+# run at their own pace; the vitals queues coalesce so a slow consumer only
+# ever sees the latest value per metric
+background_started = False
+consumers = []
+
+def start_background():
+    global background_started
+    if not background_started:
+        background_started = True
+        outbox.start()
+        notifications.start()
+    if consumers:
+        return
+    if acquisition:
+        acquisition.start()
+    vitals.update(status=status, qos_level=0)
+    qos.start()
+    consumers.append(bus.start_consumer("status-engine", ("beat", "temperature", "gsr"), handle_vitals, policy=COALESCE))
+    consumers.append(bus.start_consumer("vitals-export", ("beat", "temperature", "gsr"), export_data, policy=COALESCE))
+    consumers.append(bus.start_consumer("alerting", "status", handle_status))
+
+# Stop what only this mode uses when monitor_daemon.py switches away; the
+# acquisition process must not keep reading the ADC next to another mode
+def stop_background():
+    for subscription in consumers:
+        bus.unsubscribe(subscription)
+    consumers.clear()
+    qos.close()
+    if acquisition:
+        acquisition.stop()
+
 # Main function to start monitoring and display threads
 if __name__ == "__main__":
     # Register signal handlers for graceful exit
     signal.signal(signal.SIGTERM, cleanup_and_exit)
     signal.signal(signal.SIGINT, cleanup_and_exit)
-    
+
+    start_background()
+
     try:
         heart_rate_thread = threading.Thread(target=monitor_heart_rate)
         temperature_thread = threading.Thread(target=monitor_temperature)
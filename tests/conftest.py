@@ -0,0 +1,183 @@
+import email
+import http.server
+import json
+import socket
+import socketserver
+import struct
+import threading
+
+import pytest
+
+
+# Local stand-ins for the alert channels: an SMTP server, a webhook receiver
+# and an MQTT broker, each on a free localhost port in a background thread
+
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply("220 stand-in SMTP")
+        for line in self.rfile:
+            command = line.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 stand-in")
+            elif command.startswith("MAIL"):
+                if server.fail_next:
+                    server.fail_next -= 1
+                    self.reply("451 Try again later")
+                else:
+                    self.reply("250 OK")
+            elif command.startswith(("RCPT", "RSET")):
+                self.reply("250 OK")
+            elif command == "NOOP":
+                server.noops += 1
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for data_line in self.rfile:
+                    if data_line == b".\r\n":
+                        break
+                    data.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                server.messages.append(email.message_from_bytes(b"".join(data)))
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Not implemented")
+
+
+class SmtpStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SmtpHandler)
+        self.messages = []
+        self.connections = 0
+        self.noops = 0
+        self.fail_next = 0  # MAIL commands to answer with 451
+
+
+class WebhookHandler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append((self.path, self.headers["Content-Type"], json.loads(body)))
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class WebhookStandIn(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), WebhookHandler)
+        self.requests = []  # (path, content type, JSON body)
+        self.statuses = []  # Status codes for the next requests, then 200
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+def _read_packet(conn):
+    header = conn.recv(1)
+    if not header:
+        return None, b""
+    length = shift = 0
+    while True:
+        byte = conn.recv(1)[0]
+        length |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            break
+    body = b""
+    while len(body) < length:
+        body += conn.recv(length - len(body))
+    return header[0], body
+
+
+def _string(body, pos):
+    length = struct.unpack_from("!H", body, pos)[0]
+    return body[pos + 2:pos + 2 + length].decode(), pos + 2 + length
+
+
+# Just enough MQTT 3.1.1 for a QoS 0 publisher: CONNECT, PUBLISH, DISCONNECT
+class MqttStandIn:
+    def __init__(self):
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self.return_code = 0  # CONNACK code, 5 refuses the client
+        self.connects = []    # (client id, user, password)
+        self.published = []   # (topic, payload)
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            with conn:
+                self._session(conn)
+
+    def _session(self, conn):
+        while True:
+            packet_type, body = _read_packet(conn)
+            if packet_type is None or packet_type == 0xE0:
+                return
+            if packet_type == 0x10:
+                _, pos = _string(body, 0)
+                flags = body[pos + 1]
+                client_id, pos = _string(body, pos + 4)
+                user = password = None
+                if flags & 0x80:
+                    user, pos = _string(body, pos)
+                if flags & 0x40:
+                    password, pos = _string(body, pos)
+                self.connects.append((client_id, user, password))
+                conn.sendall(bytes([0x20, 2, 0, self.return_code]))
+            elif packet_type & 0xF0 == 0x30:
+                topic, pos = _string(body, 0)
+                self.published.append((topic, json.loads(body[pos:])))
+
+    def close(self):
+        self.sock.close()
+
+
+@pytest.fixture
+def smtp_server():
+    server = SmtpStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def webhook_server():
+    server = WebhookStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def mqtt_broker():
+    broker = MqttStandIn()
+    yield broker
+    broker.close()
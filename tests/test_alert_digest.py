@@ -0,0 +1,37 @@
+from alert_digest import AlertDigest, digest_id
+
+
+def _digest(sent, **kwargs):
+    return AlertDigest(lambda subject, body, **details: sent.append(details["conditions"]), window=3600, **kwargs)
+
+
+def test_a_flapping_condition_stays_rate_limited():
+    sent = []
+    digest = _digest(sent, rate_limit=2, rate_period=100)
+    for n in range(5):
+        digest.record("bpm", 130, ["bpm_high"], now=n * 10)
+        digest.record("bpm", 80, [], now=n * 10 + 1)  # Clears before the window ends
+        digest.flush()
+    digest.close()
+    assert sent == [["bpm_high"], ["bpm_high"]]
+    assert digest.stats()["conditions_suppressed"] == 3
+
+
+def test_close_sends_what_is_pending():
+    sent = []
+    digest = _digest(sent)
+    digest.record("temperature", 38.5, ["temperature_high"])
+    digest.close()
+    assert sent == [["temperature_high"]]
+    assert digest.stats()["pending"] == 0
+
+
+def test_a_digest_keeps_its_id_and_the_next_window_gets_a_new_one():
+    ids = []
+    digest = AlertDigest(lambda subject, body, **details: ids.append(details["id"]), window=3600)
+    digest.record("bpm", 130, ["bpm_high", "bpm_low"], now=100.0)
+    digest.flush()
+    digest.record("bpm", 130, ["bpm_low", "bpm_high"], now=200.0)
+    digest.close()
+    assert ids[0] == digest_id({"bpm_low": None, "bpm_high": None}, 100.0)
+    assert ids[1] == digest_id(["bpm_high", "bpm_low"], 200.0) != ids[0]
@@ -0,0 +1,117 @@
+import asyncio
+import json
+
+import client_sender
+from alert_events import ALERT_HISTORY, AlertEvents, AlertEventSender
+from client_sender import ClientSender
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, message):
+        self.messages.append(json.loads(message))
+
+
+class StalledSocket:
+    async def send(self, message):
+        await asyncio.sleep(3600)
+
+    async def close(self):
+        pass
+
+
+def _alert(n):
+    return {"id": f"a{n}", "severity": "Warning", "metrics": {}, "conditions": [], "timestamp": n, "subject": "Alert"}
+
+
+def test_sender_sends_on_every_change_into_warning_or_critical(tmp_path):
+    path = str(tmp_path / "alerts.sock")
+
+    async def run():
+        events = AlertEvents(path).start()
+        sender = AlertEventSender(path)
+        readings = {"bpm": 130.0, "temperature": 37.0, "stress": "Normal"}
+        for status in ("Normal", "Warning", "Warning", "Critical", "Critical", "Normal", "Warning"):
+            sender.update(status, readings, ["bpm_high"])
+        await asyncio.sleep(0.05)
+        events.close()
+        sender.close()
+        return events, sender
+
+    events, sender = asyncio.run(run())
+    assert [event["severity"] for event in events.alerts.values()] == ["Warning", "Critical", "Warning"]
+    first = next(iter(events.alerts.values()))
+    assert (first["metrics"], first["conditions"], first["acked"]) == ({"bpm": 130.0, "temperature": 37.0, "stress": "Normal"}, ["bpm_high"], None)
+    assert sender.stats() == {"sent": 3, "failed": 0}
+
+
+def test_sender_without_a_server_drops_the_event(tmp_path):
+    sender = AlertEventSender(str(tmp_path / "nobody.sock"))
+    assert sender.update("Critical", {}, []) is None
+    assert sender.stats() == {"sent": 0, "failed": 1}
+    sender.close()
+
+
+def test_a_stream_gets_changes_in_order(tmp_path):
+    async def run():
+        events = AlertEvents(str(tmp_path / "alerts.sock"))
+        websocket = RecordingSocket()
+        events.publish(_alert(0))
+        stream = asyncio.create_task(events.stream(websocket))
+        await asyncio.sleep(0)
+        events.publish(_alert(1))
+        events.ack("a0", by="nurse")
+        await asyncio.sleep(0)
+        stream.cancel()
+        return websocket.messages
+
+    messages = asyncio.run(run())
+    assert [next(iter(m)) for m in messages] == ["Alert", "Alert", "AlertAck"]
+    assert [messages[0]["Alert"]["id"], messages[1]["Alert"]["id"], messages[2]["AlertAck"]["id"]] == ["a0", "a1", "a0"]
+
+
+def test_a_stream_that_fell_behind_gets_the_whole_state(tmp_path):
+    async def run():
+        events = AlertEvents(str(tmp_path / "alerts.sock"))
+        websocket = RecordingSocket()
+        events.publish(_alert(0))
+        stream = asyncio.create_task(events.stream(websocket))
+        await asyncio.sleep(0)
+        websocket.messages.clear()
+        # More changes than the history keeps before the stream wakes up
+        for n in range(1, ALERT_HISTORY + 5):
+            events.publish(_alert(n))
+        events.ack("a10", by="nurse")
+        await asyncio.sleep(0)
+        stream.cancel()
+        return events, websocket.messages
+
+    events, messages = asyncio.run(run())
+    alerts = [m["Alert"]["id"] for m in messages if "Alert" in m]
+    acks = [m["AlertAck"]["id"] for m in messages if "AlertAck" in m]
+    assert alerts == [event["id"] for event in events.alerts.values() if event["acked"] is None]
+    assert acks == ["a10"]
+    assert events.stats()["resyncs"] == 1
+
+
+def test_alerts_are_not_dropped_from_a_full_client_queue(monkeypatch, tmp_path):
+    monkeypatch.setattr(client_sender, "MAX_QUEUE", 4)
+
+    async def run():
+        events = AlertEvents(str(tmp_path / "alerts.sock"))
+        sender = ClientSender(StalledSocket())
+        stream = asyncio.create_task(events.stream(sender))
+        await asyncio.sleep(0)
+        events.publish(_alert(0))
+        await asyncio.sleep(0)
+        for n in range(10):
+            sender.send_latest(("Continuous", n), "frame")
+        queued = list(sender._queue.values())
+        stream.cancel()
+        return sender, queued
+
+    sender, queued = asyncio.run(run())
+    assert json.loads(queued[0])["Alert"]["id"] == "a0"
+    assert sender.dropped == 7 and not sender.disconnected
@@ -0,0 +1,93 @@
+import socket
+import threading
+import time
+
+import alert_outbox
+from alert_outbox import AlertOutbox
+from smtp_session import SmtpSession
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _outbox(tmp_path, port, **kwargs):
+    session = SmtpSession("127.0.0.1", port, user=None, password=None, starttls=False)
+    return AlertOutbox(str(tmp_path / "outbox.db"), session=session, sender="monitor@example.com", recipient="nurse@example.com", **kwargs)
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+
+def test_queued_alerts_go_out_over_one_session(tmp_path, smtp_server):
+    outbox = _outbox(tmp_path, smtp_server.server_address[1]).start()
+    try:
+        ids = [outbox.submit(f"Alert {n}", "Body") for n in range(3)]
+        _wait_for(lambda: len(smtp_server.messages) == 3)
+    finally:
+        outbox.close()
+    assert [m["Subject"] for m in smtp_server.messages] == ["Alert 0", "Alert 1", "Alert 2"]
+    assert [m["Message-ID"] for m in smtp_server.messages] == [f"<{i}@patient-monitor>" for i in ids]
+    assert smtp_server.connections == 1
+    assert outbox.counts() == {"pending": 0, "sent": 3, "failed": 0}
+
+
+def test_a_rejected_send_is_retried(monkeypatch, tmp_path, smtp_server):
+    monkeypatch.setattr(alert_outbox, "BASE_BACKOFF", 0.05)
+    smtp_server.fail_next = 1
+    outbox = _outbox(tmp_path, smtp_server.server_address[1]).start()
+    sent = threading.Event()
+    try:
+        delivery_id = outbox.submit("Alert", "Body", on_sent=lambda _: sent.set())
+        assert sent.wait(5)
+    finally:
+        outbox.close()
+    status = outbox.status(delivery_id)
+    assert (status["state"], status["attempts"], status["last_error"]) == ("sent", 2, None)
+    assert len(smtp_server.messages) == 1
+
+
+def test_a_delivery_id_is_sent_once(tmp_path, smtp_server):
+    outbox = _outbox(tmp_path, smtp_server.server_address[1]).start()
+    try:
+        outbox.submit("Alert", "Body", delivery_id="digest-1")
+        outbox.submit("Alert", "Body", delivery_id="digest-1")
+        _wait_for(lambda: outbox.counts()["sent"] == 1)
+        time.sleep(0.1)
+    finally:
+        outbox.close()
+    assert len(smtp_server.messages) == 1
+
+
+def test_an_idle_session_is_kept_alive(tmp_path, smtp_server):
+    outbox = _outbox(tmp_path, smtp_server.server_address[1], keepalive=0.1).start()
+    try:
+        outbox.submit("Alert", "Body")
+        _wait_for(lambda: smtp_server.noops >= 2)
+    finally:
+        outbox.close()
+    assert smtp_server.connections == 1
+
+
+def test_unsent_alerts_survive_a_restart(monkeypatch, tmp_path, smtp_server):
+    monkeypatch.setattr(alert_outbox, "BASE_BACKOFF", 0.05)
+    outbox = _outbox(tmp_path, _free_port()).start()  # Nobody listening
+    try:
+        delivery_id = outbox.submit("Alert", "Body")
+        _wait_for(lambda: (outbox.status(delivery_id) or {}).get("attempts") == 1)
+    finally:
+        outbox.close()
+    assert outbox.status(delivery_id)["state"] == "pending"
+
+    outbox = _outbox(tmp_path, smtp_server.server_address[1]).start()
+    try:
+        _wait_for(lambda: outbox.status(delivery_id)["state"] == "sent")
+    finally:
+        outbox.close()
+    assert smtp_server.messages[0]["Subject"] == "Alert"
@@ -0,0 +1,119 @@
+import asyncio
+
+import client_sender
+from client_sender import ClientSender
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.messages = []
+        self.closed = False
+
+    async def send(self, message):
+        self.messages.append(message)
+
+    async def close(self):
+        self.closed = True
+
+
+class StalledSocket(RecordingSocket):
+    async def send(self, message):
+        await asyncio.sleep(3600)
+
+
+def _encode(records):
+    return [",".join(f"{metric}={value}" for _, _, metric, value in records)]
+
+
+def test_messages_go_out_in_order_and_frames_coalesce():
+    async def run():
+        websocket = RecordingSocket()
+        sender = ClientSender(websocket)
+        await sender.send("reply 1")
+        sender.send_latest("BPM", "frame 1")
+        sender.send_latest("BPM", "frame 2")
+        sender.send_values([(1, 0.0, "BPM", 70), (2, 0.0, "Temperature", 36.5)], _encode)
+        sender.send_values([(3, 0.0, "BPM", 72)], _encode)
+        await sender.send("reply 2")
+        sender.start()
+        await asyncio.sleep(0.01)
+        sender.close()
+        return websocket, sender
+
+    websocket, sender = asyncio.run(run())
+    assert websocket.messages == ["reply 1", "frame 2", "Temperature=36.5,BPM=72", "reply 2"]
+    assert (sender.sent, sender.coalesced, sender.dropped, sender.max_depth) == (4, 2, 0, 5)
+
+
+def test_a_full_queue_drops_the_oldest_frame_never_a_reply(monkeypatch):
+    monkeypatch.setattr(client_sender, "MAX_QUEUE", 3)
+
+    async def run():
+        sender = ClientSender(RecordingSocket())
+        await sender.send("alert")
+        sender.send_values([(1, 0.0, "BPM", 70), (2, 0.0, "HRV", 40)], _encode)
+        sender.send_latest("BPM", "frame")
+        sender.send_latest(("Waveform", 0), "batch")
+        sender.send_latest(("Waveform", 1), "batch")
+        return sender
+
+    sender = asyncio.run(run())
+    # The alert stays, the merged values (two metrics) and the frame go
+    assert list(sender._queue.values()) == ["alert", "batch", "batch"]
+    assert sender.dropped == 3 and not sender.disconnected
+
+
+def test_a_queue_full_of_replies_disconnects_the_client(monkeypatch):
+    monkeypatch.setattr(client_sender, "MAX_QUEUE", 2)
+
+    async def run():
+        websocket = RecordingSocket()
+        sender = ClientSender(websocket)
+        for n in range(3):
+            await sender.send(f"reply {n}")
+        sender.send_latest("BPM", "frame")  # Ignored once disconnected
+        await asyncio.sleep(0)
+        return websocket, sender
+
+    websocket, sender = asyncio.run(run())
+    assert sender.disconnected and websocket.closed
+    assert list(sender._queue.values()) == ["reply 0", "reply 1"]
+    assert sender.dropped == 0
+
+
+def test_send_now_skips_the_queue_unless_the_client_lags():
+    async def run():
+        websocket = RecordingSocket()
+        sender = ClientSender(websocket).start()
+        await sender.send_now("BPM", "frame 1")
+        direct = (list(websocket.messages), sender.max_depth)
+        stalled = ClientSender(StalledSocket()).start()
+        await stalled.send("reply")
+        await asyncio.sleep(0)  # The writer is stuck sending it
+        await stalled.send_now("BPM", "frame 1")
+        await stalled.send_now("BPM", "frame 2")
+        sender.close()
+        stalled.close()
+        return direct, stalled
+
+    direct, stalled = asyncio.run(run())
+    assert direct == (["frame 1"], 0)
+    assert list(stalled._queue.items()) == [("BPM", "frame 2")] and stalled.coalesced == 1
+
+
+def test_a_client_stuck_long_enough_is_disconnected(monkeypatch):
+    monkeypatch.setattr(client_sender, "SEND_TIMEOUT", 0.02)
+    monkeypatch.setattr(client_sender, "STUCK_SECONDS", 0.05)
+
+    async def run():
+        websocket = StalledSocket()
+        sender = ClientSender(websocket).start()
+        for n in range(10):
+            sender.send_latest(("Waveform", n), "batch")
+        await asyncio.sleep(0.2)
+        sender.close()
+        return websocket, sender
+
+    websocket, sender = asyncio.run(run())
+    assert sender.disconnected and websocket.closed
+    assert sender.timeouts >= 3 and sender.sent == 0
@@ -0,0 +1,56 @@
+import threading
+import time
+
+from critical_path import CriticalFastPath
+
+
+class RecordingIndicators:
+    def __init__(self):
+        self.shown = []
+
+    def show_status(self, status, interaction=True):
+        self.shown.append((status, interaction))
+
+
+def test_critical_is_indicated_within_budget_while_deferred_work_blocks():
+    indicators = RecordingIndicators()
+    fast_path = CriticalFastPath(indicators)
+    release = threading.Event()
+    try:
+        fast_path.defer(release.wait, 5)  # A stuck email send
+        for _ in range(50):
+            latency = fast_path.indicate("Critical", True, time.perf_counter())
+            assert latency < fast_path.budget
+        stats = fast_path.stats()
+    finally:
+        release.set()
+        fast_path.close()
+    assert (stats["count"], stats["overruns"]) == (50, 0)
+    assert stats["p99_ms"] < stats["budget_ms"]
+
+
+def test_latency_counts_from_detection_and_overruns_are_recorded():
+    fast_path = CriticalFastPath(RecordingIndicators(), budget=0.010)
+    try:
+        latency = fast_path.indicate("Critical", True, time.perf_counter() - 0.020)
+        assert fast_path.indicate("Warning", True, time.perf_counter() - 0.020) is None
+        assert fast_path.indicate("Critical", False) is None
+    finally:
+        fast_path.close()
+    assert latency >= 0.020
+    assert fast_path.stats()["overruns"] == 1
+
+
+def test_a_full_deferred_queue_drops_instead_of_blocking():
+    fast_path = CriticalFastPath(RecordingIndicators(), queue_size=1)
+    release = threading.Event()
+    started = threading.Event()
+    try:
+        fast_path.defer(lambda: (started.set(), release.wait(5)))
+        assert started.wait(5)
+        assert fast_path.defer(lambda: None) is True
+        assert fast_path.defer(lambda: None) is False
+    finally:
+        release.set()
+        fast_path.close()
+    assert fast_path.stats()["deferred_dropped"] == 1
@@ -0,0 +1,55 @@
+import threading
+
+import pytest
+
+from event_bus import COALESCE, DROP_OLDEST, EventBus
+
+
+def test_a_full_queue_drops_the_oldest_events():
+    bus = EventBus()
+    subscription = bus.subscribe("beat", maxlen=3, policy=DROP_OLDEST)
+    for n in range(5):
+        bus.publish("beat", n)
+    assert [event.data for event in subscription.drain()] == [2, 3, 4]
+    assert subscription.dropped == 2
+
+
+def test_coalesce_keeps_the_latest_per_topic_in_arrival_order():
+    bus = EventBus()
+    subscription = bus.subscribe(["beat", "temperature"], policy=COALESCE)
+    bus.publish("beat", 1)
+    bus.publish("temperature", 36.6)
+    bus.publish("beat", 2)
+    events = subscription.drain()
+    assert [(event.topic, event.data) for event in events] == [("temperature", 36.6), ("beat", 2)]
+    assert subscription.dropped == 1
+
+
+def test_only_subscribed_topics_are_delivered():
+    bus = EventBus()
+    subscription = bus.subscribe("status")
+    bus.publish("beat", 1)
+    bus.publish("status", "Warning")
+    assert [event.data for event in subscription.drain()] == ["Warning"]
+    with pytest.raises(ValueError):
+        bus.subscribe("heartbeat")
+
+
+def test_a_consumer_gets_events_on_its_thread_and_stops_on_unsubscribe():
+    bus = EventBus()
+    seen = []
+    done = threading.Event()
+
+    def handler(event):
+        seen.append((event.data, threading.current_thread().name))
+        if event.data == 2:
+            done.set()
+
+    subscription = bus.start_consumer("alerts", "alert", handler)
+    for n in range(3):
+        bus.publish("alert", n)
+    assert done.wait(5)
+    bus.unsubscribe(subscription)
+    bus.publish("alert", 3)
+    bus.close()
+    assert seen == [(0, "alerts"), (1, "alerts"), (2, "alerts")]
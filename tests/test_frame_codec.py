@@ -0,0 +1,42 @@
+import pytest
+
+import frame_codec
+from frame_codec import decode_frame, encode_records, json_messages
+
+
+def test_records_survive_a_round_trip():
+    records = [
+        (1, 1700000000.0, "BPM", 72.125),
+        (2, 1700000000.25, "Temperature", 36.6),
+        (3, 1700000000.5, "BPM", 71.5),
+        (5, 1700000001.0, "Stress", "Elevated"),
+        (6, 1700000001.0, "Status", "Critical"),
+        (7, 1700000002.0, "HRV", 42.3),
+        (8, 1700000002.0, "Stress", "Sensor fault"),
+    ]
+    (frame,) = encode_records(records)
+    decoded = decode_frame(frame)
+    assert [(s, m) for s, _, m, _ in decoded] == [(s, m) for s, _, m, _ in records]
+    assert [t for _, t, _, _ in decoded] == pytest.approx([t for _, t, _, _ in records], abs=0.001)
+    assert [v for _, _, _, v in decoded[:-1]] == pytest.approx([v for _, _, _, v in records[:-1]])
+    assert decoded[-1][3] == "Unknown"
+
+
+def test_a_long_batch_is_split_into_frames(monkeypatch):
+    monkeypatch.setattr(frame_codec, "MAX_RECORDS", 3)
+    records = [(n + 1, 1700000000.0 + n * 0.01, "BPM", 60 + n) for n in range(7)]
+    frames = encode_records(records)
+    assert len(frames) == 3
+    decoded = [record for frame in frames for record in decode_frame(frame)]
+    assert [(s, v) for s, _, _, v in decoded] == [(s, v) for s, _, _, v in records]
+
+
+def test_binary_is_smaller_than_json():
+    records = [(n + 1, 1700000000.0 + n * 0.01, "BPM", 72 + (n % 7) * 0.125) for n in range(100)]
+    assert sum(map(len, encode_records(records))) * 2 < sum(map(len, json_messages(records)))
+
+
+def test_a_frame_with_the_wrong_magic_is_rejected():
+    (frame,) = encode_records([(1, 1700000000.0, "BPM", 72.0)])
+    with pytest.raises(ValueError):
+        decode_frame(b"\x00" + frame[1:])
@@ -0,0 +1,80 @@
+import time
+
+from indicators import BUZZER_PIN, GREEN_LED, PINS, RED_LED, YELLOW_LED, IndicatorController
+
+
+# Records the calls RPi.GPIO would get
+class FakeGPIO:
+    BCM = "BCM"
+    OUT = "OUT"
+    HIGH = 1
+    LOW = 0
+
+    def __init__(self, multi_write=True):
+        self.multi_write = multi_write
+        self.outputs = []
+        self.levels = {}
+
+    def setmode(self, mode):
+        pass
+
+    def setup(self, pin, mode):
+        pass
+
+    def output(self, channels, values):
+        if isinstance(channels, list):
+            if not self.multi_write:
+                raise TypeError("channel must be an int")
+            self.outputs.append((tuple(channels), tuple(values)))
+            self.levels.update(zip(channels, values))
+        else:
+            self.outputs.append((channels, values))
+            self.levels[channels] = values
+
+
+def _controller(gpio):
+    controller = IndicatorController(gpio)
+    controller.setup()
+    gpio.outputs.clear()
+    return controller
+
+
+def test_only_changed_pins_are_written_in_one_call():
+    gpio = FakeGPIO()
+    controller = _controller(gpio)
+    controller.show_status("Normal")
+    controller.show_status("Normal")
+    controller.show_status("Warning")
+    controller.close()
+    assert gpio.outputs[:2] == [(GREEN_LED, 1), ((GREEN_LED, YELLOW_LED), (0, 1))]
+    assert controller.skipped >= len(PINS) * 2
+
+
+def test_a_backend_without_list_writes_gets_one_call_per_pin():
+    gpio = FakeGPIO(multi_write=False)
+    controller = _controller(gpio)
+    controller.show_status("Warning")
+    controller.show_status("Normal")
+    controller.close()
+    assert gpio.outputs == [(YELLOW_LED, 1), (GREEN_LED, 1), (YELLOW_LED, 0), (GREEN_LED, 0)]
+
+
+def test_critical_beeps_in_the_background_and_close_turns_it_off():
+    gpio = FakeGPIO()
+    controller = _controller(gpio)
+    controller.show_status("Critical")
+    assert (gpio.levels[RED_LED], gpio.levels[BUZZER_PIN]) == (1, 1)
+    time.sleep(0.4)  # Past the first 0.3 s beep
+    assert gpio.levels[BUZZER_PIN] == 0
+    controller.show_status("Critical")  # Keeps the pattern's phase
+    assert gpio.levels[BUZZER_PIN] == 0
+    controller.close()
+    assert all(gpio.levels[pin] == 0 for pin in PINS)
+
+
+def test_no_interaction_turns_everything_off():
+    gpio = FakeGPIO()
+    controller = _controller(gpio)
+    controller.show_status("Critical", interaction=False)
+    controller.close()
+    assert gpio.outputs == []
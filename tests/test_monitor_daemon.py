@@ -0,0 +1,139 @@
+import json
+import socket
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+MODE_MODULES = ("bpm_display", "tem_display", "gsr", "test_app")
+
+
+class FakeOled:
+    def __init__(self):
+        self.frames = []
+
+    def image(self, image):
+        self.frames.append(image)
+
+    def show(self):
+        pass
+
+
+class FakeIndicators:
+    def __init__(self):
+        self.offs = 0
+
+    def off(self):
+        self.offs += 1
+
+
+class FakeVitals:
+    def close(self):
+        pass
+
+
+# A mode script: its loops draw frames named after the mode while running
+def _mode_module(name, oled, indicators):
+    module = types.ModuleType(name)
+    module.running = False
+    module.oled = oled
+    module.indicators = indicators
+    module.vitals = FakeVitals()
+
+    def loop():
+        while module.running:
+            module.oled.image(name)
+            module.oled.show()
+            time.sleep(0.01)
+
+    for target in ("monitor_heart_rate", "monitor_temperature", "monitor_gsr", "update_display"):
+        setattr(module, target, loop)
+    return module
+
+
+# monitor_daemon imported against stand-ins for RPi.GPIO and the mode
+# scripts, which need the sensors
+@pytest.fixture
+def monitor_daemon(monkeypatch):
+    oled = FakeOled()
+    indicators = FakeIndicators()
+    rpi = types.ModuleType("RPi")
+    rpi.GPIO = types.ModuleType("RPi.GPIO")
+    monkeypatch.setitem(sys.modules, "RPi", rpi)
+    monkeypatch.setitem(sys.modules, "RPi.GPIO", rpi.GPIO)
+    for name in MODE_MODULES:
+        monkeypatch.setitem(sys.modules, name, _mode_module(name, oled, indicators))
+    test_app = sys.modules["test_app"]
+    test_app.background = []
+    test_app.start_background = lambda: test_app.background.append("start")
+    test_app.stop_background = lambda: test_app.background.append("stop")
+    monkeypatch.delitem(sys.modules, "monitor_daemon", raising=False)
+    import monitor_daemon
+    yield monitor_daemon, oled, indicators
+    del sys.modules["monitor_daemon"]
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_a_switch_stops_the_old_mode_and_starts_the_new_one(monitor_daemon):
+    module, oled, indicators = monitor_daemon
+    daemon = module.MonitorDaemon()
+    try:
+        assert daemon.switch("bpm_display")["previous"] == "idle"
+        _wait_for(lambda: oled.frames)
+        reply = daemon.switch("gsr")
+        old_threads = daemon.threads["bpm_display"]
+        for thread in old_threads:
+            thread.join(1)
+        oled.frames.clear()
+        _wait_for(lambda: len(oled.frames) >= 3)
+    finally:
+        daemon.close()
+    assert reply["mode"] == "gsr" and reply["previous"] == "bpm_display"
+    assert not any(thread.is_alive() for thread in old_threads)
+    assert set(oled.frames) == {"gsr"}
+    assert indicators.offs == 2  # On the switch and on close
+    stats = daemon.stats()
+    assert stats["switch_ms"]["count"] == 2 and stats["first_frame_ms"]["count"] == 2
+
+
+def test_test_app_runs_its_background_work_only_while_active(monitor_daemon):
+    module, _, _ = monitor_daemon
+    daemon = module.MonitorDaemon()
+    daemon.switch("test_app")
+    daemon.switch("test_app")  # Already running, nothing happens
+    daemon.switch(None)
+    assert sys.modules["test_app"].background == ["start", "stop"]
+    assert daemon.mode is None
+
+
+def test_control_socket_commands(monitor_daemon, tmp_path):
+    module, _, _ = monitor_daemon
+    module.daemon = module.MonitorDaemon()
+    path = str(tmp_path / "control.sock")
+    server = module.ControlServer(path, module.ControlHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with socket.socket(socket.AF_UNIX) as sock:
+            sock.connect(path)
+            replies = sock.makefile("r")
+            commands = ("mode tem_display", "stop gsr", "status", "stop", "jump")
+            for command in commands:
+                sock.sendall(command.encode() + b"\n")
+            answers = [json.loads(replies.readline()) for _ in commands]
+    finally:
+        server.shutdown()
+        server.server_close()
+        module.daemon.close()
+    assert answers[0]["mode"] == "tem_display"
+    assert answers[1] == {"mode": "tem_display", "switch_ms": 0}  # Another mode is running
+    assert answers[2]["mode"] == "tem_display"
+    assert answers[3]["mode"] == "idle"
+    assert "error" in answers[4]
@@ -0,0 +1,44 @@
+import asyncio
+import threading
+
+from monitor_runtime import MonitorRuntime
+
+
+def test_stop_cancels_every_monitor_then_cleanup_runs():
+    runtime = MonitorRuntime()
+    events = []
+
+    async def reader():
+        try:
+            while True:
+                events.append(await runtime.io(threading.current_thread))
+                await asyncio.sleep(0.01)
+        except asyncio.CancelledError:
+            events.append("reader cancelled")
+            raise
+
+    async def stopper():
+        await asyncio.sleep(0.05)
+        runtime.stop()
+        await asyncio.sleep(3600)
+
+    runtime.run(reader, stopper, cleanup=lambda: events.append("cleanup"))
+    threads = [e for e in events if isinstance(e, threading.Thread)]
+    assert threads and all(t.name.startswith("i2c") for t in threads)
+    assert events[-2:] == ["reader cancelled", "cleanup"]
+
+
+def test_a_failing_monitor_does_not_stop_the_others(capsys):
+    runtime = MonitorRuntime()
+    done = []
+
+    async def broken():
+        raise OSError("I2C bus error")
+
+    async def steady():
+        await asyncio.sleep(0.02)
+        done.append(True)
+
+    runtime.run(broken, steady)
+    assert done == [True]
+    assert "Monitor broken failed: OSError('I2C bus error')" in capsys.readouterr().out
@@ -0,0 +1,145 @@
+import asyncio
+import socket
+import threading
+import time
+
+import notifiers
+from smtp_session import SmtpSession
+from alert_outbox import AlertOutbox
+from notifiers import EmailNotifier, MqttNotifier, NotificationFanout, Notifier, WebhookNotifier
+
+ALERT = {
+    "id": "a1",
+    "subject": "Health Monitoring Alert: Critical (1 condition)",
+    "body": "Health Alert!\n\nConditions:\n- bpm_high [Critical, active]",
+    "timestamp": 1700000000.0,
+    "severity": "Critical",
+}
+
+
+class SlowNotifier(Notifier):
+    name = "slow"
+
+    async def notify(self, alert):
+        await asyncio.sleep(5)
+        return True
+
+
+class UnreachableWebhook(WebhookNotifier):
+    name = "unreachable"
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _outbox(tmp_path, smtp_server):
+    session = SmtpSession("127.0.0.1", smtp_server.server_address[1], user=None, password=None, starttls=False)
+    return AlertOutbox(str(tmp_path / "outbox.db"), session=session, sender="monitor@example.com", recipient="nurse@example.com")
+
+
+def test_email_reaches_smtp_through_the_outbox(tmp_path, smtp_server):
+    outbox = _outbox(tmp_path, smtp_server).start()
+    sent = threading.Event()
+    email = EmailNotifier(lambda subject, body, delivery_id: outbox.submit(subject, body, on_sent=lambda _: sent.set(), delivery_id=delivery_id) is not None)
+    try:
+        results = asyncio.run(NotificationFanout([email]).notify(ALERT))
+        assert results == {"email": True}
+        assert sent.wait(5)
+    finally:
+        outbox.close()
+    message = smtp_server.messages[0]
+    assert message["Message-ID"] == "<a1@patient-monitor>"
+    assert message["Subject"] == ALERT["subject"]
+    assert message["To"] == "nurse@example.com"
+    assert message.get_payload()[0].get_payload().replace("\r\n", "\n") == ALERT["body"]
+
+
+def test_webhook_posts_the_alert_as_json(webhook_server):
+    webhook = WebhookNotifier(webhook_server.url + "/alerts?source=monitor")
+    results = asyncio.run(NotificationFanout([webhook]).notify(ALERT))
+    assert results == {"webhook": True}
+    path, content_type, payload = webhook_server.requests[0]
+    assert path == "/alerts?source=monitor"
+    assert content_type == "application/json"
+    assert payload == ALERT
+
+
+def test_mqtt_publishes_the_alert_to_the_topic(mqtt_broker):
+    mqtt = MqttNotifier("127.0.0.1", mqtt_broker.port, "ward/alerts", user="monitor", password="secret")
+    results = asyncio.run(NotificationFanout([mqtt]).notify(ALERT))
+    assert results == {"mqtt": True}
+    assert mqtt_broker.connects[0][1:] == ("monitor", "secret")
+    assert mqtt_broker.published == [("ward/alerts", ALERT)]
+
+
+def test_channels_run_in_parallel_and_a_slow_one_times_out(webhook_server, mqtt_broker):
+    fanout = NotificationFanout([
+        WebhookNotifier(webhook_server.url),
+        MqttNotifier("127.0.0.1", mqtt_broker.port, "ward/alerts"),
+        SlowNotifier(timeout=0.3),
+    ])
+    start = time.perf_counter()
+    results = asyncio.run(fanout.notify(ALERT))
+    assert time.perf_counter() - start < 2
+    assert results == {"webhook": True, "mqtt": True, "slow": False}
+    stats = fanout.stats()
+    assert stats["webhook"]["sent"] == stats["mqtt"]["sent"] == 1
+    assert stats["webhook"]["last_latency_ms"] < 300
+    assert stats["slow"]["timeouts"] == 1
+
+
+def test_a_failed_attempt_is_retried(monkeypatch, webhook_server):
+    monkeypatch.setattr(notifiers, "RETRY_DELAY", 0.01)
+    webhook_server.statuses = [500]
+    fanout = NotificationFanout([WebhookNotifier(webhook_server.url)])
+    assert asyncio.run(fanout.notify(ALERT)) == {"webhook": True}
+    assert len(webhook_server.requests) == 2
+    assert fanout.stats()["webhook"]["retries"] == 1
+    assert fanout.stats()["webhook"]["sent"] == 1
+
+
+def test_failures_are_reported_per_channel(monkeypatch, webhook_server, mqtt_broker):
+    monkeypatch.setattr(notifiers, "RETRY_DELAY", 0.01)
+    webhook_server.statuses = [500, 503]
+    mqtt_broker.return_code = 5  # Not authorized
+    fanout = NotificationFanout([
+        WebhookNotifier(webhook_server.url),
+        MqttNotifier("127.0.0.1", mqtt_broker.port, "ward/alerts"),
+        UnreachableWebhook(f"http://127.0.0.1:{_free_port()}"),  # Nobody listening
+    ])
+    results = asyncio.run(fanout.notify(ALERT))
+    assert results == {"webhook": False, "mqtt": False, "unreachable": False}
+    for channel in results:
+        assert fanout.stats()[channel]["failed"] == 1
+        assert fanout.stats()[channel]["retries"] == 1
+
+
+def test_submit_runs_on_the_fanout_thread(webhook_server):
+    fanout = NotificationFanout([WebhookNotifier(webhook_server.url)]).start()
+    try:
+        future = fanout.submit("Subject", "Body", severity="Warning")
+        assert future.result(5) == {"webhook": True}
+    finally:
+        fanout.close()
+    payload = webhook_server.requests[0][2]
+    assert (payload["subject"], payload["body"], payload["severity"]) == ("Subject", "Body", "Warning")
+    assert payload["id"]
+
+
+def test_close_waits_for_alerts_in_flight(webhook_server):
+    fanout = NotificationFanout([WebhookNotifier(webhook_server.url)]).start()
+    future = fanout.submit("Subject", "Body")
+    fanout.close()
+    assert future.result(0) == {"webhook": True}
+    assert len(webhook_server.requests) == 1
+
+
+def test_submit_before_start_or_after_close_is_dropped(webhook_server):
+    fanout = NotificationFanout([WebhookNotifier(webhook_server.url)], max_in_flight=1)
+    assert fanout.submit("Subject", "Body") is None
+    fanout.start().close()
+    assert fanout.submit("Subject", "Body") is None
+    assert (fanout.dropped, fanout._in_flight) == (2, 0)
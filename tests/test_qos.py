@@ -0,0 +1,58 @@
+import qos
+from qos import CALM_SECONDS, QOS_LEVELS, QosController
+
+
+def _controller(monkeypatch, changes):
+    monkeypatch.setattr(qos, "_cpu_times", lambda: None)
+    return QosController(on_change=lambda level, settings: changes.append((level, settings["ws_interval"])))
+
+
+def _run_loop(watch, ticks, overruns):
+    watch.ticks += ticks
+    watch.overruns += overruns
+
+
+def test_overruns_raise_the_level_one_step_per_interval(monkeypatch):
+    changes = []
+    controller = _controller(monkeypatch, changes)
+    watch = controller.watch("pulse", 0.1)
+    for n in range(len(QOS_LEVELS) + 1):
+        _run_loop(watch, 10, 5)
+        controller.evaluate(now=float(n))
+    assert controller.level == len(QOS_LEVELS) - 1
+    assert changes == [(level, QOS_LEVELS[level]["ws_interval"]) for level in range(1, len(QOS_LEVELS))]
+
+
+def test_the_level_steps_down_once_calm_for_long_enough(monkeypatch):
+    changes = []
+    controller = _controller(monkeypatch, changes)
+    watch = controller.watch("pulse", 0.1)
+    _run_loop(watch, 10, 5)
+    controller.evaluate(now=0.0)
+    _run_loop(watch, 10, 5)
+    assert controller.evaluate(now=1.0) == 2
+    now = 1.0
+    # The overruns stay in the window for a while, then the calm time runs
+    while controller.level == 2:
+        now += 1.0
+        _run_loop(watch, 10, 0)
+        controller.evaluate(now=now)
+    assert now >= 1.0 + CALM_SECONDS
+    assert controller.level == 1
+    assert [level for level, _ in changes] == [1, 2, 1]
+
+
+def test_cpu_pressure_raises_the_level(monkeypatch):
+    controller = QosController()
+    monkeypatch.setattr(controller, "_sample_cpu", lambda: 0.95)
+    assert controller.evaluate(now=0.0) == 1
+
+
+def test_a_resumed_loop_keeps_its_watch_without_an_overrun():
+    controller = QosController()
+    watch = controller.watch("temperature", 1.0)
+    watch.tick()
+    watch._last -= 10  # Paused for a mode switch
+    assert controller.watch("temperature", 0.5) is watch
+    watch.tick()
+    assert (watch.period, watch.ticks, watch.overruns) == (0.5, 0, 0)
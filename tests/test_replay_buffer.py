@@ -0,0 +1,36 @@
+from replay_buffer import ReplayBuffer
+
+NOW = 1700000000.0
+
+
+def test_records_after_a_seq_come_back_in_order():
+    buffer = ReplayBuffer(("BPM", "Stress"), seconds=60, max_rate=1)
+    records = [
+        (1, NOW - 5, "BPM", 72.5),
+        (2, NOW - 4, "Stress", "Elevated"),
+        (3, NOW - 3, "BPM", 73.0),
+        (4, NOW - 2, "Stress", "Not a level"),
+    ]
+    for record in records:
+        buffer.append(record)
+    assert buffer.since(0, ("BPM", "Stress"), now=NOW) == (records[:3] + [(4, NOW - 2, "Stress", "Unknown")], True)
+    assert buffer.since(2, ("BPM",), now=NOW) == ([records[2]], True)
+    assert buffer.since(4, ("BPM", "Stress"), now=NOW) == ([], True)
+
+
+def test_overwritten_records_make_the_replay_incomplete():
+    buffer = ReplayBuffer(("BPM",), seconds=4, max_rate=1)  # Four records
+    for seq in range(1, 7):
+        buffer.append((seq, NOW - 1 + seq * 0.1, "BPM", 60.0 + seq))
+    records, complete = buffer.since(1, ("BPM",), now=NOW)
+    assert [record[0] for record in records] == [3, 4, 5, 6] and not complete
+    records, complete = buffer.since(2, ("BPM",), now=NOW)
+    assert [record[0] for record in records] == [3, 4, 5, 6] and complete
+    assert buffer.stats()["BPM"] == {"kept": 4, "capacity": 4, "evicted_seq": 2}
+
+
+def test_records_older_than_the_window_are_left_out():
+    buffer = ReplayBuffer(("BPM",), seconds=10)
+    buffer.append((1, NOW - 20, "BPM", 70.0))
+    buffer.append((2, NOW - 5, "BPM", 71.0))
+    assert buffer.since(0, ("BPM",), now=NOW) == ([(2, NOW - 5, "BPM", 71.0)], False)
@@ -0,0 +1,65 @@
+import sample_ring
+from sample_ring import HEAD, HEADER, SLOT, RingReader, SampleRing
+
+
+# Unpacks a slot, then lets the writer lap the reader before get() reads the
+# seq again
+class LappingSlot:
+    size = SLOT.size
+
+    def __init__(self, ring):
+        self.ring = ring
+
+    def unpack_from(self, buffer, offset):
+        fields = SLOT.unpack_from(buffer, offset)
+        for n in range(self.ring.capacity):
+            self.ring.write(100.0 + n, 9, -1.0)
+        return fields
+
+
+def test_a_reader_that_fell_behind_counts_what_was_overwritten():
+    ring = SampleRing(capacity=4)
+    try:
+        reader = RingReader(ring, from_start=True)
+        for n in range(6):
+            ring.write(float(n), n % 2, n * 10.0)
+        assert reader.read() == [(2.0, 0, 20.0), (3.0, 1, 30.0), (4.0, 0, 40.0), (5.0, 1, 50.0)]
+        assert reader.missed == 2
+        ring.write(6.0, 0, 60.0)
+        assert reader.read() == [(6.0, 0, 60.0)]
+    finally:
+        ring.close()
+
+
+def test_a_reader_can_take_only_some_channels():
+    ring = SampleRing(capacity=8)
+    try:
+        reader = RingReader(SampleRing(ring.name), channels=[1])
+        for n in range(4):
+            ring.write(float(n), n % 2, n * 10.0)
+        assert reader.read() == [(1.0, 1, 10.0), (3.0, 1, 30.0)]
+        reader.ring.close()
+    finally:
+        ring.close()
+
+
+def test_a_slot_being_written_is_rejected():
+    ring = SampleRing(capacity=4)
+    try:
+        ring.write(1.0, 0, 10.0)
+        HEAD.pack_into(ring.shm.buf, HEADER.size, 0)  # The writer's first step
+        assert ring.get(0) is None
+    finally:
+        ring.close()
+
+
+def test_a_sample_overwritten_while_read_is_rejected(monkeypatch):
+    ring = SampleRing(capacity=4)
+    try:
+        ring.write(1.0, 0, 10.0)
+        monkeypatch.setattr(sample_ring, "SLOT", LappingSlot(ring))
+        assert ring.get(0) is None
+        monkeypatch.undo()
+        assert ring.get(4) == (103.0, 9, -1.0)
+    finally:
+        ring.close()
@@ -0,0 +1,87 @@
+import asyncio
+import os
+
+import service_control
+from service_control import ServiceControl
+
+# Stand-ins for sudo and systemctl: each start/stop is logged and takes a
+# moment, is-active reports what the last one did
+SUDO = """#!/bin/sh
+exec "$@"
+"""
+SYSTEMCTL = """#!/bin/sh
+dir=$(dirname "$0")
+case "$1" in
+is-active)
+    cat "$dir/$2.state" 2>/dev/null || echo inactive ;;
+start|stop)
+    echo "$1 $2" >> "$dir/calls"
+    if [ -e "$dir/fail" ]; then echo "Unit $2 not found." >&2; exit 5; fi
+    sleep 0.2
+    [ "$1" = start ] && echo active > "$dir/$2.state" || echo inactive > "$dir/$2.state" ;;
+esac
+"""
+
+
+def _stub_systemctl(monkeypatch, tmp_path):
+    for name, script in (("sudo", SUDO), ("systemctl", SYSTEMCTL)):
+        path = tmp_path / name
+        path.write_text(script)
+        path.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(service_control, "STATE_POLL", 0.01)
+
+
+def _calls(tmp_path):
+    calls = tmp_path / "calls"
+    return calls.read_text().split("\n")[:-1] if calls.exists() else []
+
+
+def test_starts_of_the_same_unit_are_coalesced(monkeypatch, tmp_path):
+    _stub_systemctl(monkeypatch, tmp_path)
+
+    async def run():
+        control = ServiceControl()
+        results = await asyncio.gather(*(control.start("bpm.service") for _ in range(5)))
+        return control, results
+
+    control, results = asyncio.run(run())
+    assert results == [(True, "active")] * 5
+    assert _calls(tmp_path) == ["start bpm.service"]
+    assert control.stats() == {"requests": 5, "coalesced": 4, "pending": []}
+
+
+def test_a_stop_after_a_start_runs_after_it(monkeypatch, tmp_path):
+    _stub_systemctl(monkeypatch, tmp_path)
+
+    async def run():
+        control = ServiceControl()
+        return await asyncio.gather(control.start("bpm.service"), control.stop("bpm.service"), control.start("gsr.service"))
+
+    assert asyncio.run(run()) == [(True, "active"), (True, "inactive"), (True, "active")]
+    calls = _calls(tmp_path)
+    assert calls.index("start bpm.service") < calls.index("stop bpm.service")
+
+
+def test_a_failed_systemctl_returns_its_error(monkeypatch, tmp_path):
+    _stub_systemctl(monkeypatch, tmp_path)
+    (tmp_path / "fail").touch()
+
+    async def run():
+        return await ServiceControl().start("missing.service")
+
+    assert asyncio.run(run()) == (False, "Unit missing.service not found.")
+
+
+def test_a_cancelled_caller_does_not_cancel_the_request(monkeypatch, tmp_path):
+    _stub_systemctl(monkeypatch, tmp_path)
+
+    async def run():
+        control = ServiceControl()
+        first = asyncio.create_task(control.start("bpm.service"))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        return await control.start("bpm.service"), control.coalesced
+
+    assert asyncio.run(run()) == ((True, "active"), 1)
+    assert _calls(tmp_path) == ["start bpm.service"]
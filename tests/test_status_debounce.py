@@ -0,0 +1,61 @@
+from status_debounce import StatusDebouncer
+from status_rules import RuleEngine
+
+
+def _debouncer(**kwargs):
+    return StatusDebouncer(RuleEngine(reload_interval=float("inf")), **kwargs)
+
+
+def test_a_warning_shows_once_it_held_for_the_escalate_dwell():
+    debouncer = _debouncer()
+    assert debouncer.update("bpm", 105, now=0.0)[0] == "Normal"
+    assert debouncer.update("bpm", 105, now=0.5)[0] == "Normal"
+    assert debouncer.update("bpm", 105, now=1.0)[0] == "Warning"
+    assert debouncer.detected_at("bpm") == 0.0
+
+
+def test_a_short_spike_is_suppressed():
+    debouncer = _debouncer()
+    debouncer.update("bpm", 105, now=0.0)
+    assert debouncer.update("bpm", 80, now=0.5)[0] == "Normal"
+    assert debouncer.update("bpm", 80, now=2.0)[0] == "Normal"
+    assert (debouncer.transitions, debouncer.suppressed) == (0, 1)
+
+
+def test_critical_skips_the_escalate_dwell():
+    debouncer = _debouncer()
+    status, fired = debouncer.update("bpm", 130, now=10.0)
+    assert status == "Critical" and "bpm_high_critical" in fired
+    assert debouncer.detected_at("bpm") == 10.0
+
+
+def test_critical_dwell_can_be_configured():
+    debouncer = _debouncer(critical_dwell=0.5)
+    assert debouncer.update("bpm", 130, now=0.0)[0] == "Normal"
+    assert debouncer.update("bpm", 130, now=0.5)[0] == "Critical"
+
+
+def test_recovery_waits_for_the_deescalate_dwell():
+    debouncer = _debouncer()
+    debouncer.update("bpm", 105, now=0.0)
+    debouncer.update("bpm", 105, now=1.0)
+    assert debouncer.update("bpm", 80, now=2.0)[0] == "Warning"
+    assert debouncer.update("bpm", 80, now=6.9)[0] == "Warning"
+    assert debouncer.update("bpm", 80, now=7.0)[0] == "Normal"
+
+
+def test_hysteresis_keeps_a_warning_inside_the_exit_band():
+    debouncer = _debouncer(deescalate_dwell=0)
+    debouncer.update("bpm", 101, now=0.0)
+    debouncer.update("bpm", 101, now=1.0)
+    # bpm_high_warning enters above 100 and, with 3 bpm of hysteresis,
+    # exits only at 97
+    assert debouncer.update("bpm", 98, now=2.0)[0] == "Warning"
+    assert debouncer.update("bpm", 97, now=3.0)[0] == "Normal"
+
+
+def test_the_worst_metric_sets_the_status():
+    debouncer = _debouncer(escalate_dwell=0)
+    debouncer.update("bpm", 105, now=0.0)
+    assert debouncer.update("temperature", 39.5, now=0.0)[0] == "Critical"
+    assert debouncer.metrics_at("Warning") == {"bpm"}
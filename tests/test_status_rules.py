@@ -0,0 +1,30 @@
+import json
+import os
+
+import pytest
+
+from status_rules import RuleEngine
+
+CONFIG = {
+    "hysteresis": {"bpm": 3},
+    "rules": [{"name": "bpm_high", "metric": "bpm", "op": ">", "value": 100, "status": "Warning"}],
+}
+
+
+@pytest.mark.parametrize("broken", [
+    {"rules": 5},
+    [CONFIG],
+    {"rules": [3]},
+    {"rules": [{"name": "stress", "metric": "stress", "op": "in", "value": 5, "status": "Warning"}]},
+    {"rules": [{"name": "bpm", "metric": "bpm", "op": ">", "value": "100", "status": "Warning"}]},
+    {"hysteresis": [3], "rules": []},
+    {"dwell": {"escalate": "1"}, "rules": []},
+])
+def test_a_malformed_reload_keeps_the_previous_rules(tmp_path, broken):
+    path = tmp_path / "thresholds.json"
+    path.write_text(json.dumps(CONFIG))
+    engine = RuleEngine(str(path), reload_interval=0)
+    path.write_text(json.dumps(broken))
+    os.utime(path, (1, 1))
+    assert engine.update("bpm", 120) == ("Warning", ["bpm_high"])
+    assert engine.config == CONFIG
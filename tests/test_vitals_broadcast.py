@@ -0,0 +1,250 @@
+import asyncio
+import json
+import time
+
+import client_sender
+import vitals_broadcast
+from client_sender import ClientSender
+from frame_codec import decode_frame
+from vitals_broadcast import PageChannel, ValueCache, VitalsBroadcaster
+from vitals_shm import EMPTY, VitalsListener, VitalsReader, VitalsWriter
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, message):
+        self.messages.append(message)
+
+
+class StalledSocket(RecordingSocket):
+    async def send(self, message):
+        self.messages.append(message)
+        await asyncio.sleep(3600)
+
+
+def _broadcaster(tmp_path):
+    path, notify_path = str(tmp_path / "vitals"), str(tmp_path / "vitals.sock")
+    return VitalsWriter(path, notify_path), VitalsBroadcaster(VitalsReader(path), VitalsListener(notify_path))
+
+
+def test_a_page_channel_wakes_its_waiters_or_times_out():
+    async def run():
+        channel = PageChannel()
+        waiters = [asyncio.create_task(channel.wait(0, 5)) for _ in range(3)]
+        await asyncio.sleep(0)
+        channel.publish("frame", "key")
+        await asyncio.gather(*waiters)
+        await channel.wait(1, 0.01)  # Nothing new, times out
+        await channel.wait(0, 5)     # Already newer, returns at once
+        return channel
+
+    channel = asyncio.run(run())
+    assert (channel.version, channel.frame, channel._waiters) == (1, "frame", [])
+
+
+def test_every_client_gets_the_same_serialized_frame(tmp_path):
+    async def run():
+        writer, broadcaster = _broadcaster(tmp_path)
+        broadcaster.start()
+        sockets = [RecordingSocket() for _ in range(3)]
+        senders = [ClientSender(ws).start() for ws in sockets]
+        streams = [asyncio.create_task(broadcaster.stream(sender, "Continuous")) for sender in senders]
+        await asyncio.sleep(0.05)
+        writer.update(bpm=72, temperature=36.6, stress="Normal")
+        await asyncio.sleep(0.3)
+        for task in streams:
+            task.cancel()
+        for sender in senders:
+            sender.close()
+        broadcaster.close()
+        writer.close()
+        return sockets, senders
+
+    sockets, senders = asyncio.run(run())
+    last = [ws.messages[-1] for ws in sockets]
+    assert all(message is last[0] for message in last)
+    data = json.loads(last[0])
+    assert (data["BPM"], data["Temperature"], data["Stress"], data["Stale"]) == (72.0, 36.6, "Normal", [])
+    # Sent straight from the stream tasks, the writer tasks never woke
+    assert all(sender.sent == len(ws.messages) and sender.max_depth == 0 for sender, ws in zip(senders, sockets))
+
+
+def test_a_stalled_client_skips_to_the_newest_frame(monkeypatch, tmp_path):
+    monkeypatch.setattr(client_sender, "SEND_TIMEOUT", 0.5)
+
+    async def run():
+        writer, broadcaster = _broadcaster(tmp_path)
+        broadcaster.start()
+        websocket = StalledSocket()
+        sender = ClientSender(websocket).start()
+        stream = asyncio.create_task(broadcaster.stream(sender, "BPM"))
+        await asyncio.sleep(0.05)
+        for bpm in (70, 71, 72):
+            writer.update(bpm=bpm)
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(0.6)  # The first send times out
+        stream.cancel()
+        sender.close()
+        broadcaster.close()
+        writer.close()
+        return websocket, sender
+
+    websocket, sender = asyncio.run(run())
+    # The frame from before the first reading stalls, 70 and 71 are skipped
+    assert [json.loads(m)["BPM"] for m in websocket.messages] == [0.0, 72.0]
+    assert sender.timeouts >= 1 and not sender._queue
+
+
+def test_frames_queue_and_coalesce_behind_a_message_being_sent(tmp_path):
+    async def run():
+        writer, broadcaster = _broadcaster(tmp_path)
+        broadcaster.start()
+        sender = ClientSender(StalledSocket()).start()
+        await sender.send("reply")
+        await asyncio.sleep(0)  # The writer task is stuck sending it
+        stream = asyncio.create_task(broadcaster.stream(sender, "BPM"))
+        for bpm in (70, 71, 72):
+            writer.update(bpm=bpm)
+            await asyncio.sleep(0.3)  # Past the QoS interval
+        queued = list(sender._queue.items())
+        stream.cancel()
+        sender.close()
+        broadcaster.close()
+        writer.close()
+        return sender, queued
+
+    sender, queued = asyncio.run(run())
+    assert len(queued) == 1 and queued[0][0] == "BPM"
+    assert json.loads(queued[0][1])["BPM"] == 72.0
+    assert sender.coalesced >= 2 and sender.dropped == 0
+
+
+def test_a_subscription_gets_only_the_metrics_that_changed(tmp_path):
+    async def run():
+        writer, broadcaster = _broadcaster(tmp_path)
+        broadcaster.start()
+        websocket = RecordingSocket()
+        sender = ClientSender(websocket).start()
+        task = asyncio.create_task(broadcaster.subscribe(sender, {"BPM": (0, True), "Temperature": (0, True)}))
+        await asyncio.sleep(0.05)
+        writer.update(bpm=72)
+        await asyncio.sleep(0.3)
+        writer.update(temperature=36.6)
+        await asyncio.sleep(0.3)
+        task.cancel()
+        sender.close()
+        broadcaster.close()
+        writer.close()
+        return [json.loads(m) for m in websocket.messages]
+
+    messages = asyncio.run(run())
+    assert [{k: v for k, v in m.items() if k in ("BPM", "Temperature")} for m in messages] == [{"BPM": 72.0}, {"Temperature": 36.6}]
+    assert messages[0]["Seq"] < messages[1]["Seq"]
+
+
+def test_a_steady_subscription_resends_without_changes(tmp_path):
+    async def run():
+        writer, broadcaster = _broadcaster(tmp_path)
+        writer.update(status="Normal")
+        broadcaster.start()
+        websocket = RecordingSocket()
+        sender = ClientSender(websocket).start()
+        task = asyncio.create_task(broadcaster.subscribe(sender, {"Status": (0.2, False)}))
+        await asyncio.sleep(0.7)
+        task.cancel()
+        sender.close()
+        broadcaster.close()
+        writer.close()
+        return [json.loads(m) for m in websocket.messages]
+
+    messages = asyncio.run(run())
+    assert 3 <= len(messages) <= 5
+    assert all(m["Status"] == "Normal" for m in messages)
+
+
+def test_a_lagging_subscriber_gets_the_latest_value_per_metric(tmp_path):
+    async def run():
+        writer, broadcaster = _broadcaster(tmp_path)
+        broadcaster.start()
+        sender = ClientSender(None)  # Writer not started: nothing leaves the queue
+        task = asyncio.create_task(broadcaster.subscribe(sender, {"BPM": (0, True), "Temperature": (0, True)}))
+        await asyncio.sleep(0.05)
+        for bpm in (70, 71, 72):
+            writer.update(bpm=bpm, temperature=36.0 + bpm / 100)
+            await asyncio.sleep(0.25)
+        task.cancel()
+        broadcaster.close()
+        writer.close()
+        return sender, broadcaster._json_values(sorted(sender._values.values()))
+
+    sender, (message,) = asyncio.run(run())
+    assert list(sender._queue) == ["values"] and sender.depth == 2
+    data = json.loads(message)
+    assert (data["BPM"], data["Temperature"]) == (72.0, 36.72)
+    assert sender.coalesced == 4
+
+
+def test_values_go_stale_with_age_and_when_the_record_is_unreadable(monkeypatch):
+    now = 1700000000.0
+    monkeypatch.setattr(vitals_broadcast.time, "time", lambda: now)
+    cache = ValueCache()
+    assert cache["BPM"] == (0.0, 0.0, "default", True)
+    assert cache.freshness(["BPM"]) == {"Age": {"BPM": None}, "Stale": ["BPM"]}
+
+    vitals = EMPTY._replace(bpm=72.0, bpm_time=now - 2, status="Warning", status_time=now - 600, temperature=36.6, temperature_time=now - 30)
+    cache.update(vitals)
+    assert cache["BPM"] == (72.0, now - 2, "monitor", False)
+    assert cache["Temperature"].stale  # Its monitor stopped updating it
+    assert not cache["Status"].stale   # Only written when it changes
+    assert cache.freshness(["BPM", "Temperature"]) == {"Age": {"BPM": 2.0, "Temperature": 30.0}, "Stale": ["Temperature"]}
+
+    cache.unreadable()
+    assert cache["BPM"] == (72.0, now - 2, "cache", True)
+    assert cache["HRV"].source == "default"
+
+
+def test_pages_keep_the_last_values_while_the_record_cannot_be_read(tmp_path):
+    async def run():
+        writer, broadcaster = _broadcaster(tmp_path)
+        writer.update(bpm=72)
+        broadcaster.pages["BPM"].subscribers = 1  # Pages nobody streams are not refreshed
+        broadcaster.refresh()
+        before = json.loads(broadcaster.pages["BPM"].frame)
+        broadcaster.reader = VitalsReader(str(tmp_path / "gone"))
+        broadcaster.refresh()
+        after = json.loads(broadcaster.pages["BPM"].frame)
+        writer.close()
+        return before, after, broadcaster
+
+    before, after, broadcaster = asyncio.run(run())
+    assert (before["BPM"], before["Stale"]) == (72.0, [])
+    assert (after["BPM"], after["Stale"]) == (72.0, ["BPM"])
+    assert broadcaster.read_failures == 1
+
+
+def test_a_resumed_stream_first_gets_what_it_missed(tmp_path):
+    async def run():
+        writer, broadcaster = _broadcaster(tmp_path)
+        for bpm in (70, 71, 72):
+            writer.update(bpm=bpm)
+            time.sleep(0.002)  # Distinct timestamps, one record each
+            broadcaster.refresh()
+        websocket = RecordingSocket()
+        resume = (broadcaster.stream_id, 1)
+        await broadcaster.replay(websocket, ["BPM"], resume)
+        await broadcaster.replay(websocket, ["BPM"], ("another-run", 1))
+        binary = RecordingSocket()
+        await broadcaster.replay(binary, ["BPM"], resume, encoding="binary")
+        writer.close()
+        return broadcaster, websocket.messages, binary.messages
+
+    broadcaster, (same, restarted), (header, frame) = asyncio.run(run())
+    same = json.loads(same)["Replay"]
+    assert (same["from"], same["to"], same["complete"], same["count"]) == (1, broadcaster.seq, True, 2)
+    assert [record[3] for record in same["records"]] == [71.0, 72.0]
+    restarted = json.loads(restarted)["Replay"]
+    assert not restarted["complete"] and restarted["count"] == 3
+    assert json.loads(header)["Replay"]["count"] == 2
+    assert [record[3] for record in decode_frame(frame)] == [71.0, 72.0]
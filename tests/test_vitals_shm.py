@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+import vitals_shm
+from vitals_shm import HEADER, MAGIC, READ_RETRIES, VitalsListener, VitalsReader, VitalsWriter
+
+
+def _writer(tmp_path):
+    return VitalsWriter(str(tmp_path / "vitals"), str(tmp_path / "vitals.sock"))
+
+
+def test_an_update_keeps_the_other_metrics(tmp_path):
+    writer = _writer(tmp_path)
+    reader = VitalsReader(writer.path)
+    try:
+        writer.update(bpm=72, stress="Normal")
+        writer.update(temperature=36.6)
+        vitals = reader.read()
+    finally:
+        reader.close()
+        writer.close()
+    assert (vitals.bpm, vitals.temperature, vitals.stress, vitals.updates) == (72.0, 36.6, "Normal", 2)
+    assert vitals.bpm_time > 0 and vitals.hrv_time == 0
+
+
+def test_no_record_yet_reads_as_none(tmp_path):
+    assert VitalsReader(str(tmp_path / "missing")).read() is None
+
+
+def test_a_read_during_a_write_is_retried(monkeypatch, tmp_path):
+    writer = _writer(tmp_path)
+    reader = VitalsReader(writer.path)
+    writer.update(bpm=72)
+    seq = HEADER.unpack_from(writer._map, 0)[0]
+    HEADER.pack_into(writer._map, 0, seq + 1, MAGIC)  # A writer is in the record
+
+    def finish_write(seconds):
+        HEADER.pack_into(writer._map, 0, seq + 2, MAGIC)
+
+    monkeypatch.setattr(vitals_shm.time, "sleep", finish_write)
+    try:
+        vitals = reader.read()
+    finally:
+        reader.close()
+        writer.close()
+    assert vitals.bpm == 72.0
+    assert reader.retries == 1
+
+
+def test_a_record_that_stays_mid_write_is_not_returned(monkeypatch, tmp_path):
+    writer = _writer(tmp_path)
+    reader = VitalsReader(writer.path)
+    writer.update(bpm=72)
+    seq = HEADER.unpack_from(writer._map, 0)[0]
+    HEADER.pack_into(writer._map, 0, seq + 1, MAGIC)
+    monkeypatch.setattr(vitals_shm.time, "sleep", lambda seconds: None)
+    try:
+        assert reader.read() is None
+        assert reader.retries == READ_RETRIES
+        # A writer that died mid-update is recovered by the next one
+        _writer(tmp_path).close()
+        assert reader.read().bpm == 72.0
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_the_listener_wakes_on_a_writer_notification(tmp_path):
+    async def run():
+        listener = VitalsListener(str(tmp_path / "vitals.sock")).start()
+        writer = _writer(tmp_path)
+        try:
+            seen = listener.notifications
+            waiter = asyncio.create_task(listener.wait(seen, 5))
+            await asyncio.sleep(0)
+            start = time.monotonic()
+            writer.update(bpm=72)
+            count = await waiter
+            return count - seen, time.monotonic() - start, await listener.wait(count, 0.05) == count
+        finally:
+            writer.close()
+            listener.close()
+
+    woken, elapsed, timed_out = asyncio.run(run())
+    assert woken == 1 and elapsed < 1
+    assert timed_out
+
+
+def test_a_listener_that_cannot_bind_polls_instead(monkeypatch, tmp_path):
+    monkeypatch.setattr(vitals_shm, "POLL_INTERVAL", 0.05)
+
+    async def run():
+        listener = VitalsListener(str(tmp_path / "missing" / "vitals.sock")).start()
+        start = time.monotonic()
+        await listener.wait(0, 5)
+        return listener.listening, time.monotonic() - start
+
+    listening, elapsed = asyncio.run(run())
+    assert not listening and elapsed < 1
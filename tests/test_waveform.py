@@ -0,0 +1,75 @@
+import asyncio
+import json
+import math
+import time
+
+from acquisition import GSR, PULSE
+from client_sender import ClientSender
+from frame_codec import decode_frame
+from sample_ring import RingReader, SampleRing
+from waveform import PulseFilter, WaveformStream
+
+
+# A stream reading a ring this test owns, as _attach would set it up
+def _stream(ring):
+    stream = WaveformStream(ring.name)
+    stream.ring = ring
+    stream.reader = RingReader(ring, (PULSE,))
+    stream._filter = PulseFilter()
+    stream._last_sample = time.monotonic()
+    return stream
+
+
+def _write_pulse(ring, count, start=0.0):
+    for n in range(count):
+        ring.write(start + n * 0.004, PULSE, 1.5 + 0.2 * math.sin(2 * math.pi * 1.2 * n * 0.004))
+        ring.write(start + n * 0.004, GSR, 12000.0)
+
+
+def test_the_filter_removes_the_baseline_and_keeps_the_pulse():
+    pulse_filter = PulseFilter()
+    out = [pulse_filter.apply(n * 0.004, 1.5 + 0.2 * math.sin(2 * math.pi * 1.2 * n * 0.004)) for n in range(2500)]
+    last_second = out[-250:]
+    assert abs(sum(last_second) / len(last_second)) < 0.02
+    assert 0.15 < max(last_second) < 0.25
+
+
+def test_a_batch_has_the_pulse_samples_at_the_asked_rate():
+    ring = SampleRing(capacity=64)
+    try:
+        stream = _stream(ring)
+        _write_pulse(ring, 10)
+        stream.poll()
+        (full,) = stream.frames(0)
+        (half,) = stream.frames(0, decimation=2)
+        (binary,) = stream.frames(0, encoding="binary")
+    finally:
+        ring.close()
+    assert json.loads(full)["Waveform"]["seq"] == 1
+    assert len(json.loads(full)["Waveform"]["samples"]) == 10
+    assert len(json.loads(half)["Waveform"]["samples"]) == 5
+    assert [(seq, metric) for seq, _, metric, _ in decode_frame(binary)] == [(n, "Waveform") for n in range(1, 11)]
+
+
+def test_a_lagging_client_gets_one_batch_with_everything_it_missed():
+    async def run():
+        ring = SampleRing(capacity=64)
+        try:
+            stream = _stream(ring)
+            sender = ClientSender(None)  # Writer not started: nothing leaves the queue
+            task = asyncio.create_task(stream.stream(sender))
+            await asyncio.sleep(0.01)
+            for batch in range(3):
+                _write_pulse(ring, 5, start=batch)
+                stream.poll()
+                await asyncio.sleep(0.01)
+            task.cancel()
+            return list(sender._queue.items()), sender.coalesced
+        finally:
+            ring.close()
+
+    queued, coalesced = asyncio.run(run())
+    assert [key for key, _ in queued] == [("Waveform", 0)]
+    batch = json.loads(queued[0][1])["Waveform"]
+    assert (batch["seq"], len(batch["samples"])) == (1, 15)
+    assert coalesced == 2
@@ -0,0 +1,573 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import uuid
+from collections import namedtuple
+
+from client_sender import ClientSender
+from frame_codec import encode_records
+from qos import QOS_LEVELS
+from replay_buffer import ReplayBuffer
+from vitals_shm import VitalsListener, VitalsReader, VitalsWriter
+
+HEARTBEAT_INTERVAL = 5.0  # Resend unchanged values this often
+
+# Vitals record fields that change what each page shows
+PAGE_FIELDS = {
+    "BPM": ("bpm_time",),
+    "Temperature": ("temperature_time",),
+    "GSR": ("stress_time",),
+    "Continuous": ("bpm_time", "temperature_time", "stress_time"),
+}
+# Metrics each page carries in binary frames, and the record fields behind them
+PAGE_METRICS = {
+    "BPM": ("BPM",),
+    "Temperature": ("Temperature",),
+    "GSR": ("Stress",),
+    "Continuous": ("BPM", "Temperature", "Stress"),
+}
+METRIC_FIELDS = {
+    "BPM": ("bpm", "bpm_time"),
+    "Temperature": ("temperature", "temperature_time"),
+    "Stress": ("stress", "stress_time"),
+    "HRV": ("hrv", "hrv_time"),
+    "Status": ("status", "status_time"),
+}
+# SUBSCRIBE metric names; alerts are streamed by alert_events.py, the
+# waveform by waveform.py
+SUBSCRIBE_METRICS = {
+    "bpm": "BPM",
+    "temperature": "Temperature",
+    "stress": "Stress",
+    "hrv": "HRV",
+    "status": "Status",
+    "alerts": "Alerts",
+    "waveform": "Waveform",
+}
+# Value of each metric before a monitor has measured it
+DEFAULT_VALUES = {"BPM": 0.0, "Temperature": 0.0, "Stress": "None", "HRV": 0.0, "Status": "None"}
+STALE_SECONDS = 10.0  # A measured value this old is stale, its monitor stopped updating it
+EVENT_METRICS = ("Status",)  # Only written when they change, never stale by age
+RETRY_INTERVAL = 1.0  # Seconds between reads while the record cannot be read
+STEADY_INTERVAL = 1.0  # Resend period for subscriptions that are not on-change only and set no rate
+
+
+# The current frame of one page. Every change bumps the version and wakes
+# the streams waiting on it. Binary frames are cached by the seq a client
+# has seen, as most clients have seen the same one.
+class PageChannel:
+    def __init__(self):
+        self.version = 0
+        self.published = 0.0
+        self.key = None
+        self.frame = None
+        self.subscribers = 0
+        self.binary = {}
+        self._waiters = []
+
+    def publish(self, frame, key):
+        self.version += 1
+        self.published = time.monotonic()
+        self.frame = frame
+        self.key = key
+        self.binary = {}
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(True)
+
+    # One future per waiting stream, resolved by publish or the timer; cheaper
+    # than asyncio.wait_for, which starts a task for every wait
+    async def wait(self, seen, timeout):
+        if self.version != seen:
+            return
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        timer = loop.call_later(max(timeout, 0), _wake, waiter)
+        try:
+            await waiter
+        finally:
+            timer.cancel()
+            if not waiter.done() or waiter.cancelled() or not waiter.result():
+                # Timed out or cancelled: take it off the list unless a
+                # publish since then already swapped the list out
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+
+
+# Timer side of PageChannel.wait
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(False)
+
+
+def _json_value(value):
+    return value if isinstance(value, str) else round(value, 3)
+
+
+# Last known value of a metric: when it was measured (0 if never), where it
+# came from ("monitor": read from the record, "cache": kept while the record
+# cannot be read, "default": never measured) and whether it is stale
+CachedValue = namedtuple("CachedValue", "value timestamp source stale")
+
+
+# Last known value of every metric, so the pages and subscriptions always
+# have something to show, with its age and whether it can still be trusted
+class ValueCache:
+    def __init__(self):
+        self.entries = {metric: CachedValue(value, 0.0, "default", True) for metric, value in DEFAULT_VALUES.items()}
+
+    def __getitem__(self, metric):
+        return self.entries[metric]
+
+    def update(self, vitals):
+        now = time.time()
+        for metric, (field, time_field) in METRIC_FIELDS.items():
+            timestamp = getattr(vitals, time_field)
+            if not timestamp:
+                continue
+            stale = metric not in EVENT_METRICS and now - timestamp > STALE_SECONDS
+            self.entries[metric] = CachedValue(getattr(vitals, field), timestamp, "monitor", stale)
+
+    # The record could not be read: keep the values, but flag them
+    def unreadable(self):
+        for metric, entry in self.entries.items():
+            if entry.source == "monitor":
+                self.entries[metric] = entry._replace(source="cache", stale=True)
+
+    def age(self, metric, now=None):
+        timestamp = self.entries[metric].timestamp
+        if not timestamp:
+            return None
+        return round(max((now or time.time()) - timestamp, 0.0), 1)
+
+    # "Age" in seconds (None if never measured) and "Stale" metrics, added to
+    # every JSON payload
+    def freshness(self, metrics):
+        now = time.time()
+        return {
+            "Age": {metric: self.age(metric, now) for metric in metrics},
+            "Stale": [metric for metric in metrics if self.entries[metric].stale],
+        }
+
+    def stats(self):
+        now = time.time()
+        return {
+            metric: {"value": _json_value(entry.value), "age": self.age(metric, now), "source": entry.source, "stale": entry.stale}
+            for metric, entry in self.entries.items()
+        }
+
+
+# One producer reads the vitals record once per change, serializes each page
+# once and hands the same string to every connection streaming that page, so
+# the per-client cost is only the send itself.
+class VitalsBroadcaster:
+    def __init__(self, reader=None, listener=None):
+        self.reader = reader or VitalsReader()
+        self.listener = listener or VitalsListener()
+        self.pages = {page: PageChannel() for page in PAGE_FIELDS}
+        # Last known values, kept while the record cannot be read
+        self.values = ValueCache()
+        self.read_failures = 0
+        self._retry_at = 0.0
+        self.qos_interval = QOS_LEVELS[0]["ws_interval"]
+        self.refreshes = 0
+        # (seq, timestamp, metric, value) per metric update. seq counts up
+        # from 0 in every server run, stream_id tells the runs apart.
+        self.stream_id = uuid.uuid4().hex[:8]
+        self.seq = 0
+        self.history = ReplayBuffer(METRIC_FIELDS)
+        self.latest = {}
+        # Subscriptions wait on this; its version bumps on every new record
+        self.updates = PageChannel()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self.listener.start()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.listener.close()
+
+    # "Seq" is the newest record the frame includes, what a client resumes from
+    def _page_data(self, page):
+        metrics = PAGE_METRICS[page]
+        data = {metric: _json_value(self.values[metric].value) for metric in metrics}
+        data.update(self.values.freshness(metrics))
+        data["Seq"] = max((self.latest[metric][0] for metric in metrics if metric in self.latest), default=0)
+        return data
+
+    # Values of records for a subscription, with their freshness
+    def _json_values(self, records):
+        data = {metric: _json_value(value) for _, _, metric, value in records}
+        data.update(self.values.freshness([record[2] for record in records]))
+        data["Seq"] = max(record[0] for record in records)
+        return [json.dumps(data)]
+
+    # A record that could not be read (missing, or a writer stuck in it) is
+    # tried again after RETRY_INTERVAL, the cached values are used until then
+    def _read(self):
+        now = time.monotonic()
+        if now < self._retry_at:
+            return None
+        vitals = self.reader.read()
+        if vitals is None:
+            self.read_failures += 1
+            self._retry_at = now + RETRY_INTERVAL
+        return vitals
+
+    # Read the record once and republish the pages whose fields changed,
+    # and unchanged ones every heartbeat so their ages stay current
+    def refresh(self):
+        self.refreshes += 1
+        vitals = self._read()
+        qos_level = 0
+        if vitals is not None:
+            self.values.update(vitals)
+            qos_level = min(vitals.qos_level, len(QOS_LEVELS) - 1)
+        else:
+            self.values.unreadable()
+        added = self._add_records(vitals) if vitals is not None else 0
+        self.qos_interval = QOS_LEVELS[qos_level]["ws_interval"]
+        if added:
+            self.updates.publish(None, self.seq)
+
+        for page, channel in self.pages.items():
+            if not channel.subscribers and channel.frame is not None:
+                continue
+            key = (
+                tuple(getattr(vitals, field) for field in PAGE_FIELDS[page]) if vitals else None,
+                tuple(self.values[metric].stale for metric in PAGE_METRICS[page]),
+            )
+            heartbeat = time.monotonic() - channel.published >= HEARTBEAT_INTERVAL
+            if key == channel.key and channel.frame is not None and not heartbeat:
+                continue
+            channel.publish(json.dumps(self._page_data(page)), key)
+
+    def _add_records(self, vitals):
+        added = 0
+        for metric, (field, time_field) in METRIC_FIELDS.items():
+            t = getattr(vitals, time_field)
+            if not t or (metric in self.latest and self.latest[metric][1] == t):
+                continue
+            self.seq += 1
+            record = (self.seq, t, metric, getattr(vitals, field))
+            self.history.append(record)
+            self.latest[metric] = record
+            added += 1
+        return added
+
+    # Records of a page after seq in binary frames, or its latest records
+    # when seq is None (a new client or a heartbeat)
+    def binary_frames(self, page, seq=None):
+        channel = self.pages[page]
+        if seq not in channel.binary:
+            metrics = PAGE_METRICS[page]
+            if seq is None:
+                records = sorted(self.latest[m] for m in metrics if m in self.latest)
+            else:
+                records, _ = self.history.since(seq, metrics)
+            channel.binary[seq] = encode_records(records) if records else []
+        return channel.binary[seq]
+
+    # Send a reconnecting client the records of these metrics it missed
+    # since resume, its (stream_id, seq), in one message: {"Replay": {...}}
+    # with the records, or for binary clients that as a header followed by
+    # one frame of them. complete is False when some are gone, older than
+    # the replay buffer or from before a server restart.
+    async def replay(self, websocket, metrics, resume, encoding="json"):
+        stream_id, seq = resume
+        same_stream = stream_id == self.stream_id and 0 <= seq <= self.seq
+        records, complete = self.history.since(seq if same_stream else 0, metrics)
+        info = {
+            "stream": self.stream_id,
+            "from": seq,
+            "to": self.seq,
+            "complete": complete and same_stream,
+            "count": len(records),
+        }
+        if encoding == "binary":
+            await websocket.send(json.dumps({"Replay": info}))
+            for frame in encode_records(records) if records else []:
+                await websocket.send(frame)
+        else:
+            info["records"] = [[s, round(t, 3), metric, _json_value(value)] for s, t, metric, value in records]
+            await websocket.send(json.dumps({"Replay": info}))
+
+    def stats(self):
+        return {
+            "stream": self.stream_id,
+            "seq": self.seq,
+            "values": self.values.stats(),
+            "replay": self.history.stats(),
+            "read_failures": self.read_failures,
+            "refreshes": self.refreshes,
+        }
+
+    # Reads every change even while nobody is connected, so the replay
+    # history has what a client missed while its connection was down
+    async def _run(self):
+        while True:
+            seen = self.listener.notifications
+            self.refresh()
+            await self.listener.wait(seen, HEARTBEAT_INTERVAL)
+
+    # Stream one page to one connection (a ClientSender) until cancelled: the latest frame as
+    # soon as it changes, at most once per min_interval seconds (or the QoS
+    # interval if that is longer) and at least every heartbeat. A binary
+    # client gets every record since its last frame in one batch. With
+    # resume, the records missed since then come first (see replay).
+    async def stream(self, websocket, page, min_interval=0, encoding="json", resume=None):
+        channel = self.pages[page]
+        channel.subscribers += 1
+        loop = asyncio.get_running_loop()
+        sent_version = None
+        sent_seq = None
+        base_seq = None
+        last_sent = None
+        try:
+            # Pages nobody streams are not refreshed, the first client
+            # brings its frame up to date
+            if channel.frame is None or channel.subscribers == 1:
+                self.refresh()
+            if resume is not None:
+                await self.replay(websocket, PAGE_METRICS[page], resume, encoding)
+                sent_seq = self.seq
+            while True:
+                version = channel.version
+                now = loop.time()
+                changed = version != sent_version
+                if changed or now - last_sent >= HEARTBEAT_INTERVAL:
+                    interval = max(min_interval, self.qos_interval)
+                    if last_sent is not None and now - last_sent < interval:
+                        await asyncio.sleep(interval - (now - last_sent))
+                        continue
+                    if encoding == "binary":
+                        # While the last frame is still queued, the new one
+                        # replaces it and starts where that one started
+                        if not websocket.pending((page, 0)):
+                            base_seq = sent_seq if changed else None
+                        self._queue_binary(websocket, page, base_seq)
+                        sent_seq = self.seq
+                    else:
+                        await websocket.send_now(page, channel.frame)
+                    sent_version = version
+                    last_sent = now
+                await channel.wait(version, HEARTBEAT_INTERVAL - (loop.time() - last_sent))
+        finally:
+            channel.subscribers -= 1
+
+    def _queue_binary(self, websocket, page, seq):
+        frames = self.binary_frames(page, seq)
+        if not frames and seq is not None:
+            frames = self.binary_frames(page)  # Nothing new for this page, resend its latest
+        for i, frame in enumerate(frames):
+            websocket.send_latest((page, i), frame)
+
+    # Stream what one connection (a ClientSender) subscribed to until cancelled. metrics maps
+    # metric names (METRIC_FIELDS) to (min_interval, on_change):
+    # on-change metrics are sent when they change, the others every
+    # min_interval (STEADY_INTERVAL if 0) whether they changed or not. Each
+    # message carries only the metrics that are due. With resume, the
+    # records missed since then come first (see replay).
+    async def subscribe(self, websocket, metrics, encoding="json", resume=None):
+        self.updates.subscribers += 1
+        loop = asyncio.get_running_loop()
+        sent = {}
+        last_sent = {}
+        try:
+            if not self.latest:
+                self.refresh()
+            if resume is not None:
+                await self.replay(websocket, list(metrics), resume, encoding)
+                sent = {metric: record[0] for metric, record in self.latest.items()}
+            while True:
+                version = self.updates.version
+                now = loop.time()
+                due = []
+                wake = HEARTBEAT_INTERVAL
+                for metric, (min_interval, on_change) in metrics.items():
+                    record = self.latest.get(metric)
+                    if record is None:
+                        continue
+                    if on_change:
+                        if record[0] == sent.get(metric):
+                            continue
+                        interval = max(min_interval, self.qos_interval)
+                    else:
+                        interval = max(min_interval or STEADY_INTERVAL, self.qos_interval)
+                    since = now - last_sent.get(metric, float("-inf"))
+                    if since >= interval:
+                        due.append(record)
+                        if not on_change:
+                            wake = min(wake, interval)
+                    else:
+                        wake = min(wake, interval - since)
+                if due:
+                    # Merged with any still queued to the latest per metric
+                    websocket.send_values(due, encode_records if encoding == "binary" else self._json_values)
+                    for record in due:
+                        sent[record[2]] = record[0]
+                        last_sent[record[2]] = now
+                await self.updates.wait(version, wake)
+        finally:
+            self.updates.subscribers -= 1
+
+
+# Benchmark: server CPU for 1, 10, 100 and 1000 simulated Continuous clients
+# while a monitor process updates the vitals about three times a second,
+# streamed three ways: the original send_data (every client re-reads the
+# three text files and the email flag once a second), one shared-memory
+# reader per connection (every client reads and serializes for itself) and
+# through the broadcaster.
+
+class _FakeWebSocket:
+    def __init__(self):
+        self.frames = 0
+
+    async def send(self, message):
+        self.frames += 1
+
+
+def _write_file(directory, name, value):
+    with open(os.path.join(directory, name), "w") as f:
+        f.write(str(value))
+
+
+# Updates the vitals record, and for the file-polling clients the text files
+# the monitors used to write
+def _monitor(path, notify_path, seconds):
+    writer = VitalsWriter(path, notify_path)
+    directory = os.path.dirname(path)
+    end = time.monotonic() + seconds
+    beat = 0
+    while time.monotonic() < end:
+        beat += 1
+        writer.update(bpm=70 + beat % 5)
+        _write_file(directory, "bpm_data.txt", 70 + beat % 5)
+        if beat % 2 == 0:
+            writer.update(temperature=36.6)
+            _write_file(directory, "temperature_data.txt", 36.6)
+        if beat % 4 == 0:
+            writer.update(stress="Normal")
+            _write_file(directory, "gsr_data.txt", "Normal")
+        time.sleep(0.8)
+
+
+def _read_file(directory, name):
+    with open(os.path.join(directory, name), "r") as f:
+        return f.read().strip()
+
+
+# The Continuous branch of the original send_data
+async def _file_polling_stream(websocket, directory):
+    while True:
+        data = {
+            "BPM": round(float(_read_file(directory, "bpm_data.txt")), 3),
+            "Temperature": round(float(_read_file(directory, "temperature_data.txt")), 3),
+            "Stress": _read_file(directory, "gsr_data.txt"),
+        }
+        try:
+            if _read_file(directory, "email_sent_flag.txt") == "1":
+                data["EmailAlert"] = "An alert email was sent"
+        except FileNotFoundError:
+            pass
+        await websocket.send(json.dumps(data))
+        await asyncio.sleep(1)
+
+
+async def _per_client_stream(websocket, reader, listener):
+    loop = asyncio.get_running_loop()
+    interval = QOS_LEVELS[0]["ws_interval"]
+    sent_key = None
+    last_sent = None
+    while True:
+        seen = listener.notifications
+        vitals = reader.read()
+        key = (vitals.bpm_time, vitals.temperature_time, vitals.stress_time) if vitals else None
+        if key != sent_key:
+            now = loop.time()
+            if last_sent is not None and now - last_sent < interval:
+                await asyncio.sleep(interval - (now - last_sent))
+                continue
+            data = {"BPM": round(vitals.bpm, 3), "Temperature": round(vitals.temperature, 3), "Stress": vitals.stress}
+            await websocket.send(json.dumps(data))
+            sent_key = key
+            last_sent = now
+        await listener.wait(seen, HEARTBEAT_INTERVAL)
+
+
+async def _run_clients(mode, clients, seconds, path, notify_path):
+    reader = VitalsReader(path)
+    listener = VitalsListener(notify_path)
+    broadcaster = None
+    if mode == "broadcast":
+        broadcaster = VitalsBroadcaster(reader, listener).start()
+    else:
+        listener.start()
+    sockets = [_FakeWebSocket() for _ in range(clients)]
+    if broadcaster:
+        senders = [ClientSender(ws).start() for ws in sockets]
+        tasks = [asyncio.create_task(broadcaster.stream(sender, "Continuous")) for sender in senders]
+    elif mode == "file-polling":
+        directory = os.path.dirname(path)
+        tasks = [asyncio.create_task(_file_polling_stream(ws, directory)) for ws in sockets]
+    else:
+        tasks = [asyncio.create_task(_per_client_stream(ws, reader, listener)) for ws in sockets]
+    await asyncio.sleep(0.2)
+    monitor = multiprocessing.Process(target=_monitor, args=(path, notify_path, seconds))
+    cpu_start = time.process_time()
+    monitor.start()
+    await asyncio.sleep(seconds)
+    cpu = time.process_time() - cpu_start
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if broadcaster:
+        for sender in senders:
+            sender.close()
+        broadcaster.close()
+    else:
+        listener.close()
+    monitor.join()
+    return {"cpu_ms_per_s": cpu / seconds * 1000, "frames": sum(ws.frames for ws in sockets)}
+
+
+def bench(seconds=5, client_counts=(1, 10, 100, 1000)):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "vitals")
+    notify_path = os.path.join(directory, "vitals.sock")
+    VitalsWriter(path, notify_path).close()
+    _write_file(directory, "bpm_data.txt", 0.0)
+    _write_file(directory, "temperature_data.txt", 0.0)
+    _write_file(directory, "gsr_data.txt", "None")
+    results = []
+    for clients in client_counts:
+        row = {"clients": clients}
+        for mode in ("file-polling", "per-client", "broadcast"):
+            row[mode] = asyncio.run(_run_clients(mode, clients, seconds, path, notify_path))
+        results.append(row)
+    return results
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    modes = ("file-polling", "per-client", "broadcast")
+    print(f"Server CPU over {seconds:.0f}s of Continuous streaming, ms of CPU per second (frames sent)")
+    print(f"{'clients':>8}" + "".join(f"{mode:>22}" for mode in modes))
+    for row in bench(seconds):
+        print(f"{row['clients']:>8}" + "".join(
+            f"{row[mode]['cpu_ms_per_s']:>13.2f} ({row[mode]['frames']:>6})" for mode in modes
+        ))
@@ -0,0 +1,225 @@
+import asyncio
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+from collections import namedtuple
+
+# tmpfs, so updates never reach the SD card. Monitors create it, and it
+# stays until reboot so command_server.py can start before or after them.
+VITALS_PATH = os.getenv("VITALS_SHM", "/dev/shm/patient_vitals")
+# Unix datagram socket command_server.py listens on for "vitals changed"
+NOTIFY_PATH = os.getenv("VITALS_NOTIFY_SOCKET", "/tmp/patient_vitals.sock")
+POLL_INTERVAL = 1.0  # Fallback re-read interval when the socket cannot be bound
+
+MAGIC = 0x56495432  # "VIT2", bumped whenever RECORD changes
+# seq is even while the record is stable and odd while a writer is in it
+HEADER = struct.Struct("<II")  # seq, magic
+RECORD = struct.Struct("<dddd16sddd24sdII")
+SIZE = HEADER.size + RECORD.size
+READ_RETRIES = 100
+
+# Each *_time is the wall-clock time of that metric's last update, 0 if never.
+# updates counts writes, so a reader can tell whether anything changed.
+Vitals = namedtuple(
+    "Vitals",
+    "bpm bpm_time temperature temperature_time stress stress_time hrv hrv_time status status_time qos_level updates",
+)
+EMPTY = Vitals(0.0, 0.0, 0.0, 0.0, "None", 0.0, 0.0, 0.0, "None", 0.0, 0, 0)
+
+
+def _open(path, writable):
+    flags = os.O_RDWR | os.O_CREAT if writable else os.O_RDONLY
+    fd = os.open(path, flags, 0o644)
+    try:
+        if writable and os.fstat(fd).st_size < SIZE:
+            os.ftruncate(fd, SIZE)
+        elif os.fstat(fd).st_size < SIZE:
+            return None
+        return mmap.mmap(fd, SIZE, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+    finally:
+        os.close(fd)
+
+
+def _unpack(buf):
+    fields = list(RECORD.unpack_from(buf, HEADER.size))
+    fields[4] = fields[4].rstrip(b"\0").decode()  # stress
+    fields[8] = fields[8].rstrip(b"\0").decode()  # status
+    return Vitals(*fields)
+
+
+# Memory-mapped vitals record for the monitor process. update() changes only
+# the metrics it is given, inside a seqlock so readers never see half a write,
+# then wakes command_server.py with a datagram.
+class VitalsWriter:
+    def __init__(self, path=VITALS_PATH, notify_path=NOTIFY_PATH):
+        self.path = path
+        self.notify_path = notify_path
+        self._map = _open(path, writable=True)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+        self._lock = threading.Lock()  # One writer at a time within this process
+        seq, magic = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            HEADER.pack_into(self._map, 0, 0, MAGIC)
+            self._store(EMPTY)
+        elif seq % 2:
+            HEADER.pack_into(self._map, 0, seq + 1, MAGIC)  # A writer died mid-update
+
+    def _store(self, vitals):
+        RECORD.pack_into(
+            self._map,
+            HEADER.size,
+            vitals.bpm,
+            vitals.bpm_time,
+            vitals.temperature,
+            vitals.temperature_time,
+            vitals.stress.encode()[:16],
+            vitals.stress_time,
+            vitals.hrv,
+            vitals.hrv_time,
+            vitals.status.encode()[:24],
+            vitals.status_time,
+            vitals.qos_level,
+            vitals.updates,
+        )
+
+    def update(self, bpm=None, temperature=None, stress=None, hrv=None, status=None, qos_level=None):
+        now = time.time()
+        with self._lock:
+            seq = HEADER.unpack_from(self._map, 0)[0]
+            current = _unpack(self._map)
+            changes = {"updates": current.updates + 1}
+            if bpm is not None:
+                changes.update(bpm=float(bpm), bpm_time=now)
+            if temperature is not None:
+                changes.update(temperature=float(temperature), temperature_time=now)
+            if stress is not None:
+                changes.update(stress=stress, stress_time=now)
+            if hrv is not None:
+                changes.update(hrv=float(hrv), hrv_time=now)
+            if status is not None:
+                changes.update(status=status, status_time=now)
+            if qos_level is not None:
+                changes["qos_level"] = qos_level
+            HEADER.pack_into(self._map, 0, seq + 1, MAGIC)
+            self._store(current._replace(**changes))
+            HEADER.pack_into(self._map, 0, seq + 2, MAGIC)
+        self.notify()
+
+    # Never blocks: no listener or a full socket buffer just drops the wakeup,
+    # the server re-reads the record on its next heartbeat anyway
+    def notify(self):
+        try:
+            self._sock.sendto(b"v", self.notify_path)
+        except OSError:
+            pass
+
+    def close(self):
+        self._sock.close()
+        self._map.close()
+
+
+# Lock-free reader for command_server.py. read() returns a consistent Vitals
+# snapshot, or None while no monitor has created the record yet.
+class VitalsReader:
+    def __init__(self, path=VITALS_PATH):
+        self.path = path
+        self.retries = 0
+        self._map = None
+
+    def read(self):
+        if self._map is None:
+            try:
+                self._map = _open(self.path, writable=False)
+            except FileNotFoundError:
+                return None
+            if self._map is None:
+                return None
+        for _ in range(READ_RETRIES):
+            seq, magic = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC:
+                return None
+            if seq % 2 == 0:
+                vitals = _unpack(self._map)
+                if HEADER.unpack_from(self._map, 0)[0] == seq:
+                    return vitals
+            self.retries += 1
+            time.sleep(0)  # Let the writer finish
+        return None
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+# Server side of the notifications: wakes every waiter on the event loop when
+# a monitor signals new data. If the socket cannot be bound, wait() falls
+# back to re-reading every POLL_INTERVAL seconds.
+class VitalsListener:
+    def __init__(self, path=NOTIFY_PATH):
+        self.path = path
+        self.notifications = 0
+        self._sock = None
+        self._event = None
+        self._loop = None
+
+    @property
+    def listening(self):
+        return self._sock is not None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            if os.path.exists(self.path):
+                os.unlink(self.path)  # Left over from a previous run
+            sock.bind(self.path)
+            os.chmod(self.path, 0o666)  # Monitors may run as another user
+            sock.setblocking(False)
+        except OSError as e:
+            sock.close()
+            print(f"Vitals notifications unavailable, polling instead: {e}")
+            return self
+        self._sock = sock
+        self._loop.add_reader(sock.fileno(), self._on_readable)
+        return self
+
+    def _on_readable(self):
+        while True:
+            try:
+                self._sock.recv(64)
+            except OSError:
+                break
+            self.notifications += 1
+        # Wake everyone waiting on the current event, later waiters get a new one
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    # Wait up to timeout seconds for a notification after the count seen
+    # (take self.notifications before reading the record, so nothing that
+    # arrives in between is missed). Returns the new count.
+    async def wait(self, seen, timeout):
+        if self._sock is None:
+            await asyncio.sleep(min(timeout, POLL_INTERVAL))
+        elif self.notifications == seen:
+            try:
+                await asyncio.wait_for(self._event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.notifications
+
+    def close(self):
+        if self._sock is None:
+            return
+        self._loop.remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from multiprocessing import resource_tracker
+
+from acquisition import PULSE, RING_NAME
+from frame_codec import encode_records
+from sample_ring import RingReader, SampleRing
+
+BATCH_INTERVAL = 0.08   # Seconds of samples per frame
+ATTACH_RETRY = 1.0      # Seconds between looks for the acquisition ring
+STALE_SECONDS = 2.0     # No new samples for this long: the acquisition stopped or restarted
+HISTORY = 500           # Samples kept for clients a batch or two behind, 2 s at 250 Hz
+MAX_DECIMATION = 25
+HIGH_PASS_HZ = 0.5      # Removes the baseline drift of the pulse sensor
+LOW_PASS_HZ = 8.0       # Removes ADC noise, well above any heart rate
+
+
+# One-pole high-pass followed by a one-pole low-pass, with the coefficients
+# taken from each sample's own interval so an uneven rate does not bend it
+class PulseFilter:
+    def __init__(self, high_pass_hz=HIGH_PASS_HZ, low_pass_hz=LOW_PASS_HZ):
+        self.high_rc = 1 / (2 * math.pi * high_pass_hz)
+        self.low_rc = 1 / (2 * math.pi * low_pass_hz)
+        self._last = None
+
+    def apply(self, timestamp, value):
+        if self._last is None:
+            self._last = (timestamp, value, 0.0, 0.0)
+            return 0.0
+        last_time, last_value, high, low = self._last
+        dt = max(timestamp - last_time, 1e-6)
+        high = self.high_rc / (self.high_rc + dt) * (high + value - last_value)
+        low += dt / (self.low_rc + dt) * (high - low)
+        self._last = (timestamp, value, high, low)
+        return low
+
+
+# Live pulse waveform for the Waveform page. One producer takes the A0
+# samples the acquisition process (ACQUISITION_MODE=process) already writes
+# to its shared-memory ring, filters them once and publishes a batch every
+# BATCH_INTERVAL; each client gets the batch, decimated if it asked for a
+# lower rate. No extra ADC reads.
+class WaveformStream:
+    def __init__(self, ring_name=RING_NAME):
+        self.ring_name = ring_name
+        self.ring = None
+        self.reader = None
+        self.seq = 0
+        self.samples = deque(maxlen=HISTORY)  # (seq, wall-clock time, filtered volts)
+        self.version = 0
+        self.subscribers = 0
+        self._filter = None
+        self._last_sample = 0.0
+        self._frames = {}
+        self._event = asyncio.Event()
+        self._task = None
+
+    @property
+    def available(self):
+        return self.ring is not None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._detach()
+
+    def _attach(self):
+        try:
+            self.ring = SampleRing(self.ring_name)
+        except FileNotFoundError:
+            return False
+        # The acquisition process owns the ring; without this the resource
+        # tracker of this process would unlink it when the server exits
+        resource_tracker.unregister(self.ring.shm._name, "shared_memory")
+        self.reader = RingReader(self.ring, (PULSE,))
+        self._filter = PulseFilter()
+        self._last_sample = time.monotonic()
+        return True
+
+    def _detach(self):
+        if self.ring is not None:
+            self.ring.close()
+        self.ring = None
+        self.reader = None
+
+    # Filter what the acquisition process sampled since the last batch
+    def poll(self):
+        samples = self.reader.read()
+        now = time.monotonic()
+        if not samples:
+            if now - self._last_sample > STALE_SECONDS:
+                self._detach()
+            return
+        self._last_sample = now
+        offset = time.time() - now  # Ring timestamps are monotonic, clients get wall-clock time
+        for timestamp, _, voltage in samples:
+            self.seq += 1
+            self.samples.append((self.seq, timestamp + offset, self._filter.apply(timestamp, voltage)))
+        self.version += 1
+        self._frames = {}
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    async def _run(self):
+        while True:
+            if not self.subscribers:
+                self._detach()  # Start from the newest sample when someone subscribes again
+                await asyncio.sleep(BATCH_INTERVAL)
+            elif self.ring is None and not self._attach():
+                await asyncio.sleep(ATTACH_RETRY)
+            else:
+                self.poll()
+                await asyncio.sleep(BATCH_INTERVAL)
+
+    # Frames with the samples after seq, every decimation-th sample only.
+    # Cached per batch, as clients in step ask for the same frames.
+    def frames(self, seq, decimation=1, encoding="json"):
+        key = (seq, decimation, encoding)
+        if key not in self._frames:
+            samples = [s for s in self.samples if s[0] > seq and s[0] % decimation == 0]
+            if not samples:
+                frames = []
+            elif encoding == "binary":
+                frames = encode_records([(s, t, "Waveform", v) for s, t, v in samples])
+            else:
+                rate = (len(samples) - 1) / (samples[-1][1] - samples[0][1]) if len(samples) > 1 else 0.0
+                frames = [json.dumps({"Waveform": {
+                    "seq": samples[0][0],
+                    "t": round(samples[0][1], 3),
+                    "rate": round(rate, 1),
+                    "samples": [round(v, 4) for _, _, v in samples],
+                }})]
+            self._frames[key] = frames
+        return self._frames[key]
+
+    # Stream the waveform to one connection (a ClientSender) until cancelled
+    async def stream(self, websocket, decimation=1, encoding="json"):
+        decimation = min(max(int(decimation), 1), MAX_DECIMATION)
+        self.subscribers += 1
+        sent_seq = base_seq = self.seq
+        notified = False
+        try:
+            while True:
+                if self.seq == sent_seq:
+                    try:
+                        await asyncio.wait_for(self._event.wait(), STALE_SECONDS + ATTACH_RETRY)
+                    except asyncio.TimeoutError:
+                        if not self.available and not notified:
+                            await websocket.send(json.dumps({"error": "No waveform, the acquisition process is not running"}))
+                            notified = True
+                    continue
+                notified = False
+                # A batch still queued for a lagging client is replaced by
+                # one starting where it started
+                if not websocket.pending(("Waveform", 0)):
+                    base_seq = sent_seq
+                for i, frame in enumerate(self.frames(base_seq, decimation, encoding)):
+                    websocket.send_latest(("Waveform", i), frame)
+                sent_seq = self.seq
+        finally:
+            self.subscribers -= 1